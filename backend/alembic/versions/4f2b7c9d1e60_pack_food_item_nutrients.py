@@ -0,0 +1,137 @@
+"""pack food item nutrients
+
+Revision ID: 4f2b7c9d1e60
+Revises: a9b8c7d6e5f4
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2b7c9d1e60'
+down_revision: Union[str, None] = 'a9b8c7d6e5f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Snapshot of the nutrient vocabulary (NutritionService.nutrient_units) at the
+# time of this migration. Positions must match app.services.nutrient_storage.
+VOCABULARY = [
+    ("calories", "kcal"), ("energy_kj", "kJ"), ("protein", "g"), ("carbs", "g"),
+    ("fiber", "g"), ("fat", "g"), ("saturated_fat", "g"), ("monounsaturated_fat", "g"),
+    ("polyunsaturated_fat", "g"), ("water", "g"), ("ash", "g"), ("sugars", "g"),
+    ("sucrose", "g"), ("glucose", "g"), ("fructose", "g"), ("lactose", "g"),
+    ("starch", "g"), ("sodium", "mg"), ("potassium", "mg"), ("calcium", "mg"),
+    ("iron", "mg"), ("magnesium", "mg"), ("phosphorus", "mg"), ("zinc", "mg"),
+    ("copper", "mg"), ("manganese", "mg"), ("selenium", "µg"), ("iodine", "µg"),
+    ("vitamin_a", "µg"), ("vitamin_d", "µg"), ("vitamin_e", "mg"), ("vitamin_k", "µg"),
+    ("vitamin_c", "mg"), ("thiamin", "mg"), ("riboflavin", "mg"), ("niacin", "mg"),
+    ("vitamin_b6", "mg"), ("folate", "µg"), ("vitamin_b12", "µg"),
+    ("pantothenic_acid", "mg"), ("biotin", "µg"), ("choline", "mg"),
+]
+UNIT_ALIASES = {"mcg": "µg", "ug": "µg", "μg": "µg", "kj": "kJ", "cal": "kcal"}
+BATCH_SIZE = 1000
+
+food_items = sa.table(
+    'food_items',
+    sa.column('id', sa.Integer),
+    sa.column('nutrient_values', sa.JSON(none_as_null=True).with_variant(postgresql.ARRAY(sa.Float), 'postgresql')),
+    sa.column('extra_nutrients', sa.JSON(none_as_null=True).with_variant(postgresql.JSONB(none_as_null=True), 'postgresql')),
+)
+nutrients = sa.table(
+    'nutrients',
+    sa.column('food_item_id', sa.Integer),
+    sa.column('name', sa.String),
+    sa.column('value', sa.Float),
+    sa.column('unit', sa.String),
+    sa.column('per_100g', sa.Float),
+    sa.column('created_at', sa.DateTime),
+    sa.column('updated_at', sa.DateTime),
+)
+
+
+def _pack(rows):
+    """Pack (name, value, unit) rows the same way nutrient_storage.pack_nutrients does"""
+    index = {name: i for i, (name, _) in enumerate(VOCABULARY)}
+    values = [None] * len(VOCABULARY)
+    extras = {}
+    for name, value, unit in rows:
+        i = index.get(name)
+        normalized_unit = UNIT_ALIASES.get((unit or "").strip().lower(), (unit or "").strip())
+        if i is not None and normalized_unit == VOCABULARY[i][1]:
+            values[i] = (values[i] or 0.0) + value
+        elif name in extras:
+            extras[name]["value"] += value
+        else:
+            extras[name] = {"value": value, "unit": unit}
+    while values and values[-1] is None:
+        values.pop()
+    return values or None, extras or None
+
+
+def upgrade() -> None:
+    op.add_column('food_items', sa.Column('nutrient_values', sa.JSON(none_as_null=True).with_variant(postgresql.ARRAY(sa.Float), 'postgresql'), nullable=True))
+    op.add_column('food_items', sa.Column('extra_nutrients', sa.JSON(none_as_null=True).with_variant(postgresql.JSONB(none_as_null=True), 'postgresql'), nullable=True))
+
+    # Backfill packed nutrients from the existing per-nutrient rows.
+    # The rows are kept so the migration can be rolled back.
+    bind = op.get_bind()
+    result = bind.execution_options(stream_results=True).execute(
+        sa.select(nutrients.c.food_item_id, nutrients.c.name, nutrients.c.value, nutrients.c.unit)
+        .order_by(nutrients.c.food_item_id)
+    )
+    update = (
+        food_items.update()
+        .where(food_items.c.id == sa.bindparam('b_id'))
+        .values(nutrient_values=sa.bindparam('b_values'), extra_nutrients=sa.bindparam('b_extras'))
+    )
+
+    batch = []
+    current_id, current_rows = None, []
+    for food_item_id, name, value, unit in result:
+        if food_item_id != current_id and current_rows:
+            values, extras = _pack(current_rows)
+            batch.append({'b_id': current_id, 'b_values': values, 'b_extras': extras})
+            current_rows = []
+            if len(batch) >= BATCH_SIZE:
+                bind.execute(update, batch)
+                batch = []
+        current_id = food_item_id
+        current_rows.append((name, value, unit))
+    if current_rows:
+        values, extras = _pack(current_rows)
+        batch.append({'b_id': current_id, 'b_values': values, 'b_extras': extras})
+    if batch:
+        bind.execute(update, batch)
+
+
+def downgrade() -> None:
+    # Recreate per-nutrient rows for food items that only have packed nutrients
+    bind = op.get_bind()
+    has_rows = sa.exists().where(nutrients.c.food_item_id == food_items.c.id)
+    result = bind.execution_options(stream_results=True).execute(
+        sa.select(food_items.c.id, food_items.c.nutrient_values, food_items.c.extra_nutrients)
+        .where(~has_rows)
+    )
+
+    batch = []
+    for food_item_id, values, extras in result:
+        for i, value in enumerate(values or []):
+            if value is not None:
+                batch.append({'food_item_id': food_item_id, 'name': VOCABULARY[i][0], 'value': value,
+                              'unit': VOCABULARY[i][1], 'per_100g': None})
+        for name, extra in (extras or {}).items():
+            batch.append({'food_item_id': food_item_id, 'name': name, 'value': extra['value'],
+                          'unit': extra['unit'], 'per_100g': None})
+        if len(batch) >= BATCH_SIZE:
+            bind.execute(nutrients.insert(), batch)
+            batch = []
+    if batch:
+        bind.execute(nutrients.insert(), batch)
+
+    op.drop_column('food_items', 'extra_nutrients')
+    op.drop_column('food_items', 'nutrient_values')
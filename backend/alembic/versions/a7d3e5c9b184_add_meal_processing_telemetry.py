@@ -0,0 +1,49 @@
+"""add meal processing telemetry
+
+Revision ID: a7d3e5c9b184
+Revises: f4b6a2d8c017
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e5c9b184'
+down_revision: Union[str, None] = 'f4b6a2d8c017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('meal_processing_telemetry',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('meal_id', sa.Integer(), nullable=False),
+    sa.Column('file_extension', sa.String(), nullable=True),
+    sa.Column('file_size_bytes', sa.Integer(), nullable=True),
+    sa.Column('ocr_engine', sa.String(), nullable=True),
+    sa.Column('ocr_ms', sa.Float(), nullable=False),
+    sa.Column('llm_ms', sa.Float(), nullable=False),
+    sa.Column('nutrition_ms', sa.Float(), nullable=False),
+    sa.Column('db_ms', sa.Float(), nullable=False),
+    sa.Column('total_ms', sa.Float(), nullable=False),
+    sa.Column('db_queries', sa.Integer(), nullable=False),
+    sa.Column('ocr_characters', sa.Integer(), nullable=False),
+    sa.Column('food_item_count', sa.Integer(), nullable=False),
+    sa.Column('llm_timeouts', sa.Integer(), nullable=False),
+    sa.Column('usda_cache_hits', sa.Integer(), nullable=False),
+    sa.Column('usda_cache_misses', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['meal_id'], ['meals.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('meal_id')
+    )
+    op.create_index(op.f('ix_meal_processing_telemetry_total_ms'), 'meal_processing_telemetry', ['total_ms'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_meal_processing_telemetry_total_ms'), table_name='meal_processing_telemetry')
+    op.drop_table('meal_processing_telemetry')
@@ -0,0 +1,36 @@
+"""add food item nutrition status
+
+Revision ID: b2e6f1a8d357
+Revises: a7d3e5c9b184
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2e6f1a8d357'
+down_revision: Union[str, None] = 'a7d3e5c9b184'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+nutritionstatus = sa.Enum('RESOLVED', 'PENDING', name='nutritionstatus')
+
+
+def upgrade() -> None:
+    nutritionstatus.create(op.get_bind(), checkfirst=True)
+    op.add_column('food_items', sa.Column('nutrition_status', nutritionstatus, server_default='RESOLVED', nullable=False))
+    op.create_index(
+        'ix_food_items_nutrition_pending', 'food_items', ['id'], unique=False,
+        postgresql_where=sa.text("nutrition_status = 'PENDING'"),
+        sqlite_where=sa.text("nutrition_status = 'PENDING'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_food_items_nutrition_pending', table_name='food_items')
+    op.drop_column('food_items', 'nutrition_status')
+    nutritionstatus.drop(op.get_bind(), checkfirst=True)
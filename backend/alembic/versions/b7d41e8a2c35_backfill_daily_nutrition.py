@@ -0,0 +1,112 @@
+"""backfill daily nutrition
+
+Revision ID: b7d41e8a2c35
+Revises: 4f2b7c9d1e60
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41e8a2c35'
+down_revision: Union[str, None] = '4f2b7c9d1e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Snapshot of the nutrient vocabulary, see 4f2b7c9d1e60
+VOCABULARY = [
+    ("calories", "kcal"), ("energy_kj", "kJ"), ("protein", "g"), ("carbs", "g"),
+    ("fiber", "g"), ("fat", "g"), ("saturated_fat", "g"), ("monounsaturated_fat", "g"),
+    ("polyunsaturated_fat", "g"), ("water", "g"), ("ash", "g"), ("sugars", "g"),
+    ("sucrose", "g"), ("glucose", "g"), ("fructose", "g"), ("lactose", "g"),
+    ("starch", "g"), ("sodium", "mg"), ("potassium", "mg"), ("calcium", "mg"),
+    ("iron", "mg"), ("magnesium", "mg"), ("phosphorus", "mg"), ("zinc", "mg"),
+    ("copper", "mg"), ("manganese", "mg"), ("selenium", "µg"), ("iodine", "µg"),
+    ("vitamin_a", "µg"), ("vitamin_d", "µg"), ("vitamin_e", "mg"), ("vitamin_k", "µg"),
+    ("vitamin_c", "mg"), ("thiamin", "mg"), ("riboflavin", "mg"), ("niacin", "mg"),
+    ("vitamin_b6", "mg"), ("folate", "µg"), ("vitamin_b12", "µg"),
+    ("pantothenic_acid", "mg"), ("biotin", "µg"), ("choline", "mg"),
+]
+VOCABULARY_NAMES = {name for name, _ in VOCABULARY}
+BATCH_SIZE = 1000
+
+meals = sa.table(
+    'meals',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('meal_date', sa.DateTime),
+)
+food_items = sa.table(
+    'food_items',
+    sa.column('meal_id', sa.Integer),
+    sa.column('nutrient_values', sa.JSON(none_as_null=True).with_variant(postgresql.ARRAY(sa.Float), 'postgresql')),
+    sa.column('extra_nutrients', sa.JSON(none_as_null=True).with_variant(postgresql.JSONB(none_as_null=True), 'postgresql')),
+)
+daily_nutrition = sa.table(
+    'daily_nutrition',
+    sa.column('user_id', sa.Integer),
+    sa.column('date', sa.Date),
+    sa.column('nutrient_name', sa.String),
+    sa.column('total_value', sa.Float),
+    sa.column('unit', sa.String),
+    sa.column('created_at', sa.DateTime(timezone=True)),
+    sa.column('updated_at', sa.DateTime(timezone=True)),
+)
+
+
+def _day_rows(user_id, day, totals):
+    now = datetime.now(timezone.utc)
+    return [
+        {'user_id': user_id, 'date': day, 'nutrient_name': name, 'total_value': value,
+         'unit': unit, 'created_at': now, 'updated_at': now}
+        for name, (value, unit) in totals.items()
+    ]
+
+
+def upgrade() -> None:
+    # daily_nutrition was never written before; roll up every user's days
+    # from the packed food item nutrients
+    bind = op.get_bind()
+    bind.execute(daily_nutrition.delete())
+    result = bind.execution_options(stream_results=True).execute(
+        sa.select(meals.c.user_id, meals.c.meal_date, food_items.c.nutrient_values, food_items.c.extra_nutrients)
+        .select_from(meals.join(food_items, food_items.c.meal_id == meals.c.id))
+        .order_by(meals.c.user_id, meals.c.meal_date)
+    )
+
+    batch = []
+    current_key, totals = None, {}
+    for user_id, meal_date, values, extras in result:
+        key = (user_id, meal_date.date())
+        if key != current_key and totals:
+            batch.extend(_day_rows(*current_key, totals))
+            totals = {}
+            if len(batch) >= BATCH_SIZE:
+                bind.execute(daily_nutrition.insert(), batch)
+                batch = []
+        current_key = key
+        for i, value in enumerate(values or []):
+            if value is not None:
+                name, unit = VOCABULARY[i]
+                totals[name] = (totals.get(name, (0.0, unit))[0] + value, unit)
+        for name, extra in (extras or {}).items():
+            # Same rule as DailyNutritionService: only vocabulary units are rolled up
+            if name in VOCABULARY_NAMES:
+                continue
+            value, unit = totals.get(name, (0.0, extra['unit']))
+            totals[name] = (value + extra['value'], unit)
+    if totals:
+        batch.extend(_day_rows(*current_key, totals))
+    if batch:
+        bind.execute(daily_nutrition.insert(), batch)
+
+
+def downgrade() -> None:
+    # Rows are derived from meals; nothing wrote them before this revision
+    op.get_bind().execute(daily_nutrition.delete())
@@ -0,0 +1,28 @@
+"""add user risk tracking
+
+Revision ID: d5e9b2f7a461
+Revises: c3a8f6d2e914
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e9b2f7a461'
+down_revision: Union[str, None] = 'c3a8f6d2e914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('risk_data_version', sa.Integer(), nullable=True))
+    op.add_column('users', sa.Column('risks_evaluated_on', sa.Date(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'risks_evaluated_on')
+    op.drop_column('users', 'risk_data_version')
@@ -0,0 +1,58 @@
+"""composite and covering indexes
+
+Revision ID: f4b6a2d8c017
+Revises: e8c1f4a93b72
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b6a2d8c017'
+down_revision: Union[str, None] = 'e8c1f4a93b72'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Indexes made redundant by a primary key or by a composite index with the
+# same leading column: (index name, table, columns)
+REDUNDANT_INDEXES = [
+    ('ix_users_id', 'users', ['id']),
+    ('ix_meals_id', 'meals', ['id']),
+    ('ix_meals_user_id', 'meals', ['user_id']),
+    ('ix_food_items_id', 'food_items', ['id']),
+    ('ix_nutrients_id', 'nutrients', ['id']),
+    ('ix_nutrients_food_item_id', 'nutrients', ['food_item_id']),
+    ('ix_daily_nutrition_id', 'daily_nutrition', ['id']),
+    ('ix_daily_nutrition_user_id', 'daily_nutrition', ['user_id']),
+    ('ix_risk_scores_id', 'risk_scores', ['id']),
+]
+
+
+def upgrade() -> None:
+    # Build the new indexes without blocking meal writes on PostgreSQL
+    with op.get_context().autocommit_block():
+        # Meal listing (keyset pages), daily/summary range scans and the
+        # rollup refresh all filter on user_id and a meal_date range
+        op.create_index(
+            'ix_meals_user_date', 'meals',
+            ['user_id', sa.text('meal_date DESC'), sa.text('id DESC')],
+            unique=False, postgresql_concurrently=True,
+        )
+        # Per-food-item nutrient reads are answered from the index alone
+        op.create_index(
+            'ix_nutrients_food_item_name', 'nutrients', ['food_item_id', 'name'],
+            unique=False, postgresql_include=['value', 'unit'], postgresql_concurrently=True,
+        )
+    for name, table, _ in REDUNDANT_INDEXES:
+        op.drop_index(name, table_name=table)
+
+
+def downgrade() -> None:
+    for name, table, columns in REDUNDANT_INDEXES:
+        op.create_index(name, table, columns, unique=False)
+    op.drop_index('ix_nutrients_food_item_name', table_name='nutrients')
+    op.drop_index('ix_meals_user_date', table_name='meals')
@@ -0,0 +1,46 @@
+"""
+Admin diagnostics routes
+"""
+import threading
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+from typing import Any, Dict, List
+
+from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.core.profiler import sampling_profiler
+from app.core.security import get_current_superuser
+from app.models.user import User
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def capture_profile(
+    seconds: float = Query(10.0, gt=0, le=settings.PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    all_threads: bool = False,
+    current_user: User = Depends(get_current_superuser)
+):
+    """
+    Capture a sampling profile of the worker serving this request
+    
+    Returns folded stacks ("frame;frame;frame count" per line) for
+    flamegraph.pl, speedscope or inferno. Samples the event loop thread
+    unless all_threads is set (thread pools: OCR, password hashing).
+    With several workers, each request profiles whichever worker serves it.
+    """
+    thread_ids = None if all_threads else {threading.get_ident()}
+    folded = await sampling_profiler.profile(seconds, interval_ms / 1000, thread_ids)
+    return PlainTextResponse(
+        folded,
+        headers={"Content-Disposition": 'attachment; filename="profile.folded"'},
+    )
+
+
+@router.get("/loop-stalls")
+async def get_loop_stalls(
+    current_user: User = Depends(get_current_superuser)
+) -> List[Dict[str, Any]]:
+    """Recent event loop stalls of this worker, newest first, with the blocking stack"""
+    return [stall.to_dict() for stall in reversed(loop_monitor.stalls)]
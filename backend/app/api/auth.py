@@ -1,14 +1,15 @@
 """
 Authentication routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core.database import get_db
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    hash_password,
+    verify_and_update_password,
+    auth_attempt_limiter,
     create_access_token,
     create_refresh_token,
     get_current_user,
@@ -28,7 +29,7 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
+async def register(user_data: UserCreate, request: Request, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     # Check if user already exists
     result = await db.execute(select(User).where(User.email == user_data.email))
@@ -45,8 +46,13 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
             detail="Username already taken"
         )
     
-    # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    # End the read transaction so no connection is held while hashing
+    await db.commit()
+    
+    # Create new user (hashing runs on the password executor)
+    client_ip = request.client.host if request.client else None
+    async with auth_attempt_limiter.limit(f"ip:{client_ip}"):
+        hashed_password = await hash_password(user_data.password)
     new_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -61,7 +67,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_db)):
+async def login(credentials: LoginRequest, request: Request, db: AsyncSession = Depends(get_db)):
     """Login with username or email and password"""
     # Find user by username or email
     result = await db.execute(
@@ -71,8 +77,16 @@ async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_db)):
         )
     )
     user = result.scalar_one_or_none()
+    # End the read transaction so no connection is held while verifying
+    await db.commit()
     
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        client_ip = request.client.host if request.client else None
+        async with auth_attempt_limiter.limit(f"ip:{client_ip}", f"user:{user.id}"):
+            valid, new_hash = await verify_and_update_password(credentials.password, user.hashed_password)
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username/email or password",
@@ -85,6 +99,10 @@ async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_db)):
             detail="Inactive user"
         )
     
+    # Transparently upgrade hashes created with an outdated bcrypt cost
+    if new_hash:
+        user.hashed_password = new_hash
+    
     # Create tokens (sub must be string)
     access_token = create_access_token(data={"sub": str(user.id), "username": user.username})
     refresh_token = create_refresh_token(data={"sub": str(user.id), "username": user.username})
@@ -2,9 +2,10 @@
 API dependencies
 """
 from fastapi import Depends
+from sqlalchemy.exc import InterfaceError, OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_db, replica_router, replica_session_maker
 from app.core.security import get_current_active_user
 from app.models.user import User
 
@@ -19,3 +20,20 @@ def get_current_user_dependency() -> User:
     """Get current user dependency"""
     return Depends(get_current_active_user)
 
+
+
+async def get_read_db(current_user: User = Depends(get_current_active_user)) -> AsyncSession:
+    """
+    Get a database session for read-only endpoints.
+    Uses the read replica when one is configured and healthy, except right
+    after the user wrote (read-your-writes). Connection failures on the
+    replica route later requests to the primary until it recovers.
+    """
+    session_maker = await replica_router.session_maker_for(current_user.id)
+    async with session_maker() as session:
+        try:
+            yield session
+        except (OperationalError, InterfaceError, OSError):
+            if session_maker is replica_session_maker:
+                replica_router.mark_unhealthy()
+            raise
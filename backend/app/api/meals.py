@@ -1,27 +1,36 @@
 """
 Meal routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from sqlalchemy import select, and_, tuple_
+from sqlalchemy.orm import selectinload, defer
+from typing import List, Optional, Tuple
 from datetime import datetime, date, timezone
 from pathlib import Path
+import base64
+import binascii
 import os
+import time
 import uuid
 
-from app.core.database import get_db
+from app.core.database import get_db, async_session_maker
 from app.core.security import get_current_active_user
+from app.api.dependencies import get_read_db
 from app.core.config import settings
+from app.core.instrumentation import collect_stages, increment
+from app.core.metrics import UPLOAD_SIZE
+from app.core.response_cache import bump_data_version, cached_json_response
+from app.core.tracing import tracer
 from app.models.user import User
 from app.models.meal import Meal, MealType, MealSource
-from app.models.food_item import FoodItem
-from app.models.nutrient import Nutrient
 from app.schemas.meal import MealCreate, MealResponse, MealWithNutrients
 from app.services.ocr_service import ocr_service
 from app.services.llm_service import llm_service
-from app.services.nutrition_service import nutrition_service
+from app.services.meal_persistence import meal_persistence_service
+from app.services.nutrient_aggregation import nutrient_aggregation_service
+from app.services.daily_nutrition_service import daily_nutrition_service
+from app.services.meal_telemetry import meal_telemetry_service
 
 router = APIRouter(prefix="/meals", tags=["Meals"])
 
@@ -31,10 +40,31 @@ async def upload_meal(
     file: UploadFile = File(...),
     meal_type: MealType = MealType.OTHER,
     meal_date: Optional[datetime] = None,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
-    """Upload a meal image, PDF, or CSV file"""
+    """
+    Upload a meal image, PDF, or CSV file
+    
+    OCR, LLM and nutrition lookups can take minutes, so this endpoint opens
+    a database session only for the final write instead of holding a pooled
+    connection for the whole request. The time spent in each stage is stored
+    as MealProcessingTelemetry.
+    """
+    started = time.perf_counter()
+    with collect_stages() as collector:
+        meal = await _process_upload(file, meal_type, meal_date, current_user)
+    if settings.MEAL_TELEMETRY_ENABLED:
+        await meal_telemetry_service.record_upload(meal, collector, time.perf_counter() - started)
+    return meal
+
+
+async def _process_upload(
+    file: UploadFile,
+    meal_type: MealType,
+    meal_date: Optional[datetime],
+    current_user: User,
+) -> Meal:
+    """Extract, normalize and resolve an uploaded file, and store it as a meal"""
     # Determine source type
     file_ext = os.path.splitext(file.filename)[1].lower()
     if file_ext in [".jpg", ".jpeg", ".png", ".gif", ".bmp"]:
@@ -56,21 +86,26 @@ async def upload_meal(
     file_id = str(uuid.uuid4())
     file_path = upload_dir / f"{file_id}{file_ext}"
     
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    with tracer.span("upload.save_file") as span:
+        with open(file_path, "wb") as f:
+            content = await file.read()
+            f.write(content)
+        span.set_attribute("upload.bytes", len(content))
+    UPLOAD_SIZE.labels(source_type.value).observe(len(content))
+    increment("upload.bytes", len(content))
     
     # Extract text using OCR
     raw_text = ""
     try:
-        if source_type == MealSource.IMAGE:
-            raw_text = await ocr_service.extract_text_from_image(str(file_path))
-        elif source_type == MealSource.PDF:
-            raw_text = await ocr_service.extract_text_from_pdf(str(file_path))
-        elif source_type == MealSource.CSV:
-            # For CSV, read directly
-            with open(file_path, "r") as f:
-                raw_text = f.read()
+        with tracer.span("upload.extract_text", **{"upload.source_type": source_type.value}):
+            if source_type == MealSource.IMAGE:
+                raw_text = await ocr_service.extract_text_from_image(str(file_path))
+            elif source_type == MealSource.PDF:
+                raw_text = await ocr_service.extract_text_from_pdf(str(file_path))
+            elif source_type == MealSource.CSV:
+                # For CSV, read directly
+                with open(file_path, "r") as f:
+                    raw_text = f.read()
         
         # Log extracted text length for debugging
         print(f"Extracted {len(raw_text)} characters from {source_type.value} file")
@@ -99,115 +134,52 @@ async def upload_meal(
         # Default to current UTC time as timezone-naive
         meal_date = datetime.now(timezone.utc).replace(tzinfo=None)
     
-    meal = Meal(
-        user_id=current_user.id,
-        meal_type=meal_type,
-        source_type=source_type,
-        source_file_path=str(file_path),
-        raw_text=raw_text,
-        meal_date=meal_date
-    )
-    
-    db.add(meal)
-    await db.flush()
-    
-    # Handle nutrition label vs food items list
+    # Build food items and nutrients in memory, then write them in bulk
     if normalized_data.get("is_nutrition_label"):
         # Create a single food item from nutrition label
         serving_size = normalized_data.get("serving_size", "1 serving")
         nutrients_data = normalized_data.get("nutrients", [])
+        nutrient_rows = meal_persistence_service.label_nutrient_rows(nutrients_data)
         
-        food_item = FoodItem(
-            meal_id=meal.id,
-            name=f"Food item ({serving_size})",
-            normalized_name="nutrition_label_item",
-            quantity=1,
-            unit="serving",
-            description=f"Nutrition label - {serving_size}"
-        )
-        db.add(food_item)
-        await db.flush()
-        
-        # Create nutrients directly from label data
-        created_nutrients_count = 0
-        for nutrient_data in nutrients_data:
-            nutrient_name = nutrient_data.get("name", "").strip()
-            nutrient_value = nutrient_data.get("value", 0)
-            nutrient_unit = nutrient_data.get("unit", "g")
-            
-            # Skip if name is empty or value is invalid
-            if not nutrient_name:
-                print(f"WARNING: Skipping nutrient with empty name: {nutrient_data}")
-                continue
-            
-            try:
-                # Normalize nutrient name
-                normalized_name = nutrient_name.lower().replace(" ", "_")
-                nutrient_value_float = float(nutrient_value) if nutrient_value is not None else 0.0
-                
-                nutrient = Nutrient(
-                    food_item_id=food_item.id,
-                    name=normalized_name,
-                    value=nutrient_value_float,
-                    unit=nutrient_unit,
-                    per_100g=None  # Not applicable for nutrition labels
-                )
-                db.add(nutrient)
-                created_nutrients_count += 1
-            except (ValueError, TypeError) as e:
-                print(f"WARNING: Failed to create nutrient {nutrient_name}: {e}, data: {nutrient_data}")
-                continue
-        
-        print(f"Created {created_nutrients_count} nutrients from nutrition label")
-        
-        if created_nutrients_count == 0:
+        print(f"Created {len(nutrient_rows)} nutrients from nutrition label")
+        if not nutrient_rows:
             print(f"WARNING: No nutrients were created from nutrition label. Raw data: {nutrients_data}")
+        
+        food_items = [(
+            {
+                "name": f"Food item ({serving_size})",
+                "normalized_name": "nutrition_label_item",
+                "quantity": 1,
+                "unit": "serving",
+                "description": f"Nutrition label - {serving_size}",
+            },
+            nutrient_rows,
+        )]
     else:
-        # Handle regular food items list
-        food_items_data = normalized_data.get("food_items", [])
-        for item_data in food_items_data:
-            food_item = FoodItem(
-                meal_id=meal.id,
-                name=item_data.get("name", ""),
-                normalized_name=item_data.get("name", ""),
-                quantity=item_data.get("quantity"),
-                unit=item_data.get("unit", "g"),
-                brand=item_data.get("brand")
-            )
-            db.add(food_item)
-            await db.flush()
-            
-            # Get nutrition data from APIs (Open Food Facts or USDA)
-            nutrition_data = await nutrition_service.get_nutrition_data_async(
-                food_item.normalized_name or food_item.name,
-                food_item.quantity or 100,
-                food_item.unit or "g",
-                barcode=food_item.barcode
-            )
-            
-            # Create nutrient objects
-            for nutrient_name, value in nutrition_data.items():
-                nutrient = Nutrient(
-                    food_item_id=food_item.id,
-                    name=nutrient_name,
-                    value=value,
-                    unit=nutrition_service.nutrient_units.get(nutrient_name, "g"),
-                    per_100g=value / (food_item.quantity / 100.0) if food_item.quantity and food_item.quantity > 0 else value
-                )
-                db.add(nutrient)
-    
-    await db.commit()
-    await db.refresh(meal)
+        # Handle regular food items list (nutrition from USDA, looked up concurrently)
+        food_items = await meal_persistence_service.resolve_food_items([
+            {
+                "name": item_data.get("name", ""),
+                "normalized_name": item_data.get("name", ""),
+                "quantity": item_data.get("quantity"),
+                "unit": item_data.get("unit", "g"),
+                "brand": item_data.get("brand"),
+            }
+            for item_data in normalized_data.get("food_items", [])
+        ])
     
-    # Load relationships
-    result = await db.execute(
-        select(Meal)
-        .where(Meal.id == meal.id)
-        .options(selectinload(Meal.food_items).selectinload(FoodItem.nutrients))
+    meal = Meal(
+        user_id=current_user.id,
+        meal_type=meal_type,
+        source_type=source_type,
+        source_file_path=str(file_path),
+        raw_text=raw_text,
+        meal_date=meal_date
     )
-    meal = result.scalar_one()
     
-    return meal
+    with tracer.span("upload.persist"):
+        async with async_session_maker() as db:
+            return await meal_persistence_service.persist_meal(db, meal, food_items)
 
 
 @router.post("", response_model=MealResponse, status_code=status.HTTP_201_CREATED)
@@ -227,6 +199,18 @@ async def create_meal(
         # Default to current UTC time as timezone-naive
         meal_date_value = datetime.now(timezone.utc).replace(tzinfo=None)
     
+    # Get nutrition data from APIs before touching the database
+    food_items = await meal_persistence_service.resolve_food_items([
+        {
+            "name": item_data.name,
+            "quantity": item_data.quantity,
+            "unit": item_data.unit,
+            "brand": item_data.brand,
+            "barcode": item_data.barcode,
+        }
+        for item_data in meal_data.food_items
+    ])
+    
     meal = Meal(
         user_id=current_user.id,
         meal_type=meal_data.meal_type,
@@ -235,120 +219,41 @@ async def create_meal(
         meal_date=meal_date_value
     )
     
-    db.add(meal)
-    await db.flush()
-    
-    # Create food items
-    for item_data in meal_data.food_items:
-        food_item = FoodItem(
-            meal_id=meal.id,
-            name=item_data.name,
-            quantity=item_data.quantity,
-            unit=item_data.unit,
-            brand=item_data.brand,
-            barcode=item_data.barcode
-        )
-        db.add(food_item)
-        await db.flush()
-        
-        # Get nutrition data from APIs (Open Food Facts or USDA)
-        nutrition_data = await nutrition_service.get_nutrition_data_async(
-            food_item.name,
-            food_item.quantity or 100,
-            food_item.unit or "g",
-            barcode=food_item.barcode
-        )
-        
-        # Create nutrient objects
-        for nutrient_name, value in nutrition_data.items():
-            nutrient = Nutrient(
-                food_item_id=food_item.id,
-                name=nutrient_name,
-                value=value,
-                unit=nutrition_service.nutrient_units.get(nutrient_name, "g"),
-                per_100g=value / (food_item.quantity / 100.0) if food_item.quantity and food_item.quantity > 0 else value
-            )
-            db.add(nutrient)
-    
-    await db.commit()
-    await db.refresh(meal)
-    
-    result = await db.execute(
-        select(Meal)
-        .where(Meal.id == meal.id)
-        .options(selectinload(Meal.food_items).selectinload(FoodItem.nutrients))
-    )
-    meal = result.scalar_one()
-    
-    return meal
+    return await meal_persistence_service.persist_meal(db, meal, food_items)
 
 
-@router.get("", response_model=List[MealResponse])
-async def get_meals(
-    skip: int = 0,
-    limit: int = 100,
-    start_date: Optional[date] = None,
-    end_date: Optional[date] = None,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
-):
-    """Get user's meals"""
-    query = select(Meal).where(Meal.user_id == current_user.id)
-    
-    if start_date:
-        query = query.where(Meal.meal_date >= start_date)
-    if end_date:
-        query = query.where(Meal.meal_date <= end_date)
-    
-    query = query.order_by(Meal.meal_date.desc()).offset(skip).limit(limit)
-    query = query.options(selectinload(Meal.food_items).selectinload(FoodItem.nutrients))
-    
-    result = await db.execute(query)
-    meals = result.scalars().all()
-    
-    return meals
+# Heavy columns that GET /meals only returns when requested via `include`
+OPTIONAL_MEAL_FIELDS = {"raw_text"}
 
 
-@router.get("/{meal_id}", response_model=MealWithNutrients)
-async def get_meal(
-    meal_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
-):
-    """Get a specific meal with nutrients"""
-    result = await db.execute(
-        select(Meal)
-        .where(and_(Meal.id == meal_id, Meal.user_id == current_user.id))
-        .options(selectinload(Meal.food_items).selectinload(FoodItem.nutrients))
-    )
-    meal = result.scalar_one_or_none()
-    
-    if not meal:
+def _encode_cursor(meal: Meal) -> str:
+    """Encode the keyset position (meal_date, id) of a meal as an opaque cursor"""
+    raw = f"{meal.meal_date.isoformat()}|{meal.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by _encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        meal_date_str, meal_id_str = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(meal_date_str), int(meal_id_str)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Meal not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
-    
-    # Calculate total nutrients
-    total_nutrients = {}
-    for food_item in meal.food_items:
-        for nutrient in food_item.nutrients:
-            if nutrient.name not in total_nutrients:
-                total_nutrients[nutrient.name] = {
-                    "name": nutrient.name,
-                    "value": 0,
-                    "unit": nutrient.unit
-                }
-            total_nutrients[nutrient.name]["value"] += nutrient.value
-    
-    from app.schemas.meal import MealResponse
-    meal_dict = {
+
+
+def _serialize_meal(meal: Meal, include_raw_text: bool = True) -> dict:
+    """Build a meal response without touching columns or relationships that weren't loaded"""
+    return {
         "id": meal.id,
         "user_id": meal.user_id,
         "meal_type": meal.meal_type,
         "source_type": meal.source_type,
         "source_file_path": meal.source_file_path,
-        "raw_text": meal.raw_text,
+        "raw_text": meal.raw_text if include_raw_text else None,
         "notes": meal.notes,
         "meal_date": meal.meal_date,
         "food_items": [
@@ -361,15 +266,97 @@ async def get_meal(
                 "brand": item.brand,
                 "barcode": item.barcode,
                 "description": item.description,
+                "nutrition_status": item.nutrition_status,
                 "created_at": item.created_at,
             }
             for item in meal.food_items
         ],
         "created_at": meal.created_at,
         "updated_at": meal.updated_at,
-        "total_nutrients": list(total_nutrients.values())
     }
-    return meal_dict
+
+
+@router.get("", response_model=List[MealResponse])
+async def get_meals(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    include: Optional[str] = Query(None, description="Comma-separated heavy fields to include (raw_text)"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get user's meals, newest first.
+    Pages are keyset-based on (meal_date, id): pass the X-Next-Cursor header
+    of a response as `cursor` to fetch the next page.
+    """
+    include_fields = {field.strip() for field in include.split(",")} if include else set()
+    unknown_fields = include_fields - OPTIONAL_MEAL_FIELDS
+    if unknown_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown include fields: {', '.join(sorted(unknown_fields))}"
+        )
+    include_raw_text = "raw_text" in include_fields
+    
+    query = select(Meal).where(Meal.user_id == current_user.id)
+    
+    if start_date:
+        query = query.where(Meal.meal_date >= start_date)
+    if end_date:
+        query = query.where(Meal.meal_date <= end_date)
+    if cursor:
+        cursor_date, cursor_id = _decode_cursor(cursor)
+        query = query.where(tuple_(Meal.meal_date, Meal.id) < tuple_(cursor_date, cursor_id))
+    
+    # Fetch one extra row to know whether another page exists
+    query = query.order_by(Meal.meal_date.desc(), Meal.id.desc()).limit(limit + 1)
+    # Nutrients are not part of MealResponse, so only food items are loaded
+    query = query.options(selectinload(Meal.food_items))
+    if not include_raw_text:
+        query = query.options(defer(Meal.raw_text))
+    
+    result = await db.execute(query)
+    meals = result.scalars().all()
+    
+    if len(meals) > limit:
+        meals = meals[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(meals[-1])
+    
+    return [_serialize_meal(meal, include_raw_text) for meal in meals]
+
+
+@router.get("/{meal_id}", response_model=MealWithNutrients)
+async def get_meal(
+    meal_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get a specific meal with nutrients (supports If-None-Match)"""
+    async def compute():
+        result = await db.execute(
+            select(Meal)
+            .where(and_(Meal.id == meal_id, Meal.user_id == current_user.id))
+            .options(selectinload(Meal.food_items))
+        )
+        meal = result.scalar_one_or_none()
+        
+        if not meal:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Meal not found"
+            )
+        
+        meal_dict = _serialize_meal(meal)
+        meal_dict["total_nutrients"] = nutrient_aggregation_service.totals(
+            nutrient_aggregation_service.meal_matrix(meal)
+        )
+        return MealWithNutrients.model_validate(meal_dict)
+    
+    return await cached_json_response(request, db, current_user.id, f"meal:{meal_id}", compute)
 
 
 @router.delete("/{meal_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -397,7 +384,11 @@ async def delete_meal(
         except Exception:
             pass
     
+    meal_day = meal.meal_date.date()
     await db.delete(meal)
+    await db.flush()
+    await daily_nutrition_service.refresh_days(db, current_user.id, [meal_day])
+    await bump_data_version(db, current_user.id)
     await db.commit()
     
     return None
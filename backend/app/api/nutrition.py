@@ -1,185 +1,154 @@
 """
 Nutrition and health insights routes
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
-from sqlalchemy.orm import selectinload
-from typing import Optional
+from sqlalchemy import select
+from typing import List, Optional
 from datetime import date, datetime, timedelta, timezone
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, set_statement_timeout
+from app.core.response_cache import cached_json_response
 from app.core.security import get_current_active_user
+from app.api.dependencies import get_read_db
 from app.models.user import User
 from app.models.meal import Meal
-from app.models.food_item import FoodItem
-from app.services.llm_service import llm_service
+from app.services.insight_service import insight_service
+from app.services.nutrient_aggregation import nutrient_aggregation_service
+from app.services.daily_nutrition_service import daily_nutrition_service, TrendBucket, TrendStatistic
 
 router = APIRouter(prefix="/nutrition", tags=["Nutrition"])
 
 
 @router.get("/daily")
 async def get_daily_nutrition(
+    request: Request,
     target_date: Optional[date] = None,
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get daily nutrition summary for a specific date"""
+    """Get daily nutrition summary for a specific date (supports If-None-Match)"""
     if not target_date:
         target_date = datetime.now(timezone.utc).date()
     
-    # Get all meals for the date using date range comparison
-    # meal_date is stored as timezone-naive DateTime (assumed to be UTC)
-    # Create datetime range covering the entire target date (00:00:00 to 23:59:59.999999)
-    start_of_day = datetime.combine(target_date, datetime.min.time())
-    end_of_day = datetime.combine(target_date, datetime.max.time())
-    
-    result = await db.execute(
-        select(Meal)
-        .where(
-            and_(
-                Meal.user_id == current_user.id,
-                Meal.meal_date >= start_of_day,
-                Meal.meal_date <= end_of_day
+    async def compute():
+        # meal_date is stored as timezone-naive DateTime (assumed to be UTC)
+        matrix = await nutrient_aggregation_service.load_matrix(db, current_user.id, target_date, target_date)
+        
+        if settings.DEBUG:
+            # Debug logging - check recent meals for this user to see what dates exist
+            all_meals_result = await db.execute(
+                select(Meal.id, Meal.meal_date)
+                .where(Meal.user_id == current_user.id)
+                .order_by(Meal.meal_date.desc())
+                .limit(10)
             )
-        )
-        .options(selectinload(Meal.food_items).selectinload(FoodItem.nutrients))
-    )
-    meals = result.scalars().all()
+            print(f"Found {matrix.meal_count} meals for user {current_user.id} on {target_date}")
+            print(f"Recent meals for user {current_user.id} (last 10):")
+            for meal_id, meal_date in all_meals_result.all():
+                meal_date_only = meal_date.date() if meal_date else None
+                matches = "✓" if meal_date_only == target_date else "✗"
+                print(f"  {matches} Meal ID {meal_id}: meal_date = {meal_date}, extracted date = {meal_date_only}")
+        
+        return {
+            "date": target_date,
+            "nutrients": nutrient_aggregation_service.totals(matrix),
+            "meal_count": matrix.meal_count
+        }
     
-    # Debug logging - check ALL meals for this user to see what dates exist
-    all_meals_result = await db.execute(
-        select(Meal).where(Meal.user_id == current_user.id).order_by(Meal.meal_date.desc()).limit(10)
-    )
-    all_meals = all_meals_result.scalars().all()
-    print(f"Querying meals for date: {target_date} (UTC range: {start_of_day} to {end_of_day})")
-    print(f"Found {len(meals)} meals for user {current_user.id} on {target_date}")
-    print(f"Recent meals for user {current_user.id} (last 10):")
-    for meal in all_meals:
-        meal_date_str = str(meal.meal_date) if meal.meal_date else "None"
-        meal_date_obj = meal.meal_date
-        meal_date_only = meal_date_obj.date() if meal_date_obj else None
-        matches = "✓" if meal_date_only == target_date else "✗"
-        print(f"  {matches} Meal ID {meal.id}: meal_date = {meal_date_str}, extracted date = {meal_date_only}")
-    
-    # Aggregate nutrients
-    nutrient_totals = {}
-    for meal in meals:
-        for food_item in meal.food_items:
-            for nutrient in food_item.nutrients:
-                if nutrient.name not in nutrient_totals:
-                    nutrient_totals[nutrient.name] = {
-                        "name": nutrient.name,
-                        "value": 0,
-                        "unit": nutrient.unit
-                    }
-                nutrient_totals[nutrient.name]["value"] += nutrient.value
-    
-    return {
-        "date": target_date,
-        "nutrients": list(nutrient_totals.values()),
-        "meal_count": len(meals)
-    }
+    return await cached_json_response(request, db, current_user.id, f"daily:{target_date}", compute)
 
 
 @router.get("/summary")
 async def get_nutrition_summary(
-    days: int = 7,
+    request: Request,
+    days: int = Query(7, ge=1, le=settings.TRENDS_MAX_DAYS),
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get nutrition summary for the last N days"""
-    end_date = date.today()
+    """Get nutrition summary for the last N days (supports If-None-Match)"""
+    end_date = datetime.now(timezone.utc).date()
     start_date = end_date - timedelta(days=days-1)
     
-    # Use date comparison for consistency
+    async def compute():
+        await set_statement_timeout(db, settings.DB_REPORT_STATEMENT_TIMEOUT_MS)
+        matrix = await nutrient_aggregation_service.load_matrix(db, current_user.id, start_date, end_date)
+        return {
+            "period_days": days,
+            "start_date": start_date,
+            "end_date": end_date,
+            "nutrients": nutrient_aggregation_service.summary(matrix, start_date, end_date),
+            "total_meals": matrix.meal_count
+        }
     
-    result = await db.execute(
-        select(Meal)
-        .where(
-            and_(
-                Meal.user_id == current_user.id,
-                func.date(Meal.meal_date) >= start_date,
-                func.date(Meal.meal_date) <= end_date
-            )
-        )
-        .options(selectinload(Meal.food_items).selectinload(FoodItem.nutrients))
-    )
-    meals = result.scalars().all()
+    return await cached_json_response(request, db, current_user.id, f"summary:{start_date}:{end_date}", compute)
+
+
+@router.get("/trends")
+async def get_nutrition_trends(
+    request: Request,
+    nutrients: List[str] = Query(["calories", "protein", "carbs", "fat"]),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    bucket: TrendBucket = TrendBucket.DAY,
+    statistic: TrendStatistic = TrendStatistic.MEAN,
+    rolling_days: Optional[int] = Query(None, ge=2, le=90),
+    max_points: Optional[int] = Query(None, ge=2),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get bucketed nutrient series for a date range (defaults to the last 30 days)
     
-    # Aggregate nutrients
-    nutrient_totals = {}
-    for meal in meals:
-        for food_item in meal.food_items:
-            for nutrient in food_item.nutrients:
-                if nutrient.name not in nutrient_totals:
-                    nutrient_totals[nutrient.name] = {
-                        "name": nutrient.name,
-                        "total": 0,
-                        "average_per_day": 0,
-                        "unit": nutrient.unit
-                    }
-                nutrient_totals[nutrient.name]["total"] += nutrient.value
+    Each point is the mean (or sum) of the daily totals in its day, week or
+    month bucket; days without meals count as zero. Supports If-None-Match.
+    """
+    if not end_date:
+        end_date = datetime.now(timezone.utc).date()
+    if not start_date:
+        start_date = end_date - timedelta(days=29)
     
-    # Calculate averages
-    for nutrient in nutrient_totals.values():
-        nutrient["average_per_day"] = nutrient["total"] / days
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date must not be after end_date"
+        )
+    if (end_date - start_date).days + 1 > settings.TRENDS_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range cannot exceed {settings.TRENDS_MAX_DAYS} days"
+        )
+    
+    async def compute():
+        await set_statement_timeout(db, settings.DB_REPORT_STATEMENT_TIMEOUT_MS)
+        return await daily_nutrition_service.trends(
+            db,
+            current_user.id,
+            nutrients,
+            start_date,
+            end_date,
+            bucket=bucket,
+            statistic=statistic,
+            rolling_days=rolling_days,
+            max_points=max_points,
+        )
     
-    return {
-        "period_days": days,
-        "start_date": start_date,
-        "end_date": end_date,
-        "nutrients": list(nutrient_totals.values()),
-        "total_meals": len(meals)
-    }
+    key = f"trends:{start_date}:{end_date}:{bucket.value}:{statistic.value}:{rolling_days}:{max_points}:{','.join(nutrients)}"
+    return await cached_json_response(request, db, current_user.id, key, compute)
 
 
 @router.get("/insights")
 async def get_health_insights(
-    days: int = 7,
+    days: int = Query(7, ge=1, le=settings.INSIGHT_MAX_DAYS),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get AI-generated health insights based on nutrition data"""
-    # Get nutrition summary
-    end_date = date.today()
-    start_date = end_date - timedelta(days=days-1)
-    
-    # Use date comparison for consistency
+    """
+    Get AI-generated health insights based on nutrition data
     
-    result = await db.execute(
-        select(Meal)
-        .where(
-            and_(
-                Meal.user_id == current_user.id,
-                func.date(Meal.meal_date) >= start_date,
-                func.date(Meal.meal_date) <= end_date
-            )
-        )
-        .options(selectinload(Meal.food_items).selectinload(FoodItem.nutrients))
-    )
-    meals = result.scalars().all()
-    
-    # Aggregate nutrients
-    nutrient_summary = {}
-    for meal in meals:
-        for food_item in meal.food_items:
-            for nutrient in food_item.nutrients:
-                if nutrient.name not in nutrient_summary:
-                    nutrient_summary[nutrient.name] = 0
-                nutrient_summary[nutrient.name] += nutrient.value
-    
-    # Generate insights using LLM
-    insights = await llm_service.generate_health_insight(
-        nutrient_summary,
-        time_period=f"{days} days"
-    )
-    
-    return {
-        "period_days": days,
-        "nutrient_summary": nutrient_summary,
-        "explanation": insights.get("explanation", ""),
-        "recommendations": insights.get("recommendations", ""),
-        "disclaimer": "This information is for general educational purposes only and is not intended as medical advice. Please consult with a healthcare professional for personalized recommendations."
-    }
-
+    Serves the insight precomputed by the background scheduler; it is only
+    regenerated here when the user's meals changed or it has expired.
+    Other period lengths are generated on demand and not stored.
+    """
+    return await insight_service.get_insight(db, current_user.id, days)
@@ -0,0 +1,37 @@
+"""
+Health risk routes
+"""
+from fastapi import APIRouter, BackgroundTasks, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from app.core.database import get_db
+from app.core.security import get_current_active_user
+from app.models.user import User
+from app.schemas.risk import RiskScoreResponse
+from app.services.risk_engine import risk_engine
+
+router = APIRouter(prefix="/risks", tags=["Risks"])
+
+
+@router.get("", response_model=List[RiskScoreResponse])
+async def get_risks(
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get nutrition risk scores for the current user
+    
+    Scores are re-evaluated first if the user's meals changed since the last
+    evaluation. Explanations are generated in the background after the
+    response is sent; risks without one yet have a null explanation.
+    """
+    await risk_engine.evaluate_user_if_stale(db, current_user.id)
+    risks = await risk_engine.get_risks(db, current_user.id)
+    
+    pending = [risk.id for risk in risks if risk.explanation is None]
+    if pending:
+        background_tasks.add_task(risk_engine.explain_pending, pending)
+    
+    return risks
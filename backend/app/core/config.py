@@ -22,12 +22,44 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "vitalens_dev_password"
     POSTGRES_DB: str = "vitalens_db"
     
+    # Read replica for read-only endpoints (optional)
+    DATABASE_REPLICA_URL: Optional[str] = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0  # Users read from the primary this long after writing
+    REPLICA_HEALTH_CHECK_INTERVAL: float = 10.0  # Seconds between replica health checks
+    REPLICA_HEALTH_CHECK_TIMEOUT: float = 1.0
+    
+    # Database pool and statement settings
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0  # Seconds to wait for a pooled connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = False
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 256
+    DB_STATEMENT_CACHE_SIZE: int = 256
+    DB_STATEMENT_TIMEOUT_MS: int = 5000  # Default per statement (0 disables)
+    DB_REPORT_STATEMENT_TIMEOUT_MS: int = 30000  # Multi-month aggregation endpoints
+    DB_BACKGROUND_STATEMENT_TIMEOUT_MS: int = 120000  # Scheduler batch jobs
+    
     # JWT Configuration
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     JWT_REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12  # Existing hashes are upgraded on login when this changes
+    PASSWORD_HASH_WORKERS: int = 4  # Threads dedicated to bcrypt
+    PASSWORD_HASH_MAX_PENDING: int = 64  # Hash operations allowed in flight before rejecting
+    AUTH_MAX_CONCURRENT_PER_KEY: int = 2  # Concurrent login/register attempts per IP or username
+    
+    # Authenticated user cache (0 disables caching)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 10000
+    
+    # ETag response cache for nutrition reads (0 users disables server-side caching)
+    RESPONSE_CACHE_MAX_USERS: int = 5000
+    RESPONSE_CACHE_MAX_ENTRIES_PER_USER: int = 32
+    
     # Ollama Configuration
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3.1"
@@ -50,6 +82,98 @@ class Settings(BaseSettings):
     
     # Nutrition API Configuration
     USDA_API_KEY: Optional[str] = None  # Required for USDA FoodData Central API (get free key at https://fdc.nal.usda.gov/api-guide.html)
+    USDA_API_BASE_URL: str = "https://api.nal.usda.gov/fdc/v1"  # Point at benchmarks/stubs.py for load tests
+    
+    # Also write legacy one-row-per-nutrient records alongside the packed
+    # food_items.nutrient_values vector (reads only use the packed form)
+    NUTRIENT_ROW_STORAGE: bool = False
+    
+    # Longest date range served by /nutrition/trends
+    TRENDS_MAX_DAYS: int = 1095
+    
+    # Risk scoring
+    RISK_WINDOW_DAYS: int = 14  # Days of intake averaged per evaluation
+    RISK_MIN_LOGGED_DAYS: int = 3  # Users with fewer logged days in the window get no risks
+    RISK_MIN_SCORE: float = 10.0  # Scores below this are not stored
+    RISK_BATCH_SIZE: int = 500  # Users evaluated per batch
+    
+    # Health insights
+    INSIGHT_PERIOD_DAYS: int = 7  # Period precomputed by the scheduler (the only one stored)
+    INSIGHT_MAX_DAYS: int = 90  # Longest period served on demand
+    INSIGHT_TTL_HOURS: int = 24  # Stored insights are regenerated after this
+    
+    # Background precomputation scheduler (hours are UTC; the window may wrap midnight)
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_INTERVAL_SECONDS: int = 900
+    SCHEDULER_OFFPEAK_START_HOUR: int = 2
+    SCHEDULER_OFFPEAK_END_HOUR: int = 6
+    SCHEDULER_CONCURRENCY: int = 2  # Concurrent insight generations (LLM calls)
+    NUTRITION_BACKFILL_BATCH_SIZE: int = 100  # Pending food items looked up per pass (runs at peak too, on spare USDA budget)
+    
+    # Report per-request database query counts and time in X-DB-Query-Count /
+    # X-DB-Query-Time response headers (used by the benchmark suite)
+    QUERY_STATS_HEADERS: bool = False
+    
+    # Per-stage latency (ocr, llm, nutrition, db) in a Server-Timing response
+    # header, and stored per uploaded meal in meal_processing_telemetry
+    SERVER_TIMING_ENABLED: bool = True
+    MEAL_TELEMETRY_ENABLED: bool = True
+    
+    # Prometheus metrics at GET /metrics (set PROMETHEUS_MULTIPROC_DIR when
+    # running several workers so the endpoint aggregates all of them)
+    METRICS_ENABLED: bool = True
+    
+    # Request tracing (W3C traceparent is propagated to USDA and Ollama).
+    # "memory" keeps the latest spans in-process (GET /debug/traces when
+    # DEBUG is on), "file" appends JSON lines to TRACE_FILE
+    TRACING_ENABLED: bool = False
+    TRACE_SAMPLE_RATE: float = 1.0  # Fraction of new traces recorded; incoming sampling decisions are kept
+    TRACE_EXPORTER: str = "memory"
+    TRACE_FILE: str = "traces.jsonl"
+    TRACE_MEMORY_MAX_SPANS: int = 10000
+    
+    # Event-loop stall monitor and on-demand sampling profiler (/admin, superusers only)
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL: float = 0.05  # Seconds between heartbeats
+    LOOP_STALL_THRESHOLD: float = 0.2  # Heartbeat lag (seconds) recorded as a stall, with the blocking stack
+    LOOP_STALL_HISTORY: int = 100  # Recent stalls kept for /admin/loop-stalls
+    PROFILER_MAX_SECONDS: float = 60.0
+    
+    # Load shedding: SHED_EXPENSIVE_PATHS (prefixes under API_PREFIX) get 503 +
+    # Retry-After once any signal passes its threshold; other writes only past
+    # SHED_CRITICAL_FACTOR times the loop lag / pool wait thresholds. Reads and
+    # SHED_EXEMPT_PATHS are never shed. A threshold of 0 disables its signal
+    LOAD_SHEDDING_ENABLED: bool = True
+    SHED_LOOP_LAG_SECONDS: float = 0.1  # Recent average event-loop lag
+    SHED_DB_POOL_WAIT_SECONDS: float = 0.5  # Recent average (or oldest pending) pool checkout wait
+    SHED_OCR_IN_FLIGHT: int = 4  # Documents being OCRed in this worker
+    SHED_LLM_IN_FLIGHT: int = 8  # Ollama generations running or queued (OLLAMA_MAX_CONNECTIONS run at once)
+    SHED_CRITICAL_FACTOR: float = 3.0
+    SHED_RETRY_AFTER_SECONDS: int = 10
+    SHED_EXPENSIVE_PATHS: str = "/meals/upload,/nutrition/insights"
+    SHED_EXEMPT_PATHS: str = "/auth,/admin"
+    
+    # Outbound HTTP Configuration
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    HTTP2_ENABLED: bool = True  # Used for HTTPS upstreams when the h2 package is installed
+    HTTP_RETRY_ATTEMPTS: int = 3  # Total attempts for idempotent requests (at least 1)
+    HTTP_RETRY_BACKOFF_BASE: float = 0.25  # Seconds, doubled per attempt with full jitter
+    HTTP_RETRY_BACKOFF_MAX: float = 4.0
+    USDA_READ_TIMEOUT: float = 10.0
+    # USDA request budget (api.data.gov keys allow 1,000 requests per hour),
+    # shared by the workers that can see USDA_BUDGET_FILE (put it on a shared
+    # volume for several containers). Background backfills leave the last
+    # USDA_BUDGET_RESERVE of it to interactive lookups. 0 disables the budget
+    USDA_REQUESTS_PER_HOUR: int = 1000
+    USDA_BUDGET_FILE: str = "/tmp/vitalens-usda-budget.json"
+    USDA_BUDGET_RESERVE: float = 0.2
+    USDA_BUDGET_MAX_WAIT: float = 2.0  # Seconds an interactive lookup waits for budget
+    USDA_MAX_CONNECTIONS: int = 20
+    USDA_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    OLLAMA_READ_TIMEOUT: float = 180.0  # LLM processing (nutrition label parsing) can take long
+    OLLAMA_MAX_CONNECTIONS: int = 4
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = 4
     
     @property
     def database_url(self) -> str:
@@ -67,6 +191,13 @@ class Settings(BaseSettings):
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
     
+    @property
+    def replica_database_url(self) -> Optional[str]:
+        """Async URL of the read replica, if one is configured"""
+        if self.DATABASE_REPLICA_URL and self.DATABASE_REPLICA_URL.startswith("postgresql://"):
+            return self.DATABASE_REPLICA_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+        return self.DATABASE_REPLICA_URL
+    
     @property
     def sync_database_url(self) -> str:
         """
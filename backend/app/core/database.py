@@ -1,19 +1,52 @@
 """
 Database connection and session management
 """
+import asyncio
+import time
+from typing import Dict, Optional
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
 from app.core.config import settings
+from app.core.metrics import InstrumentedAsyncQueuePool
+
+
+def _engine_options(url: str, name: str) -> dict:
+    """Engine keyword arguments for a database URL"""
+    options = {
+        "echo": settings.DEBUG,
+        # Pre-ping costs a round-trip per checkout; recycling stale
+        # connections is usually enough
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if url.startswith("sqlite"):
+        return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if settings.METRICS_ENABLED or settings.LOAD_SHEDDING_ENABLED:
+        # Records checkout waits, labelled by the pool's logging name
+        options.update(poolclass=InstrumentedAsyncQueuePool, pool_logging_name=name)
+    if "+asyncpg" in url:
+        server_settings = {"application_name": settings.APP_NAME}
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        options["connect_args"] = {
+            # SQLAlchemy's per-connection cache of prepared statements
+            "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+            # asyncpg's own statement cache (set both to 0 behind pgbouncer in transaction mode)
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": server_settings,
+        }
+    return options
+
 
 # Create async engine
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.DEBUG,
-    pool_pre_ping=True,  # Verify connections before using
-    pool_size=10,
-    max_overflow=20,
-)
+engine = create_async_engine(settings.database_url, **_engine_options(settings.database_url, "primary"))
 
 # Create async session factory
 async_session_maker = async_sessionmaker(
@@ -24,6 +57,89 @@ async_session_maker = async_sessionmaker(
     autoflush=False,
 )
 
+# Optional read replica engine and session factory
+replica_engine = (
+    create_async_engine(settings.replica_database_url, **_engine_options(settings.replica_database_url, "replica"))
+    if settings.replica_database_url else None
+)
+replica_session_maker = (
+    async_sessionmaker(
+        replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+    if replica_engine is not None else None
+)
+
+
+class ReplicaRouter:
+    """
+    Chooses the session factory for read-only requests.
+
+    Reads go to the replica unless none is configured, its last health
+    check failed, or the user wrote within READ_YOUR_WRITES_SECONDS (so a
+    user always sees their own new meals despite replication lag). Writes
+    are recorded per process, so the window holds for requests served by
+    the worker that handled the write.
+    """
+
+    def __init__(self):
+        self._recent_writes: Dict[int, float] = {}
+        self._healthy = True
+        self._checked_at = float("-inf")
+        self._check_lock = asyncio.Lock()
+
+    def record_write(self, user_id: int):
+        """Pin a user's reads to the primary for the read-your-writes window"""
+        now = time.monotonic()
+        if len(self._recent_writes) > 10000:
+            self._recent_writes = {uid: until for uid, until in self._recent_writes.items() if until > now}
+        self._recent_writes[user_id] = now + settings.READ_YOUR_WRITES_SECONDS
+
+    def _recently_wrote(self, user_id: Optional[int]) -> bool:
+        until = self._recent_writes.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    async def replica_healthy(self) -> bool:
+        """Replica health, re-checked at most every REPLICA_HEALTH_CHECK_INTERVAL seconds"""
+        if replica_engine is None:
+            return False
+        if time.monotonic() - self._checked_at < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+            return self._healthy
+        async with self._check_lock:
+            if time.monotonic() - self._checked_at >= settings.REPLICA_HEALTH_CHECK_INTERVAL:
+                try:
+                    await asyncio.wait_for(self._ping(), settings.REPLICA_HEALTH_CHECK_TIMEOUT)
+                    healthy = True
+                except Exception as e:
+                    healthy = False
+                    if self._healthy:
+                        print(f"Read replica unhealthy, falling back to primary: {e}")
+                self._healthy = healthy
+                self._checked_at = time.monotonic()
+        return self._healthy
+
+    async def _ping(self):
+        async with replica_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    def mark_unhealthy(self):
+        """Route reads to the primary until the next health check"""
+        self._healthy = False
+        self._checked_at = time.monotonic()
+
+    async def session_maker_for(self, user_id: Optional[int]) -> async_sessionmaker:
+        """Session factory to use for a read-only request by a user"""
+        if self._recently_wrote(user_id) or not await self.replica_healthy():
+            return async_session_maker
+        return replica_session_maker
+
+
+# Global replica router instance
+replica_router = ReplicaRouter()
+
 # Base class for models
 Base = declarative_base()
 
@@ -46,3 +162,12 @@ async def get_db() -> AsyncSession:
         finally:
             await session.close()
 
+
+
+async def set_statement_timeout(session: AsyncSession, timeout_ms: int):
+    """
+    Override the statement timeout for the rest of the session's current
+    transaction (PostgreSQL only; 0 disables the timeout).
+    """
+    if session.bind.dialect.name == "postgresql":
+        await session.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
@@ -0,0 +1,170 @@
+"""
+Shared outbound HTTP clients with per-upstream connection pools
+"""
+import asyncio
+import importlib.util
+import random
+import time
+from typing import Any, Dict, Optional
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import UPSTREAM_REQUEST_DURATION
+from app.core.rate_limit import INTERACTIVE, RateLimited, SharedTokenBucket, parse_retry_after
+from app.core.tracing import inject_trace_context, tracer
+
+# Statuses worth retrying for idempotent requests
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class HTTPClientManager:
+    """
+    Owns one pooled httpx.AsyncClient per upstream service.
+    Clients are created at application startup (or lazily on first use, e.g. in
+    scripts) and closed from the FastAPI lifespan on shutdown, so connections
+    and TLS sessions are reused across requests instead of per call.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._http2_available = importlib.util.find_spec("h2") is not None
+        # Request budgets of rate-limited upstreams
+        self.budgets: Dict[str, SharedTokenBucket] = {}
+        if settings.USDA_REQUESTS_PER_HOUR > 0:
+            self.budgets["usda"] = SharedTokenBucket(
+                "usda",
+                settings.USDA_BUDGET_FILE,
+                capacity=settings.USDA_REQUESTS_PER_HOUR,
+                period=3600,
+                reserve=settings.USDA_BUDGET_RESERVE,
+            )
+
+    def _upstream_config(self, name: str) -> dict:
+        """Pool sizing and timeouts for an upstream"""
+        if name == "usda":
+            return {
+                "read_timeout": settings.USDA_READ_TIMEOUT,
+                "max_connections": settings.USDA_MAX_CONNECTIONS,
+                "max_keepalive_connections": settings.USDA_MAX_KEEPALIVE_CONNECTIONS,
+                "http2": settings.HTTP2_ENABLED and self._http2_available,
+            }
+        if name == "ollama":
+            return {
+                "read_timeout": settings.OLLAMA_READ_TIMEOUT,
+                "max_connections": settings.OLLAMA_MAX_CONNECTIONS,
+                "max_keepalive_connections": settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+                # Ollama is plain HTTP on the local network
+                "http2": False,
+            }
+        raise ValueError(f"Unknown upstream: {name}")
+
+    def _create_client(self, name: str) -> httpx.AsyncClient:
+        config = self._upstream_config(name)
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(config["read_timeout"], connect=settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=config["max_connections"],
+                max_keepalive_connections=config["max_keepalive_connections"],
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            http2=config["http2"],
+            event_hooks={"request": [inject_trace_context]},
+        )
+
+    def start(self):
+        """Create the clients for all known upstreams"""
+        for name in ("usda", "ollama"):
+            self.get(name)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Get the shared client for an upstream, creating it if needed"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create_client(name)
+            self._clients[name] = client
+        return client
+
+    async def get_with_retry(
+        self,
+        name: str,
+        url: str,
+        params: Optional[dict] = None,
+        attempts: Optional[int] = None,
+        priority: str = INTERACTIVE,
+    ) -> httpx.Response:
+        """Issue a GET with retries (see request_with_retry)"""
+        return await self.request_with_retry(name, "GET", url, params=params, attempts=attempts, priority=priority)
+
+    async def request_with_retry(
+        self,
+        name: str,
+        method: str,
+        url: str,
+        params: Optional[dict] = None,
+        json: Any = None,
+        attempts: Optional[int] = None,
+        priority: str = INTERACTIVE,
+    ) -> httpx.Response:
+        """
+        Issue an idempotent request (a GET, or a POST that only reads),
+        retrying transport errors and 5xx responses with exponential backoff
+        and full jitter.
+        The final response is returned as-is (callers call raise_for_status).
+
+        For upstreams with a request budget, every attempt takes a token
+        (interactive callers wait up to USDA_BUDGET_MAX_WAIT seconds for one,
+        background callers not at all) and 429s are retried after their
+        Retry-After. Raises RateLimited when the budget cannot be met.
+        """
+        attempts = max(1, attempts or settings.HTTP_RETRY_ATTEMPTS)
+        client = self.get(name)
+        budget = self.budgets.get(name)
+        max_wait = settings.USDA_BUDGET_MAX_WAIT if priority == INTERACTIVE else 0.0
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            if budget is not None:
+                await budget.acquire(priority, max_wait)
+            retry_after = None
+            started = time.perf_counter()
+            # The URL excludes params, which may carry API keys
+            with tracer.span(f"{name} {method}", **{"http.url": url, "http.attempt": attempt + 1}) as span:
+                try:
+                    response = await client.request(method, url, params=params, json=json)
+                    UPSTREAM_REQUEST_DURATION.labels(name, str(response.status_code)).observe(time.perf_counter() - started)
+                    span.set_attribute("http.status_code", response.status_code)
+                    remaining = response.headers.get("X-RateLimit-Remaining", "")
+                    if budget is not None and remaining.isdigit():
+                        budget.sync_remaining(int(remaining))
+                    if response.status_code == 429:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        if budget is not None:
+                            budget.block(retry_after)
+                        if last_attempt or retry_after > max_wait:
+                            raise RateLimited(name, retry_after)
+                    elif response.status_code not in RETRYABLE_STATUS_CODES or last_attempt:
+                        return response
+                except httpx.TransportError as e:
+                    UPSTREAM_REQUEST_DURATION.labels(name, "error").observe(time.perf_counter() - started)
+                    span.record_error(e)
+                    if last_attempt:
+                        raise
+
+            if retry_after is not None:
+                # The budget (if any) waits out the block before the next attempt
+                if budget is None:
+                    await asyncio.sleep(retry_after)
+                continue
+            backoff = min(settings.HTTP_RETRY_BACKOFF_MAX, settings.HTTP_RETRY_BACKOFF_BASE * (2 ** attempt))
+            await asyncio.sleep(random.uniform(0, backoff))
+
+    async def close(self):
+        """Close all clients and their connection pools"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+# Global HTTP client manager instance
+http_clients = HTTPClientManager()
@@ -0,0 +1,175 @@
+"""
+Lightweight per-stage timing of hot code paths
+"""
+import math
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+from app.core.tracing import Span, tracer
+
+
+@dataclass
+class StageTiming:
+    """
+    Wall time, CPU time (of the calling thread) and peak traced memory above
+    the level at the start of one stage run
+    """
+    name: str
+    wall_seconds: float
+    cpu_seconds: float
+    peak_bytes: Optional[int] = None
+    depth: int = 0  # Number of enclosing stages
+
+
+@dataclass
+class StageCollector:
+    """Stage runs and counters recorded while the collector is active"""
+    timings: List[StageTiming] = field(default_factory=list)
+    counters: Dict[str, float] = field(default_factory=dict)
+    # [traced memory at start, peak so far] of the stages currently open, innermost last
+    _open: List[List[int]] = field(default_factory=list)
+
+    def totals(self) -> Dict[str, StageTiming]:
+        """Timings summed per stage name (peak memory is the maximum)"""
+        totals: Dict[str, StageTiming] = {}
+        for timing in self.timings:
+            total = totals.setdefault(timing.name, StageTiming(timing.name, 0.0, 0.0))
+            total.wall_seconds += timing.wall_seconds
+            total.cpu_seconds += timing.cpu_seconds
+            if timing.peak_bytes is not None:
+                total.peak_bytes = max(total.peak_bytes or 0, timing.peak_bytes)
+        return totals
+
+    def category_seconds(self) -> Dict[str, float]:
+        """
+        Wall time of outermost stages summed per category, the first part of
+        the stage name (ocr.image.tesseract counts towards "ocr"), so nested
+        stages are not counted twice
+        """
+        categories: Dict[str, float] = {}
+        for timing in self.timings:
+            if timing.depth == 0:
+                category = timing.name.split(".", 1)[0]
+                categories[category] = categories.get(category, 0.0) + timing.wall_seconds
+        return categories
+
+
+_collector: ContextVar[Optional[StageCollector]] = ContextVar("stage_collector", default=None)
+_depth: ContextVar[int] = ContextVar("stage_depth", default=0)
+
+# Called with every finished stage run (e.g. to feed metrics)
+_observers: List[Callable[[StageTiming], None]] = []
+
+# Outermost stages currently running in this process, per category
+_in_flight: Dict[str, int] = {}
+
+
+def stages_in_flight(category: str) -> int:
+    """Number of outermost stages of a category (e.g. "ocr", "llm") running now"""
+    return _in_flight.get(category, 0)
+
+
+class DecayingAverage:
+    """
+    Average of irregularly timed samples that decays towards zero with time
+    constant `tau` seconds, so a signal goes quiet once its samples stop.
+    Each sample moves the average at least `weight` of the way towards it,
+    so bursts of samples close together still register.
+    """
+
+    def __init__(self, tau: float, weight: float = 0.1):
+        self.tau = tau
+        self.weight = weight
+        self._value = 0.0
+        self._updated = time.monotonic()
+
+    def _decayed(self, now: float) -> float:
+        return self._value * math.exp(-(now - self._updated) / self.tau)
+
+    def add(self, sample: float):
+        now = time.monotonic()
+        alpha = max(1 - math.exp(-(now - self._updated) / self.tau), self.weight)
+        value = self._decayed(now)
+        self._value = value + alpha * (sample - value)
+        self._updated = now
+
+    def value(self) -> float:
+        return self._decayed(time.monotonic())
+
+
+def add_stage_observer(observer: Callable[[StageTiming], None]):
+    """Register a callback receiving every finished stage run"""
+    _observers.append(observer)
+
+
+@contextmanager
+def collect_stages() -> Iterator[StageCollector]:
+    """
+    Record the stages run in this context (and tasks it starts). Runs and
+    counters recorded by a nested collector are also added to the enclosing one.
+    """
+    outer = _collector.get()
+    collector = StageCollector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+        if outer is not None:
+            outer.timings.extend(collector.timings)
+            for name, value in collector.counters.items():
+                outer.counters[name] = outer.counters.get(name, 0) + value
+
+
+def increment(name: str, amount: float = 1):
+    """Add to a counter of the active collector (a no-op when nobody is collecting)"""
+    collector = _collector.get()
+    if collector is not None:
+        collector.counters[name] = collector.counters.get(name, 0) + amount
+
+
+@contextmanager
+def stage(name: str) -> Iterator[Span]:
+    """
+    Time a stage and trace it as a span (yielded, for attributes) when
+    tracing is enabled. Costs two clock reads when nobody is collecting; peak
+    memory is only measured while tracemalloc is tracing (benchmarks).
+    """
+    collector = _collector.get()
+    tracing = collector is not None and tracemalloc.is_tracing()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        # Fold the enclosing stage's peak so far into it before resetting
+        if collector._open:
+            collector._open[-1][1] = max(collector._open[-1][1], peak)
+        collector._open.append([current, current])
+        tracemalloc.reset_peak()
+    depth = _depth.get()
+    depth_token = _depth.set(depth + 1)
+    category = name.split(".", 1)[0] if depth == 0 else None
+    if category is not None:
+        _in_flight[category] = _in_flight.get(category, 0) + 1
+    wall_started = time.perf_counter()
+    cpu_started = time.thread_time()
+    try:
+        with tracer.span(name) as span:
+            yield span
+    finally:
+        timing = StageTiming(name, time.perf_counter() - wall_started, time.thread_time() - cpu_started, depth=depth)
+        _depth.reset(depth_token)
+        if category is not None:
+            _in_flight[category] -= 1
+        if tracing:
+            started_at, peak = collector._open.pop()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            timing.peak_bytes = peak - started_at
+            if collector._open:
+                collector._open[-1][1] = max(collector._open[-1][1], peak)
+        if collector is not None:
+            collector.timings.append(timing)
+        for observer in _observers:
+            observer(timing)
@@ -0,0 +1,113 @@
+"""
+Adaptive load shedding
+"""
+import json
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.core.database import engine, replica_engine
+from app.core.instrumentation import stages_in_flight
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import REQUESTS_SHED, InstrumentedAsyncQueuePool
+
+# Outside SHED_EXPENSIVE_PATHS, requests with these methods are never shed
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _prefixes(value: str) -> Tuple[str, ...]:
+    return tuple(settings.API_PREFIX + path.strip().rstrip("/") for path in value.split(",") if path.strip())
+
+
+def _matches(path: str, prefixes: Tuple[str, ...]) -> bool:
+    return any(path == prefix or path.startswith(prefix + "/") for prefix in prefixes)
+
+
+class AdmissionController:
+    """
+    Decides whether this worker admits a request from its current load:
+    recent event-loop lag, database pool checkout wait, and OCR / LLM stages
+    in flight (the work queued on the OCR engine and Ollama).
+
+    Expensive routes are refused as soon as any signal passes its threshold,
+    so they back off before the shared resources saturate; other writes only
+    once loop lag or pool wait pass SHED_CRITICAL_FACTOR times theirs. Reads
+    and exempt paths (auth) are always admitted. A threshold of 0 disables
+    its signal.
+    """
+
+    def __init__(self):
+        self.expensive_paths = _prefixes(settings.SHED_EXPENSIVE_PATHS)
+        self.exempt_paths = _prefixes(settings.SHED_EXEMPT_PATHS)
+
+    def route_class(self, method: str, path: str) -> Optional[str]:
+        """"expensive", "write", or None for requests that are never shed"""
+        if _matches(path, self.exempt_paths):
+            return None
+        if _matches(path, self.expensive_paths):
+            return "expensive"
+        if method in READ_METHODS:
+            return None
+        return "write"
+
+    @staticmethod
+    def pool_wait() -> float:
+        """Checkout wait pressure of the busiest database pool"""
+        pools = [engine.sync_engine.pool]
+        if replica_engine is not None:
+            pools.append(replica_engine.sync_engine.pool)
+        return max(
+            (pool.wait_pressure() for pool in pools if isinstance(pool, InstrumentedAsyncQueuePool)),
+            default=0.0,
+        )
+
+    def overload_reason(self, route_class: str) -> Optional[str]:
+        """The signal over its threshold for a class of route, or None to admit"""
+        factor = 1.0 if route_class == "expensive" else settings.SHED_CRITICAL_FACTOR
+        if settings.SHED_LOOP_LAG_SECONDS and loop_monitor.recent_lag.value() > settings.SHED_LOOP_LAG_SECONDS * factor:
+            return "loop_lag"
+        if settings.SHED_DB_POOL_WAIT_SECONDS and self.pool_wait() > settings.SHED_DB_POOL_WAIT_SECONDS * factor:
+            return "db_pool"
+        if route_class == "expensive":
+            if settings.SHED_OCR_IN_FLIGHT and stages_in_flight("ocr") >= settings.SHED_OCR_IN_FLIGHT:
+                return "ocr_queue"
+            if settings.SHED_LLM_IN_FLIGHT and stages_in_flight("llm") >= settings.SHED_LLM_IN_FLIGHT:
+                return "llm_queue"
+        return None
+
+
+class LoadSheddingMiddleware:
+    """
+    ASGI middleware answering requests the admission controller refuses with
+    503 and a Retry-After header, before any work is done for them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            route_class = admission_controller.route_class(scope["method"], scope["path"])
+            reason = admission_controller.overload_reason(route_class) if route_class else None
+            if reason is not None:
+                REQUESTS_SHED.labels(route_class, reason).inc()
+                await self._reject(send)
+                return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send):
+        body = json.dumps({"detail": "Server is busy, please retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(settings.SHED_RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Global admission controller instance
+admission_controller = AdmissionController()
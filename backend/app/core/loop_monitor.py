@@ -0,0 +1,146 @@
+"""
+Event-loop lag monitor
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.instrumentation import DecayingAverage
+from app.core.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALLS
+
+# Innermost frames kept from a stalled loop's stack
+MAX_STACK_FRAMES = 40
+
+# Time constant (seconds) of the recent lag used for load shedding
+LAG_DECAY_SECONDS = 1.0
+
+
+@dataclass
+class LoopStall:
+    """A period in which the event loop ran one callback for too long"""
+    started_at: datetime
+    task: Optional[str]  # Name of the task that was running, if any
+    stack: List[str] = field(default_factory=list)  # Innermost frame last
+    duration_seconds: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": round(self.duration_seconds, 3) if self.duration_seconds is not None else None,
+            "task": self.task,
+            "stack": self.stack,
+        }
+
+
+class EventLoopMonitor:
+    """
+    Measures how late the event loop runs a periodic heartbeat.
+
+    Lag goes to the event_loop_lag_seconds histogram and to `recent_lag`
+    (read by load shedding). When no heartbeat has run for
+    LOOP_STALL_THRESHOLD seconds, a watchdog thread captures the loop
+    thread's stack (the synchronous code blocking it) and the running
+    task; the stall is logged and kept in `stalls` once the loop recovers.
+    Stalls shorter than the watchdog's poll period can be recorded without
+    a stack.
+    """
+
+    def __init__(self):
+        self.stalls: Deque[LoopStall] = deque(maxlen=settings.LOOP_STALL_HISTORY)
+        self.recent_lag = DecayingAverage(LAG_DECAY_SECONDS)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = 0.0
+        # Stall captured by the watchdog, completed by the next heartbeat
+        self._pending: Optional[LoopStall] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def loop_thread_id(self) -> Optional[int]:
+        return self._loop_thread_id
+
+    def start(self):
+        """Start monitoring the running event loop"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat(), name="loop-monitor")
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        """Stop the heartbeat and the watchdog"""
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._thread.join(timeout=1)
+        self._task = None
+        self._thread = None
+
+    async def _beat(self):
+        interval = settings.LOOP_MONITOR_INTERVAL
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            EVENT_LOOP_LAG.observe(lag)
+            self.recent_lag.add(lag)
+            self._heartbeat = now
+
+            stall, self._pending = self._pending, None
+            if stall is None and lag >= settings.LOOP_STALL_THRESHOLD:
+                # Ended before the watchdog looked
+                stall = LoopStall(datetime.now(timezone.utc) - timedelta(seconds=lag), task=None)
+            if stall is not None:
+                stall.duration_seconds = lag
+                self._record(stall)
+
+    def _watch(self):
+        threshold = settings.LOOP_STALL_THRESHOLD
+        poll = max(threshold / 4, 0.01)
+        while not self._stop.wait(poll):
+            heartbeat = self._heartbeat
+            overdue = time.monotonic() - heartbeat - settings.LOOP_MONITOR_INTERVAL
+            if overdue < threshold or self._pending is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self._loop)
+            stack = traceback.format_list(traceback.extract_stack(frame)[-MAX_STACK_FRAMES:])
+            stall = LoopStall(
+                datetime.now(timezone.utc) - timedelta(seconds=overdue),
+                task=task.get_name() if task is not None else None,
+                stack=[line.rstrip() for line in stack],
+            )
+            # Only publish if no heartbeat ran meanwhile (the stall is still ongoing)
+            if self._heartbeat == heartbeat:
+                self._pending = stall
+
+    def _record(self, stall: LoopStall):
+        self.stalls.append(stall)
+        EVENT_LOOP_STALLS.inc()
+        where = stall.stack[-1].strip().splitlines()[0] if stall.stack else "unknown location"
+        print(f"Event loop stalled for {stall.duration_seconds * 1000:.0f} ms in task {stall.task or '-'} at {where}")
+
+
+# Global event loop monitor instance
+loop_monitor = EventLoopMonitor()
@@ -0,0 +1,190 @@
+"""
+Prometheus metrics for the hot paths
+"""
+import itertools
+import os
+import time
+from typing import Dict, Optional
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.instrumentation import DecayingAverage, StageTiming, add_stage_observer
+from app.core.tracing import route_template
+
+# Buckets for calls that take seconds to minutes (OCR, LLM)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being served",
+    ["method"], multiprocess_mode="livesum",
+)
+OCR_STAGE_DURATION = Histogram(
+    "ocr_stage_duration_seconds", "Wall time of OCR stages (ocr.image.<engine> / ocr.pdf.<engine> cover a whole document)",
+    ["stage"], buckets=SLOW_BUCKETS,
+)
+OCR_STAGE_CPU = Counter(
+    "ocr_stage_cpu_seconds", "CPU time of the serving thread in OCR stages",
+    ["stage"],
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds", "Ollama generation latency by LLMService method",
+    ["method", "outcome"], buckets=SLOW_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens", "Tokens processed by Ollama by LLMService method",
+    ["method", "kind"],
+)
+LLM_TIMEOUTS = Counter(
+    "llm_timeouts", "Ollama generations that timed out",
+    ["method"],
+)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds", "Latency of outbound HTTP attempts (USDA) by status",
+    ["upstream", "status"],
+)
+NUTRITION_CACHE_LOOKUPS = Counter(
+    "nutrition_cache_lookups", "NutritionService in-process cache lookups (hit ratio = hit / total)",
+    ["result"],
+)
+UPLOAD_SIZE = Histogram(
+    "upload_size_bytes", "Size of uploaded meal files",
+    ["source_type"], buckets=(1e4, 5e4, 1e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7),
+)
+UPSTREAM_BUDGET_REMAINING = Gauge(
+    "upstream_budget_remaining", "Requests left in an upstream's rate-limit budget (shared by the workers on a host)",
+    ["upstream"], multiprocess_mode="mostrecent",
+)
+UPSTREAM_RATE_LIMITED = Counter(
+    "upstream_rate_limited", "Outbound requests refused because an upstream's budget was exhausted",
+    ["upstream", "priority"],
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection",
+    ["engine"], buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Database connections currently checked out of the pool",
+    ["engine"], multiprocess_mode="livesum",
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop ran the monitor's heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+EVENT_LOOP_STALLS = Counter(
+    "event_loop_stalls", "Event loop stalls longer than LOOP_STALL_THRESHOLD",
+)
+REQUESTS_SHED = Counter(
+    "http_requests_shed", "Requests rejected with 503 by load shedding",
+    ["route_class", "reason"],
+)
+
+
+# Time constant (seconds) of the recent checkout wait used for load shedding
+POOL_WAIT_DECAY_SECONDS = 5.0
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long checkouts wait for a connection, and
+    keeps the recent waits for load shedding
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recent_wait = DecayingAverage(POOL_WAIT_DECAY_SECONDS)
+        self._waiting: Dict[int, float] = {}  # Start of each checkout still waiting
+        self._tickets = itertools.count()
+
+    def wait_pressure(self) -> float:
+        """Recent average checkout wait, or the wait of the oldest pending checkout if longer"""
+        now = time.perf_counter()
+        return max(self.recent_wait.value(), now - min(self._waiting.values(), default=now))
+
+    def _do_get(self):
+        ticket = next(self._tickets)
+        started = self._waiting[ticket] = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            del self._waiting[ticket]
+            waited = time.perf_counter() - started
+            self.recent_wait.add(waited)
+            DB_POOL_CHECKOUT_WAIT.labels(self._orig_logging_name or "primary").observe(waited)
+
+
+def install_pool_metrics(engine, name: str):
+    """Track the checked-out connections of an engine's pool"""
+    gauge = DB_POOL_CHECKED_OUT.labels(name)
+    event.listen(engine.sync_engine.pool, "checkout", lambda *args: gauge.inc())
+    event.listen(engine.sync_engine.pool, "checkin", lambda *args: gauge.dec())
+
+
+def _observe_stage(timing: StageTiming):
+    if timing.name.startswith("ocr."):
+        OCR_STAGE_DURATION.labels(timing.name).observe(timing.wall_seconds)
+        OCR_STAGE_CPU.labels(timing.name).inc(timing.cpu_seconds)
+
+
+add_stage_observer(_observe_stage)
+
+
+def render_metrics() -> bytes:
+    """
+    Metrics in the Prometheus text format. With PROMETHEUS_MULTIPROC_DIR set
+    (several uvicorn workers), values are aggregated over all workers.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template (so path
+    parameters don't create new series) and requests in progress.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code: Optional[int] = None
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            HTTP_REQUEST_DURATION.labels(method, route_template(scope) or "unmatched", str(status_code or 500)).observe(
+                time.perf_counter() - started
+            )
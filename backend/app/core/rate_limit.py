@@ -0,0 +1,126 @@
+"""
+Request budgets for rate-limited upstream APIs
+"""
+import asyncio
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, Optional
+
+from app.core.metrics import UPSTREAM_BUDGET_REMAINING, UPSTREAM_RATE_LIMITED
+
+# Lookups a user is waiting for, and work that can be retried later
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Seconds to back off after a 429 without a usable Retry-After
+DEFAULT_RETRY_AFTER = 60.0
+
+
+class RateLimited(Exception):
+    """An upstream's request budget is exhausted"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} request budget exhausted, retry in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+class SharedTokenBucket:
+    """
+    Token bucket holding `capacity` requests and refilled over `period`
+    seconds, kept in a small JSON file under an exclusive flock so every
+    worker that can see the file draws from one budget.
+
+    Background callers cannot take the last `reserve` fraction of the
+    tokens, which stays available to interactive lookups. The upstream's
+    own view wins: X-RateLimit-Remaining caps the tokens, and a 429 blocks
+    the bucket for every worker until its Retry-After has passed.
+    """
+
+    def __init__(self, upstream: str, path: str, capacity: int, period: float, reserve: float = 0.0):
+        self.upstream = upstream
+        self.path = path
+        self.capacity = float(capacity)
+        self.rate = capacity / period
+        self.reserve = reserve
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, Any]]:
+        """
+        Lock the state file and yield the refilled state, written back on exit.
+        A local file lock is held for microseconds, so this runs inline.
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            now = time.time()
+            try:
+                state = json.loads(f.read())
+                state["tokens"] = min(self.capacity, state["tokens"] + (now - state["updated"]) * self.rate)
+            except (ValueError, KeyError, TypeError):
+                # New or unreadable file: start with a full budget
+                state = {"tokens": self.capacity, "blocked_until": 0.0}
+            state["updated"] = now
+            yield state
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(state))
+        UPSTREAM_BUDGET_REMAINING.labels(self.upstream).set(int(state["tokens"]))
+
+    def try_acquire(self, priority: str = INTERACTIVE) -> float:
+        """Take one token; returns 0 on success, else the seconds until one is available"""
+        floor = self.capacity * self.reserve if priority == BACKGROUND else 0.0
+        with self._state() as state:
+            if state["blocked_until"] > state["updated"]:
+                return state["blocked_until"] - state["updated"]
+            if state["tokens"] - 1 < floor:
+                return (floor + 1 - state["tokens"]) / self.rate
+            state["tokens"] -= 1
+        return 0.0
+
+    async def acquire(self, priority: str = INTERACTIVE, max_wait: float = 0.0):
+        """Take one token, waiting up to `max_wait` seconds; raises RateLimited otherwise"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire(priority)
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                UPSTREAM_RATE_LIMITED.labels(self.upstream, priority).inc()
+                raise RateLimited(self.upstream, wait)
+            await asyncio.sleep(wait)
+
+    def sync_remaining(self, remaining: int):
+        """Cap the tokens at the requests the upstream reports as remaining"""
+        with self._state() as state:
+            state["tokens"] = min(state["tokens"], float(remaining))
+
+    def block(self, seconds: float):
+        """Refuse all requests for `seconds` (after a 429)"""
+        with self._state() as state:
+            state["tokens"] = 0.0
+            state["blocked_until"] = max(state["blocked_until"], state["updated"] + seconds)
+
+    def remaining(self) -> int:
+        """Whole tokens currently available"""
+        with self._state() as state:
+            return int(state["tokens"])
@@ -0,0 +1,132 @@
+"""
+Per-user response cache with ETags derived from the user's data version
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import replica_router
+from app.models.user import User
+
+
+async def get_data_version(db: AsyncSession, user_id: int) -> int:
+    """Current data version of a user (always read from the database)"""
+    return (await db.execute(select(User.data_version).where(User.id == user_id))).scalar_one()
+
+
+async def bump_data_version(db: AsyncSession, user_id: int):
+    """
+    Bump a user's data version in the current transaction. Cached responses
+    for the old version stop matching in every process once it commits, and
+    the user's reads stay on the primary for the read-your-writes window.
+    """
+    await db.execute(
+        update(User).where(User.id == user_id).values(data_version=User.data_version + 1)
+    )
+    response_cache.invalidate_user(user_id)
+    replica_router.record_write(user_id)
+
+
+class ResponseCache:
+    """
+    LRU cache of encoded JSON responses keyed by user and request key.
+    Each entry remembers the data version it was computed at and is only
+    served while that version is current, so cross-process invalidation
+    falls out of the version check; local writes also drop entries eagerly.
+    """
+
+    def __init__(self, max_users: int, max_entries_per_user: int):
+        self.max_users = max_users
+        self.max_entries_per_user = max_entries_per_user
+        self._users: "OrderedDict[int, OrderedDict[str, Tuple[int, bytes]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def etag(user_id: int, version: int, key: str) -> str:
+        """Strong ETag for a request key at a data version"""
+        digest = hashlib.sha1(f"{user_id}:{version}:{key}".encode()).hexdigest()[:20]
+        return f'"{version}-{digest}"'
+
+    def get(self, user_id: int, key: str, version: int) -> Optional[bytes]:
+        """Get a cached body computed at this data version"""
+        with self._lock:
+            entries = self._users.get(user_id)
+            entry = entries.get(key) if entries else None
+            if entry is None or entry[0] != version:
+                return None
+            self._users.move_to_end(user_id)
+            entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, user_id: int, key: str, version: int, body: bytes):
+        """Cache a body computed at this data version"""
+        if self.max_users <= 0:
+            return
+        with self._lock:
+            entries = self._users.setdefault(user_id, OrderedDict())
+            entries[key] = (version, body)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries_per_user:
+                entries.popitem(last=False)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Drop all cached responses of a user"""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._users.clear()
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match matches the ETag (weak comparison, as RFC 9110 requires)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+async def cached_json_response(
+    request: Request,
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+) -> Response:
+    """
+    Serve a per-user JSON response through the cache.
+
+    The key must identify everything the response depends on besides the
+    user's meals (resolved dates, query parameters). Returns 304 when the
+    client already has the current version, the cached body when this
+    process has it, and otherwise computes, caches and returns it.
+    """
+    version = await get_data_version(db, user_id)
+    etag = response_cache.etag(user_id, version, key)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(user_id, key, version)
+    if body is None:
+        body = JSONResponse(content=jsonable_encoder(await compute())).body
+        response_cache.set(user_id, key, version, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Global response cache instance
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_USERS, settings.RESPONSE_CACHE_MAX_ENTRIES_PER_USER)
@@ -1,22 +1,33 @@
 """
 Security utilities for authentication and password hashing
 """
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import AsyncIterator, Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import async_session_maker
+from app.core.user_cache import user_cache
 from app.models.user import User
 from app.schemas.auth import TokenData
 
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# Dedicated executor so bcrypt never runs on the event loop
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_password_hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_PENDING)
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/auth/login")
@@ -32,6 +43,69 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def _run_password_task(func, *args):
+    """Run a bcrypt operation on the password executor, rejecting work beyond the queue bound"""
+    if _password_hash_slots.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    async with _password_hash_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await _run_password_task(pwd_context.hash, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password without blocking the event loop.
+    Returns (valid, new_hash) where new_hash is set if the stored hash uses
+    outdated settings (e.g. a different bcrypt cost) and should be replaced.
+    """
+    return await _run_password_task(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+def shutdown_password_executor():
+    """Stop the password hashing threads"""
+    _password_executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AuthAttemptLimiter:
+    """Limits concurrent password checks per client IP and per username"""
+    
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._in_flight: Dict[str, int] = defaultdict(int)
+    
+    @asynccontextmanager
+    async def limit(self, *keys: Optional[str]) -> AsyncIterator[None]:
+        """Hold a slot for each key, raising 429 if any key is at its limit"""
+        keys = [key for key in keys if key]
+        if any(self._in_flight.get(key, 0) >= self.max_concurrent for key in keys):
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many concurrent authentication attempts",
+                headers={"Retry-After": "1"},
+            )
+        for key in keys:
+            self._in_flight[key] += 1
+        try:
+            yield
+        finally:
+            for key in keys:
+                self._in_flight[key] -= 1
+                if self._in_flight[key] <= 0:
+                    del self._in_flight[key]
+
+
+auth_attempt_limiter = AuthAttemptLimiter(settings.AUTH_MAX_CONCURRENT_PER_KEY)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -55,10 +129,14 @@ def create_refresh_token(data: dict) -> str:
 
 
 async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    token: str = Depends(oauth2_scheme)
 ) -> User:
-    """Get current authenticated user from JWT token"""
+    """
+    Get current authenticated user from JWT token.
+    Users are served from a short-TTL cache, so most requests skip the DB lookup.
+    Cache misses use their own short-lived session so the request's session
+    doesn't check out a connection before the endpoint needs one.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -78,11 +156,17 @@ async def get_current_user(
     except (JWTError, ValueError):
         raise credentials_exception
     
-    result = await db.execute(select(User).where(User.id == token_data.user_id))
-    user = result.scalar_one_or_none()
-    
+    user = user_cache.get(token_data.user_id)
     if user is None:
-        raise credentials_exception
+        async with async_session_maker() as db:
+            result = await db.execute(select(User).where(User.id == token_data.user_id))
+            user = result.scalar_one_or_none()
+        
+        if user is None:
+            raise credentials_exception
+        
+        # Closing the session detached the user, so it can be cached
+        user_cache.set(user)
     
     if not user.is_active:
         raise HTTPException(
@@ -96,11 +180,18 @@ async def get_current_user(
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
-    """Get current active user"""
-    if not current_user.is_active:
+    """Get current active user (get_current_user already rejects inactive users)"""
+    return current_user
+
+
+async def get_current_superuser(
+    current_user: User = Depends(get_current_user)
+) -> User:
+    """Get current user, requiring superuser rights (admin endpoints)"""
+    if not current_user.is_superuser:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Inactive user"
+            detail="Superuser rights required"
         )
     return current_user
 
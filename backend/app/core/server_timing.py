@@ -0,0 +1,62 @@
+"""
+Server-Timing response header with a per-stage latency breakdown
+"""
+import time
+from typing import Dict
+
+from app.core.instrumentation import StageCollector, collect_stages
+
+
+def timing_breakdown(collector: StageCollector, total_seconds: float) -> Dict[str, float]:
+    """
+    Milliseconds per category (ocr, llm, nutrition, ...) from a request's
+    stages, plus db (time in SQL statements) and total
+    """
+    breakdown = {
+        category: round(seconds * 1000, 1)
+        for category, seconds in collector.category_seconds().items()
+    }
+    if "db.seconds" in collector.counters:
+        breakdown["db"] = round(collector.counters["db.seconds"] * 1000, 1)
+    breakdown["total"] = round(total_seconds * 1000, 1)
+    return breakdown
+
+
+def format_server_timing(collector: StageCollector, total_seconds: float) -> str:
+    """Server-Timing header value, e.g. ocr;dur=812.4, db;dur=9.1;desc="6 queries", total;dur=1650.2"""
+    metrics = []
+    for name, milliseconds in timing_breakdown(collector, total_seconds).items():
+        metric = f"{name};dur={milliseconds}"
+        if name == "db":
+            metric += f';desc="{int(collector.counters.get("db.queries", 0))} queries"'
+        metrics.append(metric)
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware collecting the stages run while serving a request and
+    reporting them in a Server-Timing header, so clients can tell OCR, LLM,
+    nutrition lookup and database time apart from the total.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with collect_stages() as collector:
+
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    value = format_server_timing(collector, time.perf_counter() - started)
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", value.encode("latin-1")))
+                    message = dict(message, headers=headers)
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
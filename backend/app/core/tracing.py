@@ -0,0 +1,315 @@
+"""
+Request tracing with W3C trace context propagation
+"""
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# Longest SQL statement kept on a span
+MAX_STATEMENT_LENGTH = 1000
+
+
+class _TraceBuffer:
+    """Finished spans of one trace in this process, exported when its local root ends"""
+
+    def __init__(self):
+        self.spans: List["Span"] = []
+        self.closed = False
+
+
+@dataclass
+class Span:
+    """One timed operation of a trace"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    sampled: bool
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+    _buffer: Optional[_TraceBuffer] = field(default=None, repr=False)
+    # First span of the trace in this process (no parent, or a remote one)
+    _local_root: bool = field(default=False, repr=False)
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        if self.sampled:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent header value naming this span as the parent"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+# Yielded when tracing is disabled; records nothing
+NOOP_SPAN = Span("", "0" * 32, "0" * 16, None, False)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Span]:
+    """The remote parent named by a traceparent header, if it is valid"""
+    match = TRACEPARENT_PATTERN.match((value or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return Span("remote", match.group(1), match.group(2), None, bool(int(match.group(3), 16) & 1))
+
+
+class InMemoryExporter:
+    """Keeps the most recent spans in-process for local debugging"""
+
+    def __init__(self, max_spans: int):
+        self._spans: Deque[Dict[str, Any]] = deque(maxlen=max_spans)
+
+    def export(self, spans: List[Span]):
+        self._spans.extend(span.to_dict() for span in spans)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [span for span in self._spans if trace_id is None or span["trace_id"] == trace_id]
+
+    def clear(self):
+        self._spans.clear()
+
+    def close(self):
+        pass
+
+
+class JsonLinesExporter:
+    """Appends one JSON object per span to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, spans: List[Span]):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(lines)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# Route templates by endpoint function, built on first use
+_route_templates: Dict[Callable, str] = {}
+
+
+def route_template(scope: Dict[str, Any]) -> Optional[str]:
+    """
+    Path template of the route that served a request, e.g. /meals/{meal_id}.
+    The router records the matched endpoint in the (shared) scope, so this
+    works once the request has been handled.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return None
+    if endpoint not in _route_templates:
+        _route_templates.update(
+            (route.endpoint, route.path) for route in scope["app"].routes if hasattr(route, "endpoint")
+        )
+    return _route_templates.get(endpoint)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Creates spans in the current context and exports them per trace.
+
+    New traces are sampled with TRACE_SAMPLE_RATE; traces continued from an
+    incoming traceparent keep the caller's decision. Unsampled spans still
+    carry IDs so downstream services see a consistent trace context, but
+    record nothing.
+    """
+
+    def __init__(self):
+        self.enabled = settings.TRACING_ENABLED
+        self.sample_rate = settings.TRACE_SAMPLE_RATE
+        if settings.TRACE_EXPORTER == "file":
+            self.exporter = JsonLinesExporter(settings.TRACE_FILE)
+        elif settings.TRACE_EXPORTER == "memory":
+            self.exporter = InMemoryExporter(settings.TRACE_MEMORY_MAX_SPANS)
+        else:
+            raise ValueError(f"Unknown trace exporter: {settings.TRACE_EXPORTER}")
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Span:
+        """
+        Start a span under `parent` (default: the current span) without making
+        it current. A remote parent from parse_traceparent starts a local root.
+        """
+        parent = parent or _current_span.get()
+        if parent is None:
+            span = Span(name, secrets.token_hex(16), secrets.token_hex(8), None, random.random() < self.sample_rate)
+        else:
+            span = Span(name, parent.trace_id, secrets.token_hex(8), parent.span_id, parent.sampled)
+        span._local_root = parent is None or parent._buffer is None
+        if span.sampled:
+            span._buffer = _TraceBuffer() if span._local_root else parent._buffer
+            span.attributes.update(attributes)
+        span.start_ns = time.time_ns()
+        return span
+
+    def end_span(self, span: Span):
+        span.end_ns = time.time_ns()
+        if not span.sampled:
+            return
+        buffer = span._buffer
+        if buffer.closed:
+            # Work that outlived its request (e.g. background tasks)
+            self.exporter.export([span])
+            return
+        buffer.spans.append(span)
+        if span._local_root:
+            buffer.closed = True
+            self.exporter.export(buffer.spans)
+            buffer.spans = []
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes) -> Iterator[Span]:
+        """Run a block in a new child span of the current one"""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        span = self.start_span(name, parent, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def close(self):
+        self.exporter.close()
+
+
+# Global tracer instance
+tracer = Tracer()
+
+
+async def inject_trace_context(request: httpx.Request):
+    """httpx request hook propagating the current trace to upstream services"""
+    span = _current_span.get()
+    if span is not None:
+        request.headers["traceparent"] = span.traceparent
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_span.get() is None:
+        return
+    span = tracer.start_span(
+        "db.query",
+        **{"db.system": conn.dialect.name, "db.statement": statement[:MAX_STATEMENT_LENGTH]},
+    )
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_span.get() is not None and conn.info.get("trace_spans"):
+        span = conn.info["trace_spans"].pop()
+        span.set_attribute("db.rowcount", cursor.rowcount)
+        tracer.end_span(span)
+
+
+def _handle_error(exception_context):
+    spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+    if spans:
+        span = spans.pop()
+        span.record_error(exception_context.original_exception)
+        tracer.end_span(span)
+
+
+def install_query_tracing(engine: AsyncEngine):
+    """Record a span for every statement an engine executes inside a trace"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware running each request in a server span, continuing the
+    caller's trace when a traceparent header is sent. Sampled responses carry
+    the trace ID in X-Trace-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        remote_parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                remote_parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        with tracer.span(f"{scope['method']} {scope['path']}", remote_parent) as span:
+            span.set_attribute("http.method", scope["method"])
+            span.set_attribute("http.target", scope["path"])
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if span.sampled:
+                        headers = list(message.get("headers", []))
+                        headers.append((b"x-trace-id", span.trace_id.encode()))
+                        message = dict(message, headers=headers)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = route_template(scope)
+                if route is not None:
+                    span.name = f"{scope['method']} {route}"
+                    span.set_attribute("http.route", route)
@@ -0,0 +1,80 @@
+"""
+In-process cache of authenticated users
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from sqlalchemy import event, inspect
+
+from app.core.config import settings
+from app.models.user import User
+
+
+class UserCache:
+    """
+    Short-TTL LRU cache of detached User objects keyed by id.
+    Lets authenticated requests skip the per-request user lookup. Entries are
+    invalidated explicitly when a user's is_active or is_superuser flag changes
+    or the user is deleted in this process; changes made by other workers are
+    picked up once the TTL expires.
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[float, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[User]:
+        """Get a cached user, or None if missing or expired"""
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user: User):
+        """Cache a user (must be detached from its session)"""
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Drop a user from the cache"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop all cached users"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Global user cache instance
+user_cache = UserCache(settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_MAX_SIZE)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_status_change(mapper, connection, target: User):
+    """Invalidate cached users whose is_active or is_superuser flag was changed"""
+    attrs = inspect(target).attrs
+    if attrs.is_active.history.has_changes() or attrs.is_superuser.history.has_changes():
+        user_cache.invalidate(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_delete(mapper, connection, target: User):
+    """Invalidate cached users that were deleted"""
+    user_cache.invalidate(target.id)
@@ -7,6 +7,8 @@ from app.models.food_item import FoodItem
 from app.models.nutrient import Nutrient
 from app.models.daily_nutrition import DailyNutrition
 from app.models.risk_score import RiskScore
+from app.models.health_insight import HealthInsight
+from app.models.meal_processing_telemetry import MealProcessingTelemetry
 
 __all__ = [
     "User",
@@ -15,5 +17,7 @@ __all__ = [
     "Nutrient",
     "DailyNutrition",
     "RiskScore",
+    "HealthInsight",
+    "MealProcessingTelemetry",
 ]
 
@@ -11,8 +11,8 @@ class DailyNutrition(Base):
     """Daily nutrition aggregation model for tracking daily nutrient totals"""
     __tablename__ = "daily_nutrition"
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(Date, nullable=False, index=True)
     nutrient_name = Column(String, nullable=False, index=True)  # e.g., "calories", "protein"
     total_value = Column(Float, nullable=False)  # Total for the day
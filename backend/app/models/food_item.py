@@ -2,17 +2,25 @@
 Food item model
 """
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, JSON, Index, Enum as SQLEnum, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import relationship
+import enum
 
 from app.core.database import Base
 
 
+class NutritionStatus(str, enum.Enum):
+    """Whether a food item's nutrients have been looked up"""
+    RESOLVED = "resolved"
+    PENDING = "pending"  # USDA budget was exhausted; the scheduler backfills these
+
+
 class FoodItem(Base):
     """Food item model for storing individual food items in meals"""
     __tablename__ = "food_items"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     meal_id = Column(Integer, ForeignKey("meals.id"), nullable=False, index=True)
     name = Column(String, nullable=False, index=True)
     normalized_name = Column(String, nullable=True, index=True)  # LLM normalized name
@@ -21,10 +29,23 @@ class FoodItem(Base):
     brand = Column(String, nullable=True)
     barcode = Column(String, nullable=True, index=True)
     description = Column(Text, nullable=True)
+    # Packed nutrients: values aligned to the fixed nutrient vocabulary
+    # (see app.services.nutrient_storage), plus an overflow map for the rest
+    nutrient_values = Column(JSON(none_as_null=True).with_variant(ARRAY(Float), "postgresql"), nullable=True)
+    extra_nutrients = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"), nullable=True)  # {name: {"value", "unit"}}
+    nutrition_status = Column(SQLEnum(NutritionStatus), nullable=False, default=NutritionStatus.RESOLVED, server_default=NutritionStatus.RESOLVED.name)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     # Relationships
     meal = relationship("Meal", back_populates="food_items")
-    nutrients = relationship("Nutrient", back_populates="food_item", cascade="all, delete-orphan")
+    nutrients = relationship("Nutrient", back_populates="food_item", cascade="all, delete-orphan")  # Legacy per-nutrient rows
 
+    # Pending items for the nutrition backfill (partial: almost all are resolved)
+    __table_args__ = (
+        Index(
+            'ix_food_items_nutrition_pending', 'id',
+            postgresql_where=text("nutrition_status = 'PENDING'"),
+            sqlite_where=text("nutrition_status = 'PENDING'"),
+        ),
+    )
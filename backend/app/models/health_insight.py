@@ -0,0 +1,31 @@
+"""
+Health insight model
+"""
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, Date, ForeignKey, DateTime, Text, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.core.database import Base
+
+
+class HealthInsight(Base):
+    """Precomputed LLM health insight for a user over a trailing period"""
+    __tablename__ = "health_insights"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    period_days = Column(Integer, nullable=False)  # Length of the trailing period
+    period_end = Column(Date, nullable=False)  # Last day included in the period
+    nutrient_summary = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)  # {nutrient: total}
+    explanation = Column(Text, nullable=True)
+    recommendations = Column(Text, nullable=True)
+    data_version = Column(Integer, nullable=False)  # User data_version the insight was generated from
+    generated_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)  # Regenerated after this even without new meals
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    # One current insight per user and period length
+    __table_args__ = (
+        Index('ix_health_insights_user_period', 'user_id', 'period_days', unique=True),
+    )
@@ -2,7 +2,7 @@
 Meal model
 """
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 import enum
 
@@ -30,8 +30,8 @@ class Meal(Base):
     """Meal model for storing meal information"""
     __tablename__ = "meals"
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     meal_type = Column(SQLEnum(MealType), nullable=False)
     source_type = Column(SQLEnum(MealSource), nullable=False)
     source_file_path = Column(String, nullable=True)  # Path to uploaded file
@@ -45,3 +45,8 @@ class Meal(Base):
     user = relationship("User", back_populates="meals")
     food_items = relationship("FoodItem", back_populates="meal", cascade="all, delete-orphan")
 
+    # Serves listing pages and date-range reads of a user's meals, newest first
+    __table_args__ = (
+        Index('ix_meals_user_date', user_id, meal_date.desc(), id.desc()),
+    )
+
@@ -0,0 +1,31 @@
+"""
+Meal processing telemetry model
+"""
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+
+from app.core.database import Base
+
+
+class MealProcessingTelemetry(Base):
+    """Where the time went while processing an uploaded meal (one row per upload)"""
+    __tablename__ = "meal_processing_telemetry"
+
+    id = Column(Integer, primary_key=True)
+    meal_id = Column(Integer, ForeignKey("meals.id", ondelete="CASCADE"), nullable=False, unique=True)
+    file_extension = Column(String, nullable=True)  # e.g. .jpg (source type and meal type are on the meal)
+    file_size_bytes = Column(Integer, nullable=True)
+    ocr_engine = Column(String, nullable=True)  # None for CSV uploads
+    # Stage durations in milliseconds
+    ocr_ms = Column(Float, nullable=False, default=0.0)
+    llm_ms = Column(Float, nullable=False, default=0.0)
+    nutrition_ms = Column(Float, nullable=False, default=0.0)  # Concurrent USDA lookups, wall time
+    db_ms = Column(Float, nullable=False, default=0.0)  # Time in SQL statements
+    total_ms = Column(Float, nullable=False, index=True)
+    db_queries = Column(Integer, nullable=False, default=0)
+    ocr_characters = Column(Integer, nullable=False, default=0)
+    food_item_count = Column(Integer, nullable=False, default=0)
+    llm_timeouts = Column(Integer, nullable=False, default=0)  # Generations cut short and salvaged
+    usda_cache_hits = Column(Integer, nullable=False, default=0)
+    usda_cache_misses = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
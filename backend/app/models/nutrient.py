@@ -2,7 +2,7 @@
 Nutrient model
 """
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -12,8 +12,8 @@ class Nutrient(Base):
     """Nutrient model for storing nutrient information for food items"""
     __tablename__ = "nutrients"
 
-    id = Column(Integer, primary_key=True, index=True)
-    food_item_id = Column(Integer, ForeignKey("food_items.id"), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    food_item_id = Column(Integer, ForeignKey("food_items.id"), nullable=False)
     name = Column(String, nullable=False, index=True)  # e.g., "calories", "protein", "vitamin_c"
     value = Column(Float, nullable=False)  # Nutrient value
     unit = Column(String, nullable=False)  # e.g., "kcal", "g", "mg", "mcg"
@@ -24,3 +24,8 @@ class Nutrient(Base):
     # Relationships
     food_item = relationship("FoodItem", back_populates="nutrients")
 
+    # Covering index: nutrient reads by food item never touch the heap
+    __table_args__ = (
+        Index('ix_nutrients_food_item_name', 'food_item_id', 'name', postgresql_include=['value', 'unit']),
+    )
+
@@ -29,7 +29,7 @@ class RiskScore(Base):
     """Risk score model for storing health risk assessments"""
     __tablename__ = "risk_scores"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     risk_type = Column(SQLEnum(RiskType), nullable=False, index=True)
     nutrient_name = Column(String, nullable=True, index=True)  # Related nutrient if applicable
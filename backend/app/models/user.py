@@ -2,7 +2,7 @@
 User model
 """
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -12,12 +12,15 @@ class User(Base):
     """User model for authentication and user data"""
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String, unique=True, index=True, nullable=False)
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped on every meal write, used for ETags
+    risk_data_version = Column(Integer, nullable=True)  # data_version the stored risk scores were computed from
+    risks_evaluated_on = Column(Date, nullable=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
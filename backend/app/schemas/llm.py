@@ -0,0 +1,159 @@
+"""
+Schemas for structured LLM output
+"""
+import re
+from pydantic import BaseModel, ValidationError, field_validator
+from typing import Any, List, Optional
+
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_FRACTION_RE = re.compile(r"^(\d+)\s*/\s*(\d+)")
+
+
+def coerce_number(value: Any) -> Optional[float]:
+    """Coerce LLM-produced numbers such as "16g", "1,370" or "1/2" to floats"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip().replace(",", "")
+        fraction = _FRACTION_RE.match(text)
+        if fraction and int(fraction.group(2)):
+            return int(fraction.group(1)) / int(fraction.group(2))
+        match = _NUMBER_RE.search(text)
+        if match:
+            return float(match.group())
+    return None
+
+
+def _valid_items(model: type, items: Any) -> list:
+    """Validate list items one by one, dropping those that don't fit the schema"""
+    if not isinstance(items, list):
+        return []
+    valid = []
+    for item in items:
+        try:
+            valid.append(model.model_validate(item))
+        except ValidationError:
+            continue
+    return valid
+
+
+class LabelNutrient(BaseModel):
+    """Nutrient read from a nutrition facts label"""
+    name: str
+    value: float = 0.0
+    unit: str = "g"
+
+    @field_validator("name", mode="before")
+    @classmethod
+    def _name(cls, value: Any) -> str:
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError("nutrient name is required")
+        return value.strip()
+
+    @field_validator("value", mode="before")
+    @classmethod
+    def _value(cls, value: Any) -> float:
+        number = coerce_number(value)
+        return number if number is not None else 0.0
+
+    @field_validator("unit", mode="before")
+    @classmethod
+    def _unit(cls, value: Any) -> str:
+        return value.strip() if isinstance(value, str) and value.strip() else "g"
+
+
+class NutritionLabelOutput(BaseModel):
+    """LLM response for a nutrition facts label"""
+    is_nutrition_label: bool = True
+    serving_size: str = "1 serving"
+    servings_per_container: Optional[float] = 1
+    nutrients: List[LabelNutrient] = []
+    food_items: List[Any] = []
+
+    @field_validator("serving_size", mode="before")
+    @classmethod
+    def _serving_size(cls, value: Any) -> str:
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return "1 serving"
+        return str(value)
+
+    @field_validator("servings_per_container", mode="before")
+    @classmethod
+    def _servings(cls, value: Any) -> Optional[float]:
+        return coerce_number(value)
+
+    @field_validator("nutrients", mode="before")
+    @classmethod
+    def _nutrients(cls, value: Any) -> list:
+        return _valid_items(LabelNutrient, value)
+
+
+class FoodItemOutput(BaseModel):
+    """Food item extracted from free text"""
+    name: str
+    quantity: Optional[float] = None
+    unit: Optional[str] = "g"
+    brand: Optional[str] = None
+
+    @field_validator("name", mode="before")
+    @classmethod
+    def _name(cls, value: Any) -> str:
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError("food name is required")
+        return value.strip()
+
+    @field_validator("quantity", mode="before")
+    @classmethod
+    def _quantity(cls, value: Any) -> Optional[float]:
+        return coerce_number(value)
+
+    @field_validator("unit", "brand", mode="before")
+    @classmethod
+    def _optional_text(cls, value: Any) -> Optional[str]:
+        return str(value) if value is not None else None
+
+
+class FoodListOutput(BaseModel):
+    """LLM response for a list of foods"""
+    is_nutrition_label: bool = False
+    food_items: List[FoodItemOutput] = []
+
+    @field_validator("food_items", mode="before")
+    @classmethod
+    def _food_items(cls, value: Any) -> list:
+        return _valid_items(FoodItemOutput, value)
+
+
+def _as_text(value: Any) -> str:
+    """Flatten list/dict answers that should have been plain text"""
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "\n".join(_as_text(item) for item in value)
+    if isinstance(value, dict):
+        return "\n".join(f"{key}: {_as_text(item)}" for key, item in value.items())
+    return str(value)
+
+
+class HealthInsightOutput(BaseModel):
+    """LLM response for health insights"""
+    explanation: str = ""
+    recommendations: str = ""
+
+    @field_validator("explanation", "recommendations", mode="before")
+    @classmethod
+    def _text(cls, value: Any) -> str:
+        return _as_text(value)
+
+
+class RiskExplanationOutput(BaseModel):
+    """LLM response for a risk score explanation"""
+    explanation: str = ""
+    recommendation: str = ""
+
+    @field_validator("explanation", "recommendation", mode="before")
+    @classmethod
+    def _text(cls, value: Any) -> str:
+        return _as_text(value)
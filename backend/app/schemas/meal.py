@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
 from app.models.meal import MealType, MealSource
+from app.models.food_item import NutritionStatus
 
 
 class FoodItemBase(BaseModel):
@@ -26,6 +27,7 @@ class FoodItemResponse(FoodItemBase):
     id: int
     normalized_name: Optional[str] = None
     description: Optional[str] = None
+    nutrition_status: NutritionStatus = NutritionStatus.RESOLVED
     created_at: datetime
 
     class Config:
@@ -0,0 +1,24 @@
+"""
+Risk score schemas
+"""
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+from app.models.risk_score import RiskType, RiskLevel
+
+
+class RiskScoreResponse(BaseModel):
+    """Schema for a stored risk score"""
+    id: int
+    risk_type: RiskType
+    nutrient_name: Optional[str] = None
+    risk_level: RiskLevel
+    score: float
+    description: Optional[str] = None
+    explanation: Optional[str] = None  # None until the LLM explanation is generated
+    recommendation: Optional[str] = None
+    calculated_at: datetime
+
+    class Config:
+        from_attributes = True
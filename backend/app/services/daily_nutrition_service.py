@@ -0,0 +1,192 @@
+"""
+Daily nutrition rollups and time-series trends
+"""
+import enum
+import math
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import User
+from app.models.meal import Meal
+from app.models.daily_nutrition import DailyNutrition
+from app.services.nutrient_aggregation import nutrient_aggregation_service
+from app.services.nutrient_storage import NUTRIENT_INDEX, NUTRIENT_UNITS
+
+
+class TrendBucket(str, enum.Enum):
+    """Bucket size for trend series"""
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class TrendStatistic(str, enum.Enum):
+    """How daily totals are combined within a bucket"""
+    MEAN = "mean"
+    SUM = "sum"
+
+
+class DailyNutritionService:
+    """
+    Maintains one DailyNutrition row per user, day and nutrient, and serves
+    bucketed trend series from them. Rows are recomputed from the packed
+    food item nutrients whenever a meal on that day is written or deleted.
+    """
+
+    async def refresh_days(self, db: AsyncSession, user_id: int, days: Iterable[date]):
+        """
+        Recompute the daily rows of a user for the given days in the current
+        transaction. The user row is locked so concurrent meal writes for the
+        same user recompute one after another instead of losing updates.
+        """
+        days = sorted(set(days))
+        if not days:
+            return
+
+        await db.execute(
+            select(User.id).where(User.id == user_id).with_for_update()
+        )
+        matrix = await nutrient_aggregation_service.load_matrix(db, user_id, days[0], days[-1])
+        totals = matrix.daily_totals(days[0], days[-1])
+        present = matrix.daily_present(days[0], days[-1])
+
+        rows = []
+        for day in days:
+            offset = (day - days[0]).days
+            for i in np.flatnonzero(present[offset]):
+                name = matrix.names[i]
+                # An overflow nutrient can share a vocabulary name in another unit;
+                # rows are unique per name, so only the vocabulary unit is rolled up
+                if i >= len(NUTRIENT_UNITS) and name in NUTRIENT_INDEX:
+                    continue
+                rows.append({
+                    "user_id": user_id,
+                    "date": day,
+                    "nutrient_name": name,
+                    "total_value": float(totals[offset, i]),
+                    "unit": matrix.units[i],
+                })
+
+        await db.execute(
+            delete(DailyNutrition).where(
+                DailyNutrition.user_id == user_id,
+                DailyNutrition.date.in_(days),
+            )
+        )
+        if rows:
+            await db.execute(insert(DailyNutrition), rows)
+
+    async def rebuild_user(self, db: AsyncSession, user_id: int):
+        """Recompute all daily rows of a user from their meals"""
+        first, last = (await db.execute(
+            select(func.min(Meal.meal_date), func.max(Meal.meal_date)).where(Meal.user_id == user_id)
+        )).one()
+        await db.execute(delete(DailyNutrition).where(DailyNutrition.user_id == user_id))
+        if first is not None:
+            start, end = first.date(), last.date()
+            await self.refresh_days(db, user_id, (start + timedelta(days=n) for n in range((end - start).days + 1)))
+
+    async def trends(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        nutrients: List[str],
+        start_date: date,
+        end_date: date,
+        bucket: TrendBucket = TrendBucket.DAY,
+        statistic: TrendStatistic = TrendStatistic.MEAN,
+        rolling_days: Optional[int] = None,
+        max_points: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Bucketed series of daily totals for the requested nutrients.
+
+        Days without meals count as zero. With rolling_days, each series also
+        carries a trailing rolling average of the daily totals, bucketed the
+        same way. With max_points, consecutive buckets are merged so that at
+        most max_points are returned.
+        """
+        names = list(dict.fromkeys(nutrients))
+        column = {name: i for i, name in enumerate(names)}
+        window = rolling_days or 1
+        load_start = start_date - timedelta(days=window - 1)
+
+        result = await db.execute(
+            select(DailyNutrition.date, DailyNutrition.nutrient_name, DailyNutrition.total_value, DailyNutrition.unit)
+            .where(
+                DailyNutrition.user_id == user_id,
+                DailyNutrition.date >= load_start,
+                DailyNutrition.date <= end_date,
+                DailyNutrition.nutrient_name.in_(names),
+            )
+        )
+        daily = np.zeros(((end_date - load_start).days + 1, len(names)))
+        units = [NUTRIENT_UNITS[NUTRIENT_INDEX[name]] if name in NUTRIENT_INDEX else None for name in names]
+        for day, name, total_value, unit in result.all():
+            daily[(day - load_start).days, column[name]] = total_value
+            units[column[name]] = unit
+
+        rolling = None
+        if rolling_days:
+            cumulative = np.vstack([np.zeros((1, len(names))), np.cumsum(daily, axis=0)])
+            rolling = (cumulative[window:] - cumulative[:-window]) / window
+        daily = daily[window - 1:]
+
+        days = np.arange(np.datetime64(start_date, "D"), np.datetime64(end_date, "D") + 1)
+        if bucket == TrendBucket.WEEK:
+            # Day 0 of the epoch is a Thursday; buckets start on Monday
+            keys = days - (days.astype(np.int64) + 3) % 7
+        elif bucket == TrendBucket.MONTH:
+            keys = days.astype("datetime64[M]").astype("datetime64[D]")
+        else:
+            keys = days
+        labels, bucket_index = np.unique(keys, return_inverse=True)
+
+        if max_points and len(labels) > max_points:
+            group = math.ceil(len(labels) / max_points)
+            bucket_index = bucket_index // group
+            labels = labels[::group]
+
+        day_counts = np.bincount(bucket_index, minlength=len(labels)).astype(float)
+
+        def combine(values: np.ndarray) -> np.ndarray:
+            sums = np.zeros((len(labels), values.shape[1]))
+            np.add.at(sums, bucket_index, values)
+            if statistic == TrendStatistic.MEAN:
+                return sums / day_counts[:, None]
+            return sums
+
+        values = combine(daily)
+        rolling_values = combine(rolling) if rolling is not None else None
+        if rolling_values is not None and statistic == TrendStatistic.SUM:
+            # Summing a rolling average is meaningless; report its bucket mean
+            rolling_values = rolling_values / day_counts[:, None]
+
+        series = []
+        for i, name in enumerate(names):
+            entry = {
+                "name": name,
+                "unit": units[i],
+                "values": np.round(values[:, i], 2).tolist(),
+            }
+            if rolling_values is not None:
+                entry["rolling_average"] = np.round(rolling_values[:, i], 2).tolist()
+            series.append(entry)
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "bucket": bucket.value,
+            "statistic": statistic.value,
+            "rolling_days": rolling_days,
+            "dates": [label.item() for label in labels],
+            "days_per_point": day_counts.astype(int).tolist(),
+            "series": series,
+        }
+
+
+# Global daily nutrition service instance
+daily_nutrition_service = DailyNutritionService()
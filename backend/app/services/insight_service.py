@@ -0,0 +1,115 @@
+"""
+Precomputed health insights
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import set_statement_timeout
+from app.core.response_cache import get_data_version
+from app.models.user import User
+from app.models.health_insight import HealthInsight
+from app.services.llm_service import llm_service, DEFAULT_HEALTH_INSIGHT
+from app.services.nutrient_aggregation import nutrient_aggregation_service
+
+INSIGHT_DISCLAIMER = "This information is for general educational purposes only and is not intended as medical advice. Please consult with a healthcare professional for personalized recommendations."
+
+
+class InsightService:
+    """
+    Stores one LLM health insight per user for the precomputed period
+    length (INSIGHT_PERIOD_DAYS); other lengths are generated per request
+    without being stored, so they cannot grow the table. An insight is
+    stale once the user logs or deletes a meal, the period rolls over to a
+    new day, or it passes its expiry; stale insights are regenerated by the
+    background scheduler or on demand.
+    """
+
+    def is_stale(self, insight: Optional[HealthInsight], data_version: int, today: date) -> bool:
+        """Whether a stored insight no longer reflects the user's data"""
+        if insight is None:
+            return True
+        expires_at = insight.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return (
+            insight.data_version != data_version
+            or insight.period_end != today
+            or expires_at <= datetime.now(timezone.utc)
+        )
+
+    async def get_stored(self, db: AsyncSession, user_id: int, days: int) -> Optional[HealthInsight]:
+        """The stored insight of a user for a period length"""
+        result = await db.execute(
+            select(HealthInsight).where(HealthInsight.user_id == user_id, HealthInsight.period_days == days)
+        )
+        return result.scalar_one_or_none()
+
+    async def generate(self, db: AsyncSession, user_id: int, days: int, store: bool = True) -> Dict[str, Any]:
+        """
+        Aggregate the period, ask the LLM for an insight and store it (if
+        `store`). The LLM call runs outside any lock; fallback answers are
+        returned but not stored so the next request retries.
+        """
+        today = datetime.now(timezone.utc).date()
+        start_date = today - timedelta(days=days - 1)
+        await set_statement_timeout(db, settings.DB_REPORT_STATEMENT_TIMEOUT_MS)
+        data_version = await get_data_version(db, user_id)
+        matrix = await nutrient_aggregation_service.load_matrix(db, user_id, start_date, today)
+        nutrient_summary = matrix.to_dict(matrix.totals())
+        # Release the read transaction while waiting on the LLM
+        await db.commit()
+
+        insights = await llm_service.generate_health_insight(
+            nutrient_summary,
+            time_period=f"{days} days"
+        )
+        generated_at = datetime.now(timezone.utc)
+
+        if store and insights != DEFAULT_HEALTH_INSIGHT:
+            await db.execute(
+                select(User.id).where(User.id == user_id).with_for_update(key_share=True)
+            )
+            insight = await self.get_stored(db, user_id, days)
+            if insight is None:
+                insight = HealthInsight(user_id=user_id, period_days=days)
+                db.add(insight)
+            insight.period_end = today
+            insight.nutrient_summary = nutrient_summary
+            insight.explanation = insights.get("explanation", "")
+            insight.recommendations = insights.get("recommendations", "")
+            insight.data_version = data_version
+            insight.generated_at = generated_at
+            insight.expires_at = generated_at + timedelta(hours=settings.INSIGHT_TTL_HOURS)
+            await db.commit()
+
+        return {
+            "period_days": days,
+            "nutrient_summary": nutrient_summary,
+            "explanation": insights.get("explanation", ""),
+            "recommendations": insights.get("recommendations", ""),
+            "generated_at": generated_at,
+            "disclaimer": INSIGHT_DISCLAIMER,
+        }
+
+    async def get_insight(self, db: AsyncSession, user_id: int, days: int) -> Dict[str, Any]:
+        """Serve the stored insight if it is current, otherwise regenerate it"""
+        if days != settings.INSIGHT_PERIOD_DAYS:
+            return await self.generate(db, user_id, days, store=False)
+        insight = await self.get_stored(db, user_id, days)
+        if self.is_stale(insight, await get_data_version(db, user_id), datetime.now(timezone.utc).date()):
+            return await self.generate(db, user_id, days)
+        return {
+            "period_days": days,
+            "nutrient_summary": insight.nutrient_summary,
+            "explanation": insight.explanation or "",
+            "recommendations": insight.recommendations or "",
+            "generated_at": insight.generated_at,
+            "disclaimer": INSIGHT_DISCLAIMER,
+        }
+
+
+# Global insight service instance
+insight_service = InsightService()
@@ -0,0 +1,252 @@
+"""
+Incremental JSON parsing and repair for LLM output
+"""
+import json
+import re
+from typing import Any, List, Optional
+
+# Python-style literals some models emit instead of JSON ones
+_LITERAL_FIXES = {"True": "true", "False": "false", "None": "null"}
+_LEADING_NUMBER_RE = re.compile(r"^-?\d+(?:\.\d+)?")
+_CLOSERS = {"{": "}", "[": "]"}
+_WHITESPACE = " \t\r\n"
+_TOKEN_DELIMITERS = ",:}]" + _WHITESPACE
+
+
+class IncrementalJSONParser:
+    """
+    Incremental JSON parser that tolerates the ways LLMs break JSON.
+
+    Text can be fed chunk by chunk while it streams from the model. The parser
+    skips any preamble (such as a markdown code fence) before the first '{' or
+    '[', ignores anything after the top-level value closes, drops trailing and
+    duplicate commas, inserts missing ones, quotes bare object keys and turns
+    invalid bare tokens into numbers or null. It also remembers the last point
+    at which the document could be closed cleanly, so truncated output is
+    salvaged up to the last complete element instead of being discarded.
+    An array element cut off midway (e.g. a nutrient object missing its
+    value) is dropped whole rather than closed early.
+    """
+
+    def __init__(self):
+        self._out: List[str] = []
+        # Stack frames are [opener, state]; object states are key/colon/value/after,
+        # array states are value/after ("after" means a complete element was just read)
+        self._stack: List[list] = []
+        self._started = False
+        self.complete = False
+        self.repaired = False
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._token: List[str] = []
+        self._token_is_key = False
+        self._pending_comma = False
+        self._key_start = 0
+        self._safe_len = 0
+        self._safe_closers = ""
+
+    @property
+    def has_data(self) -> bool:
+        """Whether any JSON structure has been seen yet"""
+        return self._started
+
+    def feed(self, chunk: str) -> None:
+        """Consume the next chunk of model output"""
+        for char in chunk:
+            if self.complete:
+                return
+            self._consume(char)
+
+    def result(self) -> Optional[Any]:
+        """
+        Return the parsed value.
+        If the document is incomplete, it is closed at the last complete element.
+        Returns None if nothing could be salvaged.
+        """
+        if not self._started:
+            return None
+
+        if self.complete:
+            text = "".join(self._out)
+        else:
+            # A trailing bare token may itself be truncated (e.g. "12" of "125"),
+            # so it is dropped along with everything after the last safe point
+            text = "".join(self._out[:self._safe_len]) + self._safe_closers
+            self.repaired = True
+
+        try:
+            return json.loads(text, strict=False)
+        except json.JSONDecodeError:
+            return None
+
+    def _consume(self, char: str) -> None:
+        if not self._started:
+            if char in _CLOSERS:
+                self._open(char)
+            return
+
+        if self._in_string:
+            self._consume_string(char)
+            return
+
+        if self._token:
+            if char not in _TOKEN_DELIMITERS:
+                self._token.append(char)
+                return
+            self._flush_token()
+            if self.complete:
+                return
+
+        if char in _WHITESPACE:
+            return
+
+        frame = self._stack[-1]
+        if char in _CLOSERS:
+            if self._begin_value():
+                self._open(char)
+        elif char in "}]":
+            self._close(char)
+        elif char == ",":
+            if frame[1] == "after":
+                self._pending_comma = True
+                frame[1] = "key" if frame[0] == "{" else "value"
+            else:
+                self.repaired = True
+        elif char == ":":
+            if frame[1] == "colon":
+                self._out.append(char)
+                frame[1] = "value"
+            else:
+                self.repaired = True
+        elif char == '"':
+            if frame[0] == "{" and frame[1] in ("key", "after"):
+                self._begin_key()
+                self._string_is_key = True
+            elif self._begin_value():
+                self._string_is_key = False
+            else:
+                return
+            self._in_string = True
+            self._out.append(char)
+        else:
+            if frame[0] == "{" and frame[1] in ("key", "after"):
+                # Bare object key, quoted when the token ends
+                self._begin_key()
+                self._token_is_key = True
+            elif self._begin_value():
+                self._token_is_key = False
+            else:
+                return
+            self._token.append(char)
+
+    def _consume_string(self, char: str) -> None:
+        self._out.append(char)
+        if self._escape:
+            self._escape = False
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            if self._string_is_key:
+                self._stack[-1][1] = "colon"
+            else:
+                self._value_done()
+
+    def _begin_key(self) -> None:
+        """Prepare the current object frame for a new key"""
+        frame = self._stack[-1]
+        self._key_start = len(self._out)
+        if frame[1] == "after":
+            # Missing comma between members
+            self.repaired = True
+            self._pending_comma = True
+        if self._pending_comma:
+            self._out.append(",")
+            self._pending_comma = False
+        frame[1] = "key"
+
+    def _begin_value(self) -> bool:
+        """Prepare the current frame for a new value; False if a value is not allowed here"""
+        frame = self._stack[-1]
+        if frame[0] == "{":
+            if frame[1] == "colon":
+                # Missing colon after a key
+                self.repaired = True
+                self._out.append(":")
+                frame[1] = "value"
+            if frame[1] != "value":
+                self.repaired = True
+                return False
+        elif frame[1] == "after":
+            # Missing comma between array elements
+            self.repaired = True
+            self._pending_comma = True
+        if self._pending_comma:
+            self._out.append(",")
+            self._pending_comma = False
+        return True
+
+    def _open(self, char: str) -> None:
+        self._started = True
+        self._out.append(char)
+        self._stack.append([char, "key" if char == "{" else "value"])
+        self._mark_safe()
+
+    def _close(self, char: str) -> None:
+        frame = self._stack[-1]
+        if self._pending_comma:
+            # Trailing comma before the closer
+            self.repaired = True
+            self._pending_comma = False
+        if frame[0] == "{" and frame[1] in ("colon", "value"):
+            # Dangling key without a value
+            self.repaired = True
+            del self._out[self._key_start:]
+        if char != _CLOSERS[frame[0]]:
+            self.repaired = True
+        self._out.append(_CLOSERS[frame[0]])
+        self._stack.pop()
+        if not self._stack:
+            self.complete = True
+        else:
+            self._value_done()
+
+    def _flush_token(self) -> None:
+        token = "".join(self._token)
+        self._token = []
+        if self._token_is_key:
+            self.repaired = True
+            self._out.append(json.dumps(token))
+            self._stack[-1][1] = "colon"
+            return
+
+        token = _LITERAL_FIXES.get(token, token)
+        try:
+            json.loads(token)
+        except json.JSONDecodeError:
+            # Salvage values like "16g"; anything else becomes null
+            self.repaired = True
+            match = _LEADING_NUMBER_RE.match(token)
+            token = match.group() if match else "null"
+        self._out.append(token)
+        self._value_done()
+
+    def _value_done(self) -> None:
+        self._stack[-1][1] = "after"
+        self._mark_safe()
+
+    def _mark_safe(self) -> None:
+        # Inside an open container that is an array element, closing here
+        # would turn a half-written element into a plausible complete one
+        if any(parent[0] == "[" for parent in self._stack[:-1]):
+            return
+        self._safe_len = len(self._out)
+        self._safe_closers = "".join(_CLOSERS[frame[0]] for frame in reversed(self._stack))
+
+
+def parse_llm_json(text: str) -> Optional[Any]:
+    """Parse (and if necessary repair) a complete LLM response"""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.result()
@@ -1,9 +1,38 @@
 """
 LLM service for food normalization and health insights
 """
+import asyncio
+import json
+import time
 import httpx
-from typing import Dict
+from typing import Any, Dict, Optional
 from app.core.config import settings
+from app.core.http_client import http_clients
+from app.core.metrics import LLM_REQUEST_DURATION, LLM_TIMEOUTS, LLM_TOKENS
+from app.core.instrumentation import increment, stage
+from app.schemas.llm import (
+    NutritionLabelOutput,
+    FoodListOutput,
+    HealthInsightOutput,
+    RiskExplanationOutput,
+)
+from app.services.json_stream import IncrementalJSONParser
+
+# Returned by generate_health_insight / explain_risk_score when the LLM gives
+# no usable answer
+DEFAULT_HEALTH_INSIGHT = {
+    "explanation": "Unable to generate insight at this time.",
+    "recommendations": "Please consult with a healthcare professional.",
+}
+DEFAULT_RISK_EXPLANATION = {
+    "explanation": "Risk assessment completed.",
+    "recommendation": "Please consult with a healthcare professional for personalized advice.",
+}
+
+
+def _with_defaults(output: Dict[str, str], defaults: Dict[str, str]) -> Dict[str, str]:
+    """Fill fields left empty (e.g. by a stream cut short) from the defaults"""
+    return {key: output.get(key) or default for key, default in defaults.items()}
 
 
 class LLMService:
@@ -12,8 +41,73 @@ class LLMService:
     def __init__(self):
         self.base_url = settings.OLLAMA_BASE_URL
         self.model = settings.OLLAMA_MODEL
-        # Increased timeout for LLM processing (nutrition label parsing can take longer)
-        self.client = httpx.AsyncClient(timeout=180.0)
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared pooled client for Ollama (timeouts configured in settings)"""
+        return http_clients.get("ollama")
+    
+    async def _generate_json(self, prompt: str, method: str = "generate") -> Optional[Any]:
+        """
+        Run a JSON-mode generation and parse the output incrementally as it streams.
+        Stops reading as soon as the top-level JSON value is complete, and if the
+        stream times out part-way (between chunks, or after OLLAMA_READ_TIMEOUT in
+        total), salvages whatever complete elements arrived.
+        Returns None if the model produced nothing parseable.
+        Duration, tokens and timeouts are recorded in metrics and an llm.<method> stage.
+        """
+        with stage(f"llm.{method}") as span:
+            span.set_attribute("llm.model", self.model)
+            parser = IncrementalJSONParser()
+            started = time.perf_counter()
+            outcome = "error"
+            # Ollama reports token counts on the final chunk; when the stream is
+            # cut short, every streamed chunk is one generated token
+            prompt_tokens = 0
+            completion_tokens = 0
+            try:
+                async with asyncio.timeout(settings.OLLAMA_READ_TIMEOUT), self.client.stream(
+                    "POST",
+                    f"{self.base_url}/api/generate",
+                    json={
+                        "model": self.model,
+                        "prompt": prompt,
+                        "stream": True,
+                        "format": "json"
+                    }
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        parser.feed(chunk.get("response", ""))
+                        completion_tokens += 1
+                        if chunk.get("done"):
+                            prompt_tokens = chunk.get("prompt_eval_count", 0)
+                            completion_tokens = chunk.get("eval_count", completion_tokens)
+                        if chunk.get("done") or parser.complete:
+                            break
+                outcome = "ok"
+            except (httpx.TimeoutException, TimeoutError):
+                outcome = "timeout"
+                LLM_TIMEOUTS.labels(method).inc()
+                increment("llm.timeouts")
+                if not parser.has_data:
+                    raise
+                print("LLM stream timed out, salvaging partial output")
+            finally:
+                span.set_attribute("llm.outcome", outcome)
+                span.set_attribute("llm.prompt_tokens", prompt_tokens)
+                span.set_attribute("llm.completion_tokens", completion_tokens)
+                LLM_REQUEST_DURATION.labels(method, outcome).observe(time.perf_counter() - started)
+                LLM_TOKENS.labels(method, "prompt").inc(prompt_tokens)
+                LLM_TOKENS.labels(method, "completion").inc(completion_tokens)
+            
+            result = parser.result()
+            if parser.repaired:
+                print("LLM output was malformed or truncated and has been repaired")
+            return result
     
     async def normalize_food_text(self, raw_text: str) -> Dict[str, any]:
         """
@@ -88,69 +182,33 @@ Return only valid JSON, no other text. Example:
 }}"""
         
         try:
-            response = await self.client.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "format": "json"
-                }
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            # Extract JSON from response
-            import json
-            response_text = result.get("response", "")
-            print(f"LLM raw response length: {len(response_text)} chars")
-            print(f"LLM raw response preview: {response_text[:500]}")
+            parsed = await self._generate_json(prompt, "normalize_food_text")
+            if parsed is None:
+                print("LLM returned no parseable JSON")
+                return {"is_nutrition_label": False, "food_items": []}
+            print(f"LLM parsed JSON keys: {list(parsed.keys()) if isinstance(parsed, dict) else 'Not a dict'}")
             
-            # Try to extract JSON from the response
-            try:
-                # Remove markdown code blocks if present
-                if "```json" in response_text:
-                    response_text = response_text.split("```json")[1].split("```")[0]
-                elif "```" in response_text:
-                    response_text = response_text.split("```")[1].split("```")[0]
-                
-                parsed = json.loads(response_text.strip())
-                print(f"LLM parsed JSON keys: {list(parsed.keys()) if isinstance(parsed, dict) else 'Not a dict'}")
-                
-                # Handle nutrition label response
-                if isinstance(parsed, dict) and parsed.get("is_nutrition_label"):
-                    nutrients = parsed.get("nutrients", [])
-                    print(f"LLM extracted {len(nutrients)} nutrients from nutrition label")
-                    if nutrients:
-                        print(f"First few nutrients: {nutrients[:3]}")
-                    else:
-                        print("WARNING: LLM returned empty nutrients array!")
-                    
-                    return {
-                        "is_nutrition_label": True,
-                        "serving_size": parsed.get("serving_size", "1 serving"),
-                        "servings_per_container": parsed.get("servings_per_container", 1),
-                        "nutrients": nutrients,
-                        "food_items": []
-                    }
-                # Handle food items list response
-                elif isinstance(parsed, dict) and "food_items" in parsed:
-                    return {
-                        "is_nutrition_label": False,
-                        "food_items": parsed.get("food_items", [])
-                    }
-                # Handle raw array (legacy format)
-                elif isinstance(parsed, list):
-                    return {"is_nutrition_label": False, "food_items": parsed}
+            # Handle nutrition label response
+            if isinstance(parsed, dict) and parsed.get("is_nutrition_label"):
+                label = NutritionLabelOutput.model_validate(parsed)
+                print(f"LLM extracted {len(label.nutrients)} nutrients from nutrition label")
+                if label.nutrients:
+                    print(f"First few nutrients: {label.nutrients[:3]}")
                 else:
-                    print(f"WARNING: LLM returned unexpected format: {type(parsed)}")
-                    return {"is_nutrition_label": False, "food_items": []}
-            except json.JSONDecodeError as je:
-                print(f"LLM JSON decode error: {je}")
-                print(f"Failed to parse response text: {response_text[:300]}")
+                    print("WARNING: LLM returned empty nutrients array!")
+                
+                return label.model_dump()
+            # Handle food items list response
+            elif isinstance(parsed, dict) and "food_items" in parsed:
+                return FoodListOutput.model_validate(parsed).model_dump()
+            # Handle raw array (legacy format)
+            elif isinstance(parsed, list):
+                return FoodListOutput(food_items=parsed).model_dump()
+            else:
+                print(f"WARNING: LLM returned unexpected format: {type(parsed)}")
                 return {"is_nutrition_label": False, "food_items": []}
         except httpx.TimeoutException as te:
-            print(f"LLM request timed out after 120 seconds. Ollama may be slow or the model may not be loaded.")
+            print(f"LLM request timed out after {settings.OLLAMA_READ_TIMEOUT:.0f} seconds. Ollama may be slow or the model may not be loaded.")
             print(f"Check if Ollama is running: docker compose ps ollama")
             print(f"Check if model is loaded: docker exec vitalens-ollama ollama list")
             print(f"To load the model, run: docker exec vitalens-ollama ollama pull {self.model}")
@@ -189,42 +247,13 @@ Return JSON format:
 }}"""
         
         try:
-            response = await self.client.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "format": "json"
-                }
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            import json
-            response_text = result.get("response", "")
-            try:
-                if "```json" in response_text:
-                    response_text = response_text.split("```json")[1].split("```")[0]
-                elif "```" in response_text:
-                    response_text = response_text.split("```")[1].split("```")[0]
-                
-                insight = json.loads(response_text.strip())
-                return {
-                    "explanation": insight.get("explanation", ""),
-                    "recommendations": insight.get("recommendations", "")
-                }
-            except json.JSONDecodeError:
-                return {
-                    "explanation": "Unable to generate insight at this time.",
-                    "recommendations": "Please consult with a healthcare professional."
-                }
+            insight = await self._generate_json(prompt, "generate_health_insight")
+            if isinstance(insight, dict):
+                return _with_defaults(HealthInsightOutput.model_validate(insight).model_dump(), DEFAULT_HEALTH_INSIGHT)
+            return dict(DEFAULT_HEALTH_INSIGHT)
         except Exception as e:
             print(f"LLM insight generation failed: {e}")
-            return {
-                "explanation": "Unable to generate insight at this time.",
-                "recommendations": "Please consult with a healthcare professional."
-            }
+            return dict(DEFAULT_HEALTH_INSIGHT)
     
     async def explain_risk_score(
         self,
@@ -253,46 +282,13 @@ Return JSON:
 }}"""
         
         try:
-            response = await self.client.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "format": "json"
-                }
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            import json
-            response_text = result.get("response", "")
-            try:
-                if "```json" in response_text:
-                    response_text = response_text.split("```json")[1].split("```")[0]
-                elif "```" in response_text:
-                    response_text = response_text.split("```")[1].split("```")[0]
-                
-                explanation = json.loads(response_text.strip())
-                return {
-                    "explanation": explanation.get("explanation", ""),
-                    "recommendation": explanation.get("recommendation", "")
-                }
-            except json.JSONDecodeError:
-                return {
-                    "explanation": "Risk assessment completed.",
-                    "recommendation": "Please consult with a healthcare professional for personalized advice."
-                }
+            explanation = await self._generate_json(prompt, "explain_risk_score")
+            if isinstance(explanation, dict):
+                return _with_defaults(RiskExplanationOutput.model_validate(explanation).model_dump(), DEFAULT_RISK_EXPLANATION)
+            return dict(DEFAULT_RISK_EXPLANATION)
         except Exception as e:
             print(f"LLM risk explanation failed: {e}")
-            return {
-                "explanation": "Risk assessment completed.",
-                "recommendation": "Please consult with a healthcare professional for personalized advice."
-            }
-    
-    async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+            return dict(DEFAULT_RISK_EXPLANATION)
 
 
 # Global LLM service instance
@@ -0,0 +1,181 @@
+"""
+Bulk persistence for meals, their food items and nutrients
+"""
+from typing import Any, Dict, List, Set, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.instrumentation import stage
+from app.core.rate_limit import BACKGROUND, RateLimited
+from app.core.response_cache import bump_data_version
+from app.models.meal import Meal
+from app.models.food_item import FoodItem, NutritionStatus
+from app.models.nutrient import Nutrient
+from app.services.nutrition_service import nutrition_service
+from app.services.nutrient_storage import pack_nutrients
+from app.services.daily_nutrition_service import daily_nutrition_service
+
+# A food item's column values paired with its nutrient rows
+FoodItemRows = Tuple[Dict[str, Any], List[Dict[str, Any]]]
+
+
+class MealPersistenceService:
+    """
+    Builds food items and nutrients in memory and writes a meal in a fixed
+    number of round-trips: one INSERT for the meal and one multi-row
+    INSERT ... RETURNING for its food items, with nutrients packed into each
+    food item. Legacy nutrient rows, when enabled, add one executemany.
+    The meal's day is re-rolled into DailyNutrition and the user's data
+    version is bumped in the same transaction.
+    """
+
+    def nutrient_rows(self, nutrition_data: Dict[str, float], quantity: float) -> List[Dict[str, Any]]:
+        """Build nutrient rows from nutrition data scaled to the item quantity"""
+        return [
+            {
+                "name": nutrient_name,
+                "value": value,
+                "unit": nutrition_service.nutrient_units.get(nutrient_name, "g"),
+                "per_100g": value / (quantity / 100.0) if quantity and quantity > 0 else value,
+            }
+            for nutrient_name, value in nutrition_data.items()
+        ]
+
+    def label_nutrient_rows(self, nutrients_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Build nutrient rows from nutrition label data, skipping invalid entries"""
+        rows = []
+        for nutrient_data in nutrients_data:
+            nutrient_name = (nutrient_data.get("name") or "").strip()
+            nutrient_value = nutrient_data.get("value", 0)
+            nutrient_unit = nutrient_data.get("unit", "g")
+
+            if not nutrient_name:
+                print(f"WARNING: Skipping nutrient with empty name: {nutrient_data}")
+                continue
+
+            try:
+                rows.append({
+                    "name": nutrient_name.lower().replace(" ", "_"),
+                    "value": float(nutrient_value) if nutrient_value is not None else 0.0,
+                    "unit": nutrient_unit,
+                    "per_100g": None,  # Not applicable for nutrition labels
+                })
+            except (ValueError, TypeError) as e:
+                print(f"WARNING: Failed to create nutrient {nutrient_name}: {e}, data: {nutrient_data}")
+        return rows
+
+    async def resolve_food_items(self, items: List[Dict[str, Any]]) -> List[FoodItemRows]:
+        """
+        Look up nutrition for all food items in one batch and pair each item
+        with its nutrient rows. Runs before any database work. Items whose
+        lookup hit the exhausted USDA budget are stored without nutrients as
+        pending, for the scheduler's backfill, rather than with defaults.
+        """
+        names = [item.get("normalized_name") or item["name"] for item in items]
+        with stage("nutrition.resolve"):
+            results = await nutrition_service.get_nutrition_from_usda_many(names)
+
+        resolved = []
+        for item, name in zip(items, names):
+            base_nutrition = results[nutrition_service.normalize_food_name(name)]
+            if isinstance(base_nutrition, RateLimited):
+                resolved.append((dict(item, nutrition_status=NutritionStatus.PENDING), []))
+            else:
+                nutrition_data = nutrition_service.scale_nutrition(base_nutrition, item.get("quantity") or 100)
+                resolved.append((item, self.nutrient_rows(nutrition_data, item.get("quantity"))))
+        pending = sum(1 for item, _ in resolved if item.get("nutrition_status") == NutritionStatus.PENDING)
+        if pending:
+            print(f"USDA request budget exhausted: {pending} food items left pending for backfill")
+        return resolved
+
+    async def persist_meal(self, db: AsyncSession, meal: Meal, food_items: List[FoodItemRows]) -> Meal:
+        """
+        Insert a meal with its food items and nutrients, commit, and return the
+        meal with food items loaded.
+        """
+        db.add(meal)
+        await db.flush()
+
+        if food_items:
+            food_item_rows = []
+            for item, rows in food_items:
+                nutrient_values, extra_nutrients = pack_nutrients(rows)
+                food_item_rows.append(dict(
+                    item,
+                    meal_id=meal.id,
+                    nutrient_values=nutrient_values,
+                    extra_nutrients=extra_nutrients,
+                ))
+            food_item_ids = (await db.scalars(
+                insert(FoodItem).returning(FoodItem.id, sort_by_parameter_order=True),
+                food_item_rows,
+            )).all()
+
+            if settings.NUTRIENT_ROW_STORAGE:
+                nutrient_rows = [
+                    dict(row, food_item_id=food_item_id)
+                    for food_item_id, (_, rows) in zip(food_item_ids, food_items)
+                    for row in rows
+                ]
+                if nutrient_rows:
+                    await db.execute(insert(Nutrient), nutrient_rows)
+
+        await daily_nutrition_service.refresh_days(db, meal.user_id, [meal.meal_date.date()])
+        await bump_data_version(db, meal.user_id)
+        await db.commit()
+
+        result = await db.execute(
+            select(Meal)
+            .where(Meal.id == meal.id)
+            .options(selectinload(Meal.food_items))
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one()
+
+    async def backfill_pending_nutrition(self, db: AsyncSession, limit: int) -> int:
+        """
+        Look up nutrition for up to `limit` pending food items at background
+        priority, store it and re-roll the affected days. Items the USDA
+        budget could not cover stay pending; returns the number resolved.
+        """
+        food_items = (await db.scalars(
+            select(FoodItem)
+            .where(FoodItem.nutrition_status == NutritionStatus.PENDING)
+            .options(selectinload(FoodItem.meal))
+            .order_by(FoodItem.id)
+            .limit(limit)
+        )).all()
+        # No transaction stays open across the USDA calls
+        await db.commit()
+
+        names = [food_item.normalized_name or food_item.name for food_item in food_items]
+        results = await nutrition_service.get_nutrition_from_usda_many(names, priority=BACKGROUND)
+
+        resolved = []
+        for food_item, name in zip(food_items, names):
+            base_nutrition = results[nutrition_service.normalize_food_name(name)]
+            if isinstance(base_nutrition, RateLimited):
+                continue
+            nutrition_data = nutrition_service.scale_nutrition(base_nutrition, food_item.quantity or 100)
+            rows = self.nutrient_rows(nutrition_data, food_item.quantity)
+            food_item.nutrient_values, food_item.extra_nutrients = pack_nutrients(rows)
+            food_item.nutrition_status = NutritionStatus.RESOLVED
+            if settings.NUTRIENT_ROW_STORAGE:
+                db.add_all(Nutrient(food_item_id=food_item.id, **row) for row in rows)
+            resolved.append(food_item)
+
+        days_by_user: Dict[int, Set] = {}
+        for food_item in resolved:
+            days_by_user.setdefault(food_item.meal.user_id, set()).add(food_item.meal.meal_date.date())
+        await db.flush()
+        for user_id, days in days_by_user.items():
+            await daily_nutrition_service.refresh_days(db, user_id, days)
+            await bump_data_version(db, user_id)
+        await db.commit()
+        return len(resolved)
+
+
+# Global meal persistence service instance
+meal_persistence_service = MealPersistenceService()
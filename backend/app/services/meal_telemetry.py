@@ -0,0 +1,115 @@
+"""
+Per-meal processing telemetry for uploads
+"""
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import async_session_maker
+from app.core.instrumentation import StageCollector
+from app.core.server_timing import timing_breakdown
+from app.models.meal import Meal
+from app.models.meal_processing_telemetry import MealProcessingTelemetry
+
+
+class MealTelemetryService:
+    """
+    Stores the stage breakdown of each upload (the same figures as its
+    Server-Timing header) next to the meal, so slow uploads can be found and
+    correlated with file type, size and meal type after the fact.
+    """
+
+    def build(self, meal: Meal, collector: StageCollector, total_seconds: float) -> MealProcessingTelemetry:
+        """Telemetry row for an uploaded meal from the stages collected while processing it"""
+        breakdown = timing_breakdown(collector, total_seconds)
+        counters = collector.counters
+        # The outermost OCR stage is named ocr.<image|pdf>.<engine>
+        ocr_engine = next(
+            (t.name.rsplit(".", 1)[1] for t in collector.timings if t.depth == 0 and t.name.startswith("ocr.")),
+            None,
+        )
+        return MealProcessingTelemetry(
+            meal_id=meal.id,
+            file_extension=os.path.splitext(meal.source_file_path or "")[1] or None,
+            file_size_bytes=int(counters.get("upload.bytes", 0)),
+            ocr_engine=ocr_engine,
+            ocr_ms=breakdown.get("ocr", 0.0),
+            llm_ms=breakdown.get("llm", 0.0),
+            nutrition_ms=breakdown.get("nutrition", 0.0),
+            db_ms=breakdown.get("db", 0.0),
+            total_ms=breakdown["total"],
+            db_queries=int(counters.get("db.queries", 0)),
+            ocr_characters=len(meal.raw_text or ""),
+            food_item_count=len(meal.food_items),
+            llm_timeouts=int(counters.get("llm.timeouts", 0)),
+            usda_cache_hits=int(counters.get("usda.cache_hits", 0)),
+            usda_cache_misses=int(counters.get("usda.cache_misses", 0)),
+        )
+
+    async def record_upload(self, meal: Meal, collector: StageCollector, total_seconds: float):
+        """Store an upload's telemetry; failures are logged, never raised to the client"""
+        try:
+            async with async_session_maker() as db:
+                db.add(self.build(meal, collector, total_seconds))
+                await db.commit()
+        except Exception as e:
+            print(f"Failed to record telemetry for meal {meal.id}: {e}")
+
+    async def slowest_uploads(
+        self,
+        db: AsyncSession,
+        since: Optional[datetime] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """Slowest uploads with their breakdown, file and meal details"""
+        return await self._uploads(db, MealProcessingTelemetry.total_ms.desc(), since, limit)
+
+    async def sample_uploads(
+        self,
+        db: AsyncSession,
+        since: Optional[datetime] = None,
+        limit: int = 10000,
+    ) -> List[Dict[str, Any]]:
+        """Uniform random sample of uploads, as a baseline for the slowest ones"""
+        return await self._uploads(db, func.random(), since, limit)
+
+    async def _uploads(self, db: AsyncSession, order_by, since: Optional[datetime], limit: int) -> List[Dict[str, Any]]:
+        query = (
+            select(MealProcessingTelemetry, Meal.source_type, Meal.meal_type, Meal.user_id)
+            .join(Meal, Meal.id == MealProcessingTelemetry.meal_id)
+            .order_by(order_by)
+            .limit(limit)
+        )
+        if since is not None:
+            query = query.where(MealProcessingTelemetry.created_at >= since)
+        result = await db.execute(query)
+        return [
+            {
+                "meal_id": telemetry.meal_id,
+                "user_id": user_id,
+                "source_type": source_type.value,
+                "meal_type": meal_type.value,
+                "file_extension": telemetry.file_extension,
+                "file_size_bytes": telemetry.file_size_bytes,
+                "ocr_engine": telemetry.ocr_engine,
+                "total_ms": telemetry.total_ms,
+                "ocr_ms": telemetry.ocr_ms,
+                "llm_ms": telemetry.llm_ms,
+                "nutrition_ms": telemetry.nutrition_ms,
+                "db_ms": telemetry.db_ms,
+                "db_queries": telemetry.db_queries,
+                "ocr_characters": telemetry.ocr_characters,
+                "food_item_count": telemetry.food_item_count,
+                "llm_timeouts": telemetry.llm_timeouts,
+                "usda_cache_hits": telemetry.usda_cache_hits,
+                "usda_cache_misses": telemetry.usda_cache_misses,
+                "created_at": telemetry.created_at,
+            }
+            for telemetry, source_type, meal_type, user_id in result.all()
+        ]
+
+
+# Global meal telemetry service instance
+meal_telemetry_service = MealTelemetryService()
@@ -0,0 +1,177 @@
+"""
+Vectorized nutrient aggregation over packed food item nutrients
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.meal import Meal
+from app.models.food_item import FoodItem
+from app.services.nutrient_storage import NUTRIENT_VOCABULARY, NUTRIENT_UNITS
+
+# (meal_id, meal_date, nutrient_values, extra_nutrients) for one food item;
+# meals without food items appear once with empty nutrients
+NutrientRow = Tuple[int, datetime, Optional[List[Optional[float]]], Optional[Dict[str, Dict[str, Any]]]]
+
+
+class NutrientMatrix:
+    """
+    Nutrient values of a set of food items as an (items x nutrients) array.
+    Columns are the fixed nutrient vocabulary followed by any overflow
+    nutrients; missing values are NaN.
+    """
+
+    def __init__(self, values: np.ndarray, names: List[str], units: List[str], days: np.ndarray, meal_count: int):
+        self.values = values
+        self.names = names
+        self.units = units
+        self.days = days
+        self.meal_count = meal_count
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[NutrientRow]) -> "NutrientMatrix":
+        """Build a matrix from food item rows"""
+        rows = list(rows)
+        vocabulary_size = len(NUTRIENT_VOCABULARY)
+        base = np.full((len(rows), vocabulary_size), np.nan)
+        days = np.empty(len(rows), dtype="datetime64[D]")
+        extra_columns: Dict[str, int] = {}
+        extra_units: List[str] = []
+        extra_cells: List[Tuple[int, int, float]] = []
+        meal_ids = set()
+
+        for i, (meal_id, meal_date, nutrient_values, extra_nutrients) in enumerate(rows):
+            meal_ids.add(meal_id)
+            days[i] = meal_date.date() if isinstance(meal_date, datetime) else meal_date
+            if nutrient_values:
+                base[i, :len(nutrient_values)] = np.array(nutrient_values, dtype=float)
+            for name, extra in (extra_nutrients or {}).items():
+                if name not in extra_columns:
+                    extra_columns[name] = len(extra_columns)
+                    extra_units.append(extra["unit"])
+                extra_cells.append((i, extra_columns[name], extra["value"]))
+
+        extra = np.full((len(rows), len(extra_columns)), np.nan)
+        if extra_cells:
+            row_index, column_index, cell_values = zip(*extra_cells)
+            extra[np.array(row_index), np.array(column_index)] = cell_values
+
+        return cls(
+            values=np.hstack([base, extra]),
+            names=list(NUTRIENT_VOCABULARY) + list(extra_columns),
+            units=list(NUTRIENT_UNITS) + extra_units,
+            days=days,
+            meal_count=len(meal_ids),
+        )
+
+    @property
+    def present(self) -> np.ndarray:
+        """Mask of nutrients that have at least one value"""
+        return ~np.isnan(self.values).all(axis=0)
+
+    def totals(self) -> np.ndarray:
+        """Total of each nutrient across all food items"""
+        return np.nansum(self.values, axis=0)
+
+    def _day_index(self, start_date: date, end_date: date) -> Tuple[int, np.ndarray, np.ndarray]:
+        """Day count of the range, each row's day offset, and the rows inside the range"""
+        day_count = (end_date - start_date).days + 1
+        day_index = (self.days - np.datetime64(start_date, "D")).astype(int)
+        in_range = (day_index >= 0) & (day_index < day_count)
+        return day_count, day_index[in_range], in_range
+
+    def daily_totals(self, start_date: date, end_date: date) -> np.ndarray:
+        """Per-day totals as a (days x nutrients) array covering start_date..end_date"""
+        day_count, day_index, in_range = self._day_index(start_date, end_date)
+        daily = np.zeros((day_count, self.values.shape[1]))
+        np.add.at(daily, day_index, np.nan_to_num(self.values[in_range]))
+        return daily
+
+    def daily_present(self, start_date: date, end_date: date) -> np.ndarray:
+        """Per-day mask of nutrients that have at least one value on that day"""
+        day_count, day_index, in_range = self._day_index(start_date, end_date)
+        present = np.zeros((day_count, self.values.shape[1]), dtype=bool)
+        np.logical_or.at(present, day_index, ~np.isnan(self.values[in_range]))
+        return present
+
+    def to_dict(self, values: np.ndarray) -> Dict[str, float]:
+        """Map per-nutrient values to names, keeping only nutrients that are present"""
+        return {
+            self.names[i]: float(values[i])
+            for i in np.flatnonzero(self.present)
+        }
+
+
+class NutrientAggregationService:
+    """Loads nutrient matrices and computes the aggregates served by the API"""
+
+    def matrix_query(self, user_id: int, start_date: date, end_date: date) -> Select:
+        """Query for the packed nutrients of a user's meals from start_date through end_date"""
+        start = datetime.combine(start_date, datetime.min.time())
+        end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        return (
+            select(Meal.id, Meal.meal_date, FoodItem.nutrient_values, FoodItem.extra_nutrients)
+            .outerjoin(FoodItem, FoodItem.meal_id == Meal.id)
+            .where(Meal.user_id == user_id, Meal.meal_date >= start, Meal.meal_date < end)
+        )
+
+    async def load_matrix(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        start_date: date,
+        end_date: date,
+    ) -> NutrientMatrix:
+        """Load the nutrients of a user's meals from start_date through end_date in one query"""
+        result = await db.execute(self.matrix_query(user_id, start_date, end_date))
+        return NutrientMatrix.from_rows(result.all())
+
+    def meal_matrix(self, meal: Meal) -> NutrientMatrix:
+        """Build a matrix from a meal with its food items loaded"""
+        return NutrientMatrix.from_rows(
+            (meal.id, meal.meal_date, item.nutrient_values, item.extra_nutrients)
+            for item in meal.food_items
+        )
+
+    def totals(self, matrix: NutrientMatrix) -> List[Dict[str, Any]]:
+        """Total of each present nutrient as {"name", "value", "unit"}"""
+        totals = matrix.totals()
+        return [
+            {"name": matrix.names[i], "value": float(totals[i]), "unit": matrix.units[i]}
+            for i in np.flatnonzero(matrix.present)
+        ]
+
+    def summary(
+        self,
+        matrix: NutrientMatrix,
+        start_date: date,
+        end_date: date,
+        percentiles: Sequence[int] = (50, 90),
+    ) -> List[Dict[str, Any]]:
+        """
+        Per-nutrient total, average per day and percentiles of the daily totals
+        (days without meals count as zero). The range must cover at least one day.
+        """
+        daily = matrix.daily_totals(start_date, end_date)
+        totals = daily.sum(axis=0)
+        averages = daily.mean(axis=0)
+        percentile_values = np.percentile(daily, percentiles, axis=0)
+
+        summary = []
+        for i in np.flatnonzero(matrix.present):
+            entry = {
+                "name": matrix.names[i],
+                "total": float(totals[i]),
+                "average_per_day": float(averages[i]),
+                "unit": matrix.units[i],
+            }
+            for q, values in zip(percentiles, percentile_values):
+                entry[f"p{q}_per_day"] = float(values[i])
+            summary.append(entry)
+        return summary
+
+
+# Global nutrient aggregation service instance
+nutrient_aggregation_service = NutrientAggregationService()
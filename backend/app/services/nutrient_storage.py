@@ -0,0 +1,68 @@
+"""
+Packed per-food-item nutrient storage over a fixed nutrient vocabulary
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.nutrition_service import NutritionService
+
+# Positions in this vocabulary are persisted in food_items.nutrient_values,
+# so NutritionService.nutrient_units must only ever be appended to.
+NUTRIENT_VOCABULARY: Tuple[str, ...] = tuple(NutritionService.nutrient_units)
+NUTRIENT_INDEX: Dict[str, int] = {name: index for index, name in enumerate(NUTRIENT_VOCABULARY)}
+NUTRIENT_UNITS: Tuple[str, ...] = tuple(NutritionService.nutrient_units[name] for name in NUTRIENT_VOCABULARY)
+
+# Spellings of the same unit that labels and the LLM use interchangeably
+UNIT_ALIASES = {"mcg": "µg", "ug": "µg", "μg": "µg", "kj": "kJ", "cal": "kcal"}
+
+
+def normalize_unit(unit: Optional[str]) -> str:
+    """Normalize a unit string for comparison against vocabulary units"""
+    unit = (unit or "").strip()
+    return UNIT_ALIASES.get(unit.lower(), unit)
+
+
+def pack_nutrients(
+    rows: Iterable[Dict[str, Any]]
+) -> Tuple[Optional[List[Optional[float]]], Optional[Dict[str, Dict[str, Any]]]]:
+    """
+    Pack nutrient rows ({"name", "value", "unit"}) into a vocabulary-aligned
+    vector and an overflow map for nutrients outside the vocabulary (or in a
+    unit that differs from the vocabulary's). Repeated names are summed.
+    The vector is trimmed after its last value; either part is None if empty.
+    """
+    values: List[Optional[float]] = [None] * len(NUTRIENT_VOCABULARY)
+    extras: Dict[str, Dict[str, Any]] = {}
+
+    for row in rows:
+        name, value, unit = row["name"], float(row["value"]), row.get("unit") or "g"
+        index = NUTRIENT_INDEX.get(name)
+        if index is not None and normalize_unit(unit) == NUTRIENT_UNITS[index]:
+            values[index] = (values[index] or 0.0) + value
+        elif name in extras:
+            extras[name]["value"] += value
+        else:
+            extras[name] = {"value": value, "unit": unit}
+
+    while values and values[-1] is None:
+        values.pop()
+    return values or None, extras or None
+
+
+def unpack_nutrients(
+    values: Optional[List[Optional[float]]],
+    extras: Optional[Dict[str, Dict[str, Any]]],
+) -> List[Tuple[str, float, str]]:
+    """Unpack stored nutrients into (name, value, unit) tuples"""
+    nutrients = [
+        (NUTRIENT_VOCABULARY[index], value, NUTRIENT_UNITS[index])
+        for index, value in enumerate(values or [])
+        if value is not None
+    ]
+    for name, extra in (extras or {}).items():
+        nutrients.append((name, extra["value"], extra["unit"]))
+    return nutrients
+
+
+def food_item_nutrients(food_item) -> List[Tuple[str, float, str]]:
+    """Nutrients of a FoodItem as (name, value, unit) tuples"""
+    return unpack_nutrients(food_item.nutrient_values, food_item.extra_nutrients)
@@ -2,181 +2,264 @@
 Nutrition service for mapping foods to nutrition data using USDA FoodData Central API
 """
 import asyncio
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Tuple, Union
 import httpx
 from app.models.food_item import FoodItem
 from app.models.nutrient import Nutrient
 from app.core.config import settings
+from app.core.http_client import http_clients
+from app.core.instrumentation import increment
+from app.core.metrics import NUTRITION_CACHE_LOOKUPS
+from app.core.rate_limit import INTERACTIVE, RateLimited
+from app.core.tracing import tracer
 
 
 class NutritionService:
     """Service for nutrition data mapping and calculations using USDA FoodData Central API"""
     
-    # API endpoint
-    USDA_API_BASE = "https://api.nal.usda.gov/fdc/v1"
-    
     # Default nutrition for unknown foods (average meal estimate)
     DEFAULT_NUTRITION = {
         "calories": 150, "protein": 8, "carbs": 20, "fiber": 2,
         "fat": 5, "unit": "per_100g"
     }
     
+    # Map USDA nutrient IDs to our nutrient names (comprehensive mapping)
+    nutrient_map = {
+        # Energy & Macronutrients
+        1008: "calories",        # Energy (kcal)
+        1062: "energy_kj",       # Energy (kJ) - for fallback
+        1003: "protein",         # Protein (g)
+        1005: "carbs",           # Carbohydrate, by difference (g)
+        1079: "fiber",           # Fiber, total dietary (g)
+        1004: "fat",             # Total lipid (fat) (g)
+        1258: "saturated_fat",   # Fatty acids, total saturated (g)
+        1257: "monounsaturated_fat",  # Fatty acids, total monounsaturated (g)
+        1256: "polyunsaturated_fat",  # Fatty acids, total polyunsaturated (g)
+        
+        # Minerals
+        1093: "sodium",          # Sodium, Na (mg)
+        1092: "potassium",       # Potassium, K (mg)
+        1087: "calcium",         # Calcium, Ca (mg)
+        1089: "iron",            # Iron, Fe (mg)
+        1090: "magnesium",       # Magnesium, Mg (mg)
+        1091: "phosphorus",      # Phosphorus, P (mg)
+        1095: "zinc",            # Zinc, Zn (mg)
+        1098: "copper",          # Copper, Cu (mg)
+        1101: "manganese",       # Manganese, Mn (mg)
+        1103: "selenium",        # Selenium, Se (µg)
+        1094: "iodine",          # Iodine, I (µg)
+        
+        # Vitamins - Fat Soluble
+        1106: "vitamin_a",       # Vitamin A, RAE (µg)
+        1114: "vitamin_d",       # Vitamin D (D2 + D3) (µg)
+        1109: "vitamin_e",       # Vitamin E (alpha-tocopherol) (mg)
+        1185: "vitamin_k",       # Vitamin K (phylloquinone) (µg)
+        
+        # Vitamins - Water Soluble
+        1162: "vitamin_c",       # Vitamin C, total ascorbic acid (mg)
+        1165: "thiamin",         # Thiamin (B1) (mg)
+        1166: "riboflavin",      # Riboflavin (B2) (mg)
+        1167: "niacin",          # Niacin (B3) (mg)
+        1175: "vitamin_b6",      # Vitamin B-6 (mg)
+        1177: "folate",          # Folate, total (µg)
+        1178: "vitamin_b12",     # Vitamin B-12 (µg)
+        1170: "pantothenic_acid", # Pantothenic acid (B5) (mg)
+        1176: "biotin",          # Biotin (µg)
+        1180: "choline",         # Choline, total (mg)
+        
+        # Other important nutrients
+        1051: "water",           # Water (g)
+        1001: "ash",             # Ash (g)
+        2000: "sugars",          # Sugars, total including NLEA (g)
+        1235: "sucrose",         # Sucrose (g)
+        1236: "glucose",         # Glucose (dextrose) (g)
+        1237: "fructose",        # Fructose (g)
+        1238: "lactose",         # Lactose (g)
+        1242: "starch",          # Starch (g)
+    }
+    
+    # A search hit with all of these is used without fetching the food's details
+    REQUIRED_NUTRIENTS = ("calories", "protein", "carbs", "fat")
+    
+    # fdcIds per bulk POST /foods request (the API's limit)
+    USDA_BULK_MAX_IDS = 20
+    
     def __init__(self):
         """Initialize the nutrition service"""
-        self._http_client: Optional[httpx.AsyncClient] = None
         self.usda_api_key = settings.USDA_API_KEY
+        self.usda_api_base = settings.USDA_API_BASE_URL.rstrip("/")
         # Cache for nutrition data (key: normalized food name, value: nutrition dict per 100g)
         self._nutrition_cache: Dict[str, Dict[str, float]] = {}
     
     @property
     def http_client(self) -> httpx.AsyncClient:
-        """Get or create HTTP client (lazy initialization)"""
-        if self._http_client is None:
-            self._http_client = httpx.AsyncClient(timeout=10.0)
-        return self._http_client
+        """Shared pooled client for the USDA API"""
+        return http_clients.get("usda")
     
     def normalize_food_name(self, food_name: str) -> str:
         """Normalize food name for database lookup"""
         return food_name.lower().strip()
     
-    async def get_nutrition_from_usda(self, food_name: str) -> Optional[Dict[str, float]]:
-        """
-        Get nutrition data from USDA FoodData Central API using food name.
-        Returns nutrition data per 100g or None if not found.
-        Requires API key (get one free at https://fdc.nal.usda.gov/api-guide.html)
-        Uses caching to avoid repeated API calls for the same food.
-        """
-        if not self.usda_api_key:
-            # USDA API requires an API key
-            return None
-        
-        # Check cache first
-        normalized_name = self.normalize_food_name(food_name)
-        if normalized_name in self._nutrition_cache:
-            return self._nutrition_cache[normalized_name].copy()
-        
-        try:
-            # Search for food
-            search_url = f"{self.USDA_API_BASE}/foods/search"
+    async def _search_usda(self, food_name: str, priority: str) -> Optional[Dict[str, Any]]:
+        """Best search hit for a food name (with its flat nutrient list), or None"""
+        with tracer.span("usda.search", **{"usda.query": food_name}) as span:
             params = {
                 "query": food_name,
                 "api_key": self.usda_api_key,
                 "pageSize": 1,
                 "sortBy": "dataType.keyword"  # Prefer Foundation foods
             }
-            
-            response = await self.http_client.get(search_url, params=params)
+            response = await http_clients.get_with_retry(
+                "usda", f"{self.usda_api_base}/foods/search", params=params, priority=priority
+            )
             response.raise_for_status()
-            search_data = response.json()
-            
-            foods = search_data.get("foods", [])
-            if not foods:
-                return None
-            
-            # Get the first result
-            food = foods[0]
-            fdc_id = food.get("fdcId")
-            if not fdc_id:
-                return None
-            
-            # Get detailed nutrition data
-            detail_url = f"{self.USDA_API_BASE}/food/{fdc_id}"
-            detail_params = {"api_key": self.usda_api_key}
-            
-            detail_response = await self.http_client.get(detail_url, params=detail_params)
-            detail_response.raise_for_status()
-            food_data = detail_response.json()
-            
-            # Extract nutrients (USDA provides nutrients in various units)
-            nutrition = {}
-            food_nutrients = food_data.get("foodNutrients", [])
-            
-            # Map USDA nutrient IDs to our nutrient names (comprehensive mapping)
-            nutrient_map = {
-                # Energy & Macronutrients
-                1008: "calories",        # Energy (kcal)
-                1062: "energy_kj",       # Energy (kJ) - for fallback
-                1003: "protein",         # Protein (g)
-                1005: "carbs",           # Carbohydrate, by difference (g)
-                1079: "fiber",           # Fiber, total dietary (g)
-                1004: "fat",             # Total lipid (fat) (g)
-                1258: "saturated_fat",   # Fatty acids, total saturated (g)
-                1257: "monounsaturated_fat",  # Fatty acids, total monounsaturated (g)
-                1256: "polyunsaturated_fat",  # Fatty acids, total polyunsaturated (g)
-                
-                # Minerals
-                1093: "sodium",          # Sodium, Na (mg)
-                1092: "potassium",       # Potassium, K (mg)
-                1087: "calcium",         # Calcium, Ca (mg)
-                1089: "iron",            # Iron, Fe (mg)
-                1090: "magnesium",       # Magnesium, Mg (mg)
-                1091: "phosphorus",      # Phosphorus, P (mg)
-                1095: "zinc",            # Zinc, Zn (mg)
-                1098: "copper",          # Copper, Cu (mg)
-                1101: "manganese",       # Manganese, Mn (mg)
-                1103: "selenium",        # Selenium, Se (µg)
-                1094: "iodine",          # Iodine, I (µg)
-                
-                # Vitamins - Fat Soluble
-                1106: "vitamin_a",       # Vitamin A, RAE (µg)
-                1114: "vitamin_d",       # Vitamin D (D2 + D3) (µg)
-                1109: "vitamin_e",       # Vitamin E (alpha-tocopherol) (mg)
-                1185: "vitamin_k",       # Vitamin K (phylloquinone) (µg)
-                
-                # Vitamins - Water Soluble
-                1162: "vitamin_c",       # Vitamin C, total ascorbic acid (mg)
-                1165: "thiamin",         # Thiamin (B1) (mg)
-                1166: "riboflavin",      # Riboflavin (B2) (mg)
-                1167: "niacin",          # Niacin (B3) (mg)
-                1175: "vitamin_b6",      # Vitamin B-6 (mg)
-                1177: "folate",          # Folate, total (µg)
-                1178: "vitamin_b12",     # Vitamin B-12 (µg)
-                1170: "pantothenic_acid", # Pantothenic acid (B5) (mg)
-                1176: "biotin",          # Biotin (µg)
-                1180: "choline",         # Choline, total (mg)
-                
-                # Other important nutrients
-                1051: "water",           # Water (g)
-                1001: "ash",             # Ash (g)
-                2000: "sugars",          # Sugars, total including NLEA (g)
-                1235: "sucrose",         # Sucrose (g)
-                1236: "glucose",         # Glucose (dextrose) (g)
-                1237: "fructose",        # Fructose (g)
-                1238: "lactose",         # Lactose (g)
-                1242: "starch",          # Starch (g)
-            }
-            
-            for fn in food_nutrients:
-                nutrient_id = fn.get("nutrient", {}).get("id")
-                nutrient_name = nutrient_map.get(nutrient_id)
-                if nutrient_name:
-                    amount = fn.get("amount")
-                    if amount is not None:
-                        nutrition[nutrient_name] = float(amount)
-            
-            # If we have calories but it's 0, try energy in kJ
-            if "calories" not in nutrition or nutrition["calories"] == 0:
-                for fn in food_nutrients:
-                    nutrient_id = fn.get("nutrient", {}).get("id")
-                    if nutrient_id == 1062:  # Energy (kJ)
-                        amount = fn.get("amount")
-                        if amount is not None:
-                            nutrition["calories"] = float(amount) / 4.184  # Convert kJ to kcal
-                            break
+            foods = response.json().get("foods", [])
+            span.set_attribute("usda.results", len(foods))
+            return foods[0] if foods and foods[0].get("fdcId") else None
+    
+    async def _fetch_food_nutrients(self, fdc_ids: List[int], priority: str) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Full nutrient lists of foods by fdcId: one GET /food/{fdc_id} for a
+        single food, bulk POST /foods requests for several
+        """
+        params = {"api_key": self.usda_api_key}
+        if len(fdc_ids) == 1:
+            response = await http_clients.get_with_retry(
+                "usda", f"{self.usda_api_base}/food/{fdc_ids[0]}", params=params, priority=priority
+            )
+            response.raise_for_status()
+            return {fdc_ids[0]: response.json().get("foodNutrients", [])}
+        
+        food_nutrients = {}
+        for start in range(0, len(fdc_ids), self.USDA_BULK_MAX_IDS):
+            response = await http_clients.request_with_retry(
+                "usda", "POST", f"{self.usda_api_base}/foods",
+                params=params, json={"fdcIds": fdc_ids[start:start + self.USDA_BULK_MAX_IDS]}, priority=priority,
+            )
+            response.raise_for_status()
+            for food in response.json():
+                food_nutrients[food.get("fdcId")] = food.get("foodNutrients", [])
+        return food_nutrients
+    
+    def extract_nutrients(self, food_nutrients: List[Dict[str, Any]]) -> Dict[str, float]:
+        """
+        Nutrients per 100g from USDA foodNutrients entries, in the flat shape
+        of search results ({"nutrientId", "value"}) or the nested shape of
+        food details ({"nutrient": {"id"}, "amount"})
+        """
+        nutrition = {}
+        for fn in food_nutrients:
+            if "nutrientId" in fn:
+                nutrient_id, amount = fn.get("nutrientId"), fn.get("value")
+            else:
+                nutrient_id, amount = fn.get("nutrient", {}).get("id"), fn.get("amount")
+            nutrient_name = self.nutrient_map.get(nutrient_id)
+            if nutrient_name and amount is not None:
+                nutrition[nutrient_name] = float(amount)
+        
+        # If we have no calories (or 0), convert energy in kJ
+        if not nutrition.get("calories") and "energy_kj" in nutrition:
+            nutrition["calories"] = nutrition["energy_kj"] / 4.184
+        return nutrition
+    
+    async def get_nutrition_from_usda_many(
+        self,
+        food_names: List[str],
+        priority: str = INTERACTIVE,
+    ) -> Dict[str, Union[Optional[Dict[str, float]], RateLimited]]:
+        """
+        Get nutrition data per 100g for several foods from USDA FoodData
+        Central, keyed by normalized food name, in as few requests as possible.
+        
+        Each uncached food takes one search request. The search hit usually
+        carries every required nutrient; only foods missing some are fetched
+        in full, with one detail request (bulk for several foods). A value is
+        None if the food was not found or the lookup failed, and the
+        RateLimited error if the USDA request budget ran out before it.
+        """
+        if not self.usda_api_key:
+            # USDA API requires an API key
+            return {self.normalize_food_name(name): None for name in food_names}
+        
+        results: Dict[str, Union[Optional[Dict[str, float]], RateLimited]] = {}
+        misses: Dict[str, str] = {}
+        for food_name in food_names:
+            normalized_name = self.normalize_food_name(food_name)
+            if normalized_name in results or normalized_name in misses:
+                continue
+            if normalized_name in self._nutrition_cache:
+                NUTRITION_CACHE_LOOKUPS.labels("hit").inc()
+                increment("usda.cache_hits")
+                results[normalized_name] = self._nutrition_cache[normalized_name].copy()
+            else:
+                NUTRITION_CACHE_LOOKUPS.labels("miss").inc()
+                increment("usda.cache_misses")
+                misses[normalized_name] = food_name
+        if not misses:
+            return results
+        
+        with tracer.span("usda.lookup", **{"usda.foods": len(misses)}) as span:
+            hits = await asyncio.gather(
+                *(self._search_usda(food_name, priority) for food_name in misses.values()),
+                return_exceptions=True,
+            )
             
-            nutrition["unit"] = "per_100g"
+            # Foods whose search hit lacks required nutrients: (fdcId, nutrients found)
+            incomplete: Dict[str, Tuple[int, Dict[str, float]]] = {}
+            for normalized_name, hit in zip(misses, hits):
+                if isinstance(hit, Exception):
+                    span.record_error(hit)
+                    if not isinstance(hit, RateLimited):
+                        # Log error but don't raise - fall back to defaults
+                        print(f"Error fetching from USDA API: {hit}")
+                    results[normalized_name] = hit if isinstance(hit, RateLimited) else None
+                elif hit is None:
+                    results[normalized_name] = None
+                else:
+                    nutrition = self.extract_nutrients(hit.get("foodNutrients", []))
+                    if all(name in nutrition for name in self.REQUIRED_NUTRIENTS):
+                        results[normalized_name] = nutrition
+                    else:
+                        incomplete[normalized_name] = (hit["fdcId"], nutrition)
             
-            # Cache the result if we got valid nutrition data
-            if nutrition:
+            span.set_attribute("usda.detail_lookups", len(incomplete))
+            if incomplete:
+                try:
+                    details = await self._fetch_food_nutrients(
+                        list({fdc_id for fdc_id, _ in incomplete.values()}), priority
+                    )
+                    for normalized_name, (fdc_id, nutrition) in incomplete.items():
+                        nutrition = dict(nutrition, **self.extract_nutrients(details.get(fdc_id, [])))
+                        results[normalized_name] = nutrition or None
+                except Exception as e:
+                    span.record_error(e)
+                    if not isinstance(e, RateLimited):
+                        print(f"Error fetching from USDA API: {e}")
+                    for normalized_name in incomplete:
+                        results[normalized_name] = e if isinstance(e, RateLimited) else None
+        
+        # Cache the foods we got valid nutrition data for
+        for normalized_name in misses:
+            nutrition = results[normalized_name]
+            if isinstance(nutrition, dict):
+                nutrition["unit"] = "per_100g"
                 self._nutrition_cache[normalized_name] = nutrition.copy()
-                return nutrition
-            
-            return None
-            
-        except Exception as e:
-            # Log error but don't raise - fall back to defaults
-            print(f"Error fetching from USDA API: {e}")
-            return None
+        return results
+    
+    async def get_nutrition_from_usda(self, food_name: str, priority: str = INTERACTIVE) -> Optional[Dict[str, float]]:
+        """
+        Get nutrition data from USDA FoodData Central API using food name.
+        Returns nutrition data per 100g or None if not found.
+        Requires API key (get one free at https://fdc.nal.usda.gov/api-guide.html)
+        Uses caching to avoid repeated API calls for the same food.
+        Raises RateLimited when the USDA request budget is exhausted, so the
+        caller can retry later instead of storing defaults.
+        """
+        results = await self.get_nutrition_from_usda_many([food_name], priority)
+        nutrition = results[self.normalize_food_name(food_name)]
+        if isinstance(nutrition, RateLimited):
+            raise nutrition
+        return nutrition
     
     def clear_cache(self):
         """Clear the nutrition data cache"""
@@ -191,11 +274,13 @@ class NutritionService:
         food_name: str, 
         quantity: float = 100, 
         unit: str = "g",
-        barcode: Optional[str] = None
+        barcode: Optional[str] = None,
+        priority: str = INTERACTIVE,
     ) -> Dict[str, float]:
         """
         Get nutrition data for a food item asynchronously using USDA FoodData Central API.
-        Falls back to defaults if API fails or no data found.
+        Falls back to defaults if API fails or no data found, but raises
+        RateLimited when the USDA request budget is exhausted.
         Returns nutrients per specified quantity.
         
         Args:
@@ -203,11 +288,17 @@ class NutritionService:
             quantity: Quantity in the specified unit (default: 100)
             unit: Unit of measurement (default: "g")
             barcode: Optional barcode (not used, kept for API compatibility)
+            priority: INTERACTIVE (a user is waiting) or BACKGROUND (backfills)
         """
         # Try USDA API
-        base_nutrition = await self.get_nutrition_from_usda(food_name)
-        
-        # Fall back to default if USDA API failed or no data found
+        base_nutrition = await self.get_nutrition_from_usda(food_name, priority)
+        return self.scale_nutrition(base_nutrition, quantity)
+    
+    def scale_nutrition(self, base_nutrition: Optional[Dict[str, float]], quantity: float = 100) -> Dict[str, float]:
+        """
+        Nutrients for a quantity from per-100g nutrition data, falling back to
+        defaults if USDA API failed or no data found
+        """
         if not base_nutrition:
             base_nutrition = self.DEFAULT_NUTRITION.copy()
         
@@ -245,20 +336,16 @@ class NutritionService:
             # This is a fallback - ideally call get_nutrition_data_async directly
             print("Warning: Using sync method in async context. Use get_nutrition_data_async instead.")
             # Return default for now
-            base_nutrition = self.DEFAULT_NUTRITION.copy()
-            multiplier = quantity / 100.0
-            nutrition = {}
-            for nutrient, value in base_nutrition.items():
-                if nutrient != "unit" and isinstance(value, (int, float)):
-                    nutrition[nutrient] = value * multiplier
-            return nutrition
+            return self.scale_nutrition(None, quantity)
         else:
             # Run async method in event loop
             return loop.run_until_complete(
                 self.get_nutrition_data_async(food_name, quantity, unit, barcode)
             )
     
-    # Map nutrient names to standard units
+    # Map nutrient names to standard units.
+    # Order defines the packed nutrient vocabulary (app.services.nutrient_storage):
+    # only append new nutrients, never reorder or remove existing ones.
     nutrient_units = {
         # Energy & Macronutrients
         "calories": "kcal",
@@ -0,0 +1,316 @@
+"""
+Nutrition risk scoring against reference intakes
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.user import User
+from app.models.daily_nutrition import DailyNutrition
+from app.models.risk_score import RiskScore, RiskType, RiskLevel
+from app.services.llm_service import llm_service, DEFAULT_RISK_EXPLANATION
+from app.services.nutrient_storage import NUTRIENT_INDEX, NUTRIENT_UNITS
+
+# Adult reference intakes per day: (unit, recommended minimum, tolerable maximum).
+# Minimums follow the FDA Daily Values, maximums the upper limits / DV caps.
+REFERENCE_INTAKES: Dict[str, Tuple[str, Optional[float], Optional[float]]] = {
+    "protein": ("g", 50.0, None),
+    "fiber": ("g", 28.0, None),
+    "saturated_fat": ("g", None, 20.0),
+    "sugars": ("g", None, 50.0),
+    "sodium": ("mg", None, 2300.0),
+    "potassium": ("mg", 4700.0, None),
+    "calcium": ("mg", 1300.0, 2500.0),
+    "iron": ("mg", 18.0, 45.0),
+    "magnesium": ("mg", 420.0, None),
+    "zinc": ("mg", 11.0, 40.0),
+    "vitamin_a": ("µg", 900.0, 3000.0),
+    "vitamin_c": ("mg", 90.0, 2000.0),
+    "vitamin_d": ("µg", 20.0, 100.0),
+    "folate": ("µg", 400.0, 1000.0),
+    "vitamin_b12": ("µg", 2.4, None),
+}
+
+# Acceptable macronutrient distribution ranges: share of calories (low, high)
+# and kcal per gram
+MACRO_RANGES: Dict[str, Tuple[float, float, float]] = {
+    "protein": (0.10, 0.35, 4.0),
+    "carbs": (0.45, 0.65, 4.0),
+    "fat": (0.20, 0.35, 9.0),
+}
+
+EVALUATED_NUTRIENTS: List[str] = list(dict.fromkeys(["calories", *REFERENCE_INTAKES, *MACRO_RANGES]))
+
+
+def risk_level(score: float) -> RiskLevel:
+    """Map a 0-100 score to a risk level"""
+    if score >= 75:
+        return RiskLevel.CRITICAL
+    if score >= 50:
+        return RiskLevel.HIGH
+    if score >= 25:
+        return RiskLevel.MODERATE
+    return RiskLevel.LOW
+
+
+class RiskEngine:
+    """
+    Scores users' recent average daily intake against reference intakes.
+
+    Scores are computed for a batch of users at once from DailyNutrition
+    rows as (users x days x nutrients) arrays and stored as RiskScore rows.
+    A user is re-evaluated only when their data version moved or their last
+    evaluation was on an earlier day (the window slides daily). LLM
+    explanations are filled in afterwards and kept while a risk's level
+    does not change.
+    """
+
+    def __init__(self):
+        self.nutrients = EVALUATED_NUTRIENTS
+        self.column = {name: i for i, name in enumerate(self.nutrients)}
+        references = [REFERENCE_INTAKES.get(name, (None, None, None)) for name in self.nutrients]
+        self.minimums = np.array([minimum for _, minimum, _ in references], dtype=float)
+        self.maximums = np.array([maximum for _, _, maximum in references], dtype=float)
+        self.units = [NUTRIENT_UNITS[NUTRIENT_INDEX[name]] for name in self.nutrients]
+        self._explaining = set()
+
+    def _stale(self, today: date):
+        """Condition selecting users whose stored risks are out of date"""
+        return or_(
+            User.risk_data_version.is_(None),
+            User.risk_data_version != User.data_version,
+            User.risks_evaluated_on.is_(None),
+            User.risks_evaluated_on < today,
+        )
+
+    def score(
+        self,
+        totals: np.ndarray,
+        present: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score (users x days x nutrients) daily totals.
+
+        Only logged days count towards averages, and a nutrient is only
+        judged for a user when it was recorded on at least half of those
+        days, so missing label data does not read as a deficiency.
+        Returns (average intake, logged days, deficiency, excess, imbalance)
+        where imbalance has one column per MACRO_RANGES entry.
+        """
+        logged_days = present.any(axis=2).sum(axis=1)
+        divisor = np.maximum(logged_days, 1)[:, None]
+        average = totals.sum(axis=1) / divisor
+        coverage = present.sum(axis=1) / divisor
+        eligible = (logged_days >= settings.RISK_MIN_LOGGED_DAYS)[:, None] & (coverage >= 0.5)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            deficiency = np.clip((1 - average / self.minimums) * 100, 0, 100)
+            excess = np.clip((average / self.maximums - 1) * 100, 0, 100)
+        deficiency = np.where(eligible & ~np.isnan(self.minimums), deficiency, 0)
+        excess = np.where(eligible & ~np.isnan(self.maximums), excess, 0)
+
+        macros = [self.column[name] for name in MACRO_RANGES]
+        low, high, kcal_per_gram = (np.array(values) for values in zip(*MACRO_RANGES.values()))
+        calories = average[:, self.column["calories"]][:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = average[:, macros] * kcal_per_gram / calories
+        # Each percentage point outside the range adds 5 points
+        deviation = np.maximum(low - share, share - high).clip(min=0)
+        imbalance = np.clip(deviation * 500, 0, 100)
+        macro_eligible = eligible[:, macros] & eligible[:, [self.column["calories"]]] & (calories > 0)
+        imbalance = np.where(macro_eligible, np.nan_to_num(imbalance), 0)
+
+        return average, logged_days, deficiency, excess, imbalance
+
+    async def evaluate_users(self, db: AsyncSession, user_ids: List[int], today: date):
+        """
+        Recompute and store the risks of the given users in the current
+        transaction (callers lock the user rows and commit).
+        """
+        if not user_ids:
+            return
+        start_date = today - timedelta(days=settings.RISK_WINDOW_DAYS - 1)
+        versions = dict((await db.execute(
+            select(User.id, User.data_version).where(User.id.in_(user_ids))
+        )).all())
+        user_ids = list(versions)
+        user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+
+        result = await db.execute(
+            select(DailyNutrition.user_id, DailyNutrition.date, DailyNutrition.nutrient_name, DailyNutrition.total_value)
+            .where(
+                DailyNutrition.user_id.in_(user_ids),
+                DailyNutrition.date >= start_date,
+                DailyNutrition.date <= today,
+                DailyNutrition.nutrient_name.in_(self.nutrients),
+            )
+        )
+        rows = result.all()
+        shape = (len(user_ids), settings.RISK_WINDOW_DAYS, len(self.nutrients))
+        totals = np.zeros(shape)
+        present = np.zeros(shape, dtype=bool)
+        if rows:
+            row_users, row_days, row_names, row_values = zip(*rows)
+            index = (
+                np.array([user_index[user_id] for user_id in row_users]),
+                np.array([(day - start_date).days for day in row_days]),
+                np.array([self.column[name] for name in row_names]),
+            )
+            totals[index] = row_values
+            present[index] = True
+
+        average, logged_days, deficiency, excess, imbalance = self.score(totals, present)
+
+        computed: Dict[Tuple[int, RiskType, str], Tuple[float, str]] = {}
+        for risk_type, scores, columns in (
+            (RiskType.DEFICIENCY, deficiency, range(len(self.nutrients))),
+            (RiskType.EXCESS, excess, range(len(self.nutrients))),
+            (RiskType.IMBALANCE, imbalance, [self.column[name] for name in MACRO_RANGES]),
+        ):
+            for u, c in zip(*np.nonzero(scores >= settings.RISK_MIN_SCORE)):
+                n = columns[c]
+                name = self.nutrients[n]
+                key = (user_ids[u], risk_type, name)
+                computed[key] = (round(float(scores[u, c]), 1), self._describe(
+                    risk_type, name, float(average[u, n]), self.units[n], int(logged_days[u]),
+                    float(average[u, self.column["calories"]])
+                ))
+
+        existing = (await db.execute(
+            select(RiskScore).where(RiskScore.user_id.in_(user_ids))
+        )).scalars().all()
+        now = datetime.now(timezone.utc)
+        for risk in existing:
+            key = (risk.user_id, risk.risk_type, risk.nutrient_name)
+            if key not in computed:
+                await db.delete(risk)
+                continue
+            score, description = computed.pop(key)
+            level = risk_level(score)
+            if level != risk.risk_level:
+                # The cached explanation describes the old level
+                risk.explanation = None
+                risk.recommendation = None
+            risk.risk_level = level
+            risk.score = score
+            risk.description = description
+            risk.calculated_at = now
+        for (user_id, risk_type, name), (score, description) in computed.items():
+            db.add(RiskScore(
+                user_id=user_id,
+                risk_type=risk_type,
+                nutrient_name=name,
+                risk_level=risk_level(score),
+                score=score,
+                description=description,
+                calculated_at=now,
+            ))
+
+        for user_id, data_version in versions.items():
+            await db.execute(
+                update(User)
+                .where(User.id == user_id)
+                .values(risk_data_version=data_version, risks_evaluated_on=today)
+            )
+        await db.flush()
+
+    def _describe(self, risk_type: RiskType, name: str, average: float, unit: str, logged_days: int, calories: float) -> str:
+        """Human-readable description of a risk"""
+        label = name.replace("_", " ")
+        period = f"over {logged_days} logged day{'s' if logged_days != 1 else ''}"
+        if risk_type == RiskType.IMBALANCE:
+            low, high, kcal_per_gram = MACRO_RANGES[name]
+            share = average * kcal_per_gram / calories * 100 if calories else 0
+            return (f"{label.capitalize()} provides {share:.0f}% of calories {period}, "
+                    f"outside the recommended {low * 100:.0f}-{high * 100:.0f}%.")
+        _, minimum, maximum = REFERENCE_INTAKES[name]
+        if risk_type == RiskType.DEFICIENCY:
+            return (f"Average {label} intake of {average:.1f} {unit}/day {period} is below "
+                    f"the reference intake of {minimum:g} {unit}/day.")
+        return (f"Average {label} intake of {average:.1f} {unit}/day {period} is above "
+                f"the upper limit of {maximum:g} {unit}/day.")
+
+    async def evaluate_stale_users(self, db: AsyncSession, limit: Optional[int] = None) -> int:
+        """
+        Evaluate up to `limit` users whose risks are out of date and commit.
+        Rows locked by another worker are skipped. Returns the number of users.
+        """
+        today = datetime.now(timezone.utc).date()
+        user_ids = (await db.execute(
+            select(User.id)
+            .where(User.is_active.is_(True), self._stale(today))
+            .order_by(User.id)
+            .limit(limit or settings.RISK_BATCH_SIZE)
+            .with_for_update(key_share=True, skip_locked=True)
+        )).scalars().all()
+        await self.evaluate_users(db, list(user_ids), today)
+        await db.commit()
+        return len(user_ids)
+
+    async def evaluate_user_if_stale(self, db: AsyncSession, user_id: int) -> bool:
+        """Evaluate one user if their risks are out of date; returns whether it did"""
+        today = datetime.now(timezone.utc).date()
+        stale = (await db.execute(
+            select(User.id)
+            .where(User.id == user_id, self._stale(today))
+            .with_for_update(key_share=True)
+        )).scalar_one_or_none()
+        if stale is None:
+            return False
+        await self.evaluate_users(db, [user_id], today)
+        await db.commit()
+        return True
+
+    async def get_risks(self, db: AsyncSession, user_id: int) -> List[RiskScore]:
+        """Stored risks of a user, highest score first"""
+        result = await db.execute(
+            select(RiskScore)
+            .where(RiskScore.user_id == user_id)
+            .order_by(RiskScore.score.desc(), RiskScore.id)
+        )
+        return list(result.scalars().all())
+
+    async def explain_pending(self, risk_ids: List[int]):
+        """
+        Generate and store LLM explanations for risks that lack one. Runs as a
+        background task with its own session; risks already being explained
+        in this process are skipped, and fallback answers are not stored.
+        """
+        risk_ids = [risk_id for risk_id in risk_ids if risk_id not in self._explaining]
+        if not risk_ids:
+            return
+        self._explaining.update(risk_ids)
+        try:
+            async with async_session_maker() as db:
+                pending = (await db.execute(
+                    select(RiskScore.id, RiskScore.risk_type, RiskScore.nutrient_name, RiskScore.risk_level, RiskScore.score)
+                    .where(RiskScore.id.in_(risk_ids), RiskScore.explanation.is_(None))
+                )).all()
+                for risk_id, risk_type, nutrient_name, level, score in pending:
+                    explanation = await llm_service.explain_risk_score(
+                        risk_type.value,
+                        nutrient_name or "",
+                        level.value,
+                        score,
+                    )
+                    if explanation == DEFAULT_RISK_EXPLANATION:
+                        continue
+                    # Skip risks whose level changed while the LLM was answering
+                    await db.execute(
+                        update(RiskScore)
+                        .where(RiskScore.id == risk_id, RiskScore.risk_level == level, RiskScore.explanation.is_(None))
+                        .values(explanation=explanation["explanation"], recommendation=explanation["recommendation"])
+                    )
+                    await db.commit()
+        except Exception as e:
+            print(f"Risk explanation failed: {e}")
+        finally:
+            self._explaining.difference_update(risk_ids)
+
+
+# Global risk engine instance
+risk_engine = RiskEngine()
@@ -0,0 +1,212 @@
+"""
+Background precomputation of rollups, risk scores and health insights, and
+nutrition backfill for food items left pending by the USDA budget
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import engine, async_session_maker, set_statement_timeout
+from app.models.user import User
+from app.models.meal import Meal
+from app.models.health_insight import HealthInsight
+from app.services.daily_nutrition_service import daily_nutrition_service
+from app.services.insight_service import insight_service
+from app.services.meal_persistence import meal_persistence_service
+from app.services.risk_engine import risk_engine
+
+# pg_advisory_lock key shared by all workers ("VLSCHED")
+ADVISORY_LOCK_KEY = 0x564C5343484544
+
+
+class BackgroundScheduler:
+    """
+    Periodically runs precomputation passes during the configured off-peak
+    window (UTC hours). Only one worker across the deployment runs a pass at
+    a time (PostgreSQL advisory lock); every job only touches users whose
+    results are stale, so repeated passes within a window are cheap.
+    Outside the window only the nutrition backfill runs, on the USDA budget
+    left over by interactive lookups.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the scheduler loop on the running event loop"""
+        if settings.SCHEDULER_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the scheduler loop, cancelling a pass in progress"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def in_offpeak_window(self, now: Optional[datetime] = None) -> bool:
+        """Whether now falls in the off-peak window (which may wrap past midnight)"""
+        hour = (now or datetime.now(timezone.utc)).hour
+        start, end = settings.SCHEDULER_OFFPEAK_START_HOUR, settings.SCHEDULER_OFFPEAK_END_HOUR
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    async def _run(self):
+        while True:
+            try:
+                if self.in_offpeak_window():
+                    await self.run_once()
+                else:
+                    await self.run_backfill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Scheduler pass failed: {e}")
+            await asyncio.sleep(settings.SCHEDULER_INTERVAL_SECONDS)
+
+    @asynccontextmanager
+    async def _exclusive(self) -> AsyncIterator[bool]:
+        """Hold the deployment-wide scheduler lock; yields False if another worker has it"""
+        if engine.dialect.name != "postgresql":
+            yield True
+            return
+        async with engine.connect() as conn:
+            acquired = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}
+            )).scalar()
+            await conn.commit()
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                    await conn.commit()
+
+    async def run_once(self) -> Dict[str, int]:
+        """Run one pass of every job; returns the number of users (food items for nutrition) each job processed"""
+        async with self._exclusive() as acquired:
+            if not acquired:
+                return {}
+            counts = {
+                # First, so the other jobs see the backfilled nutrients
+                "nutrition": await self.backfill_nutrition(),
+                "rollups": await self.refresh_rollups(),
+                "risks": await self.evaluate_risks(),
+                "insights": await self.generate_insights(),
+            }
+        print(f"Scheduler pass complete: {counts}")
+        return counts
+
+    async def run_backfill(self) -> int:
+        """Run only the nutrition backfill; returns the number of food items resolved"""
+        async with self._exclusive() as acquired:
+            if not acquired:
+                return 0
+            resolved = await self.backfill_nutrition()
+        if resolved:
+            print(f"Nutrition backfill resolved {resolved} food items")
+        return resolved
+
+    async def backfill_nutrition(self) -> int:
+        """Look up nutrition for pending food items until none are left or the budget runs out"""
+        total = 0
+        async with async_session_maker() as db:
+            while True:
+                resolved = await meal_persistence_service.backfill_pending_nutrition(
+                    db, settings.NUTRITION_BACKFILL_BATCH_SIZE
+                )
+                total += resolved
+                if resolved < settings.NUTRITION_BACKFILL_BATCH_SIZE:
+                    break
+        return total
+
+    async def _active_user_ids(self, db: AsyncSession, since: date, until: Optional[date] = None) -> List[int]:
+        """Active users with meals from since (through until)"""
+        query = (
+            select(Meal.user_id)
+            .join(User, User.id == Meal.user_id)
+            .where(User.is_active.is_(True), Meal.meal_date >= datetime.combine(since, datetime.min.time()))
+            .distinct()
+        )
+        if until is not None:
+            query = query.where(Meal.meal_date < datetime.combine(until + timedelta(days=1), datetime.min.time()))
+        return list((await db.execute(query)).scalars().all())
+
+    async def refresh_rollups(self) -> int:
+        """
+        Recompute yesterday's daily rollups for users who logged meals then,
+        healing rows written by anything other than the meal endpoints.
+        """
+        yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+        async with async_session_maker() as db:
+            user_ids = await self._active_user_ids(db, yesterday, yesterday)
+            for user_id in user_ids:
+                await set_statement_timeout(db, settings.DB_BACKGROUND_STATEMENT_TIMEOUT_MS)
+                await daily_nutrition_service.refresh_days(db, user_id, [yesterday])
+                await db.commit()
+        return len(user_ids)
+
+    async def evaluate_risks(self) -> int:
+        """Re-evaluate risk scores of users whose data changed, batch by batch"""
+        total = 0
+        async with async_session_maker() as db:
+            while self.in_offpeak_window():
+                await set_statement_timeout(db, settings.DB_BACKGROUND_STATEMENT_TIMEOUT_MS)
+                evaluated = await risk_engine.evaluate_stale_users(db)
+                total += evaluated
+                if evaluated < settings.RISK_BATCH_SIZE:
+                    break
+        return total
+
+    async def generate_insights(self) -> int:
+        """
+        Regenerate stale weekly insights for users active in the period, at
+        most SCHEDULER_CONCURRENCY LLM calls at a time.
+        """
+        days = settings.INSIGHT_PERIOD_DAYS
+        today = datetime.now(timezone.utc).date()
+        async with async_session_maker() as db:
+            user_ids = await self._active_user_ids(db, today - timedelta(days=days - 1))
+            versions = dict((await db.execute(
+                select(User.id, User.data_version).where(User.id.in_(user_ids))
+            )).all()) if user_ids else {}
+            insights = {
+                insight.user_id: insight
+                for insight in (await db.execute(
+                    select(HealthInsight).where(HealthInsight.user_id.in_(user_ids), HealthInsight.period_days == days)
+                )).scalars().all()
+            } if user_ids else {}
+        stale = [
+            user_id for user_id in user_ids
+            if insight_service.is_stale(insights.get(user_id), versions[user_id], today)
+        ]
+
+        semaphore = asyncio.Semaphore(settings.SCHEDULER_CONCURRENCY)
+
+        async def generate(user_id: int) -> bool:
+            async with semaphore:
+                if not self.in_offpeak_window():
+                    return False
+                try:
+                    async with async_session_maker() as db:
+                        await insight_service.generate(db, user_id, days)
+                    return True
+                except Exception as e:
+                    print(f"Insight generation failed for user {user_id}: {e}")
+                    return False
+
+        results = await asyncio.gather(*(generate(user_id) for user_id in stale))
+        return sum(results)
+
+
+# Global background scheduler instance
+background_scheduler = BackgroundScheduler()
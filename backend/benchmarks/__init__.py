@@ -0,0 +1,3 @@
+"""
+Benchmark and load-test tooling (not imported by the application)
+"""
@@ -0,0 +1,334 @@
+"""
+Synthetic dataset generator for scale testing
+
+Bulk-loads users with years of meal history: meals, food items with packed
+nutrients (drawn from NutritionService.nutrient_units), optionally the
+legacy per-nutrient rows, and the matching daily_nutrition rollups. On
+PostgreSQL rows are streamed with COPY; other databases fall back to
+batched INSERTs.
+
+The database must already be migrated (`alembic upgrade head`).
+
+Usage (from backend/):
+    python -m benchmarks.dataset --users 200 --days 1825 --meals-per-day 3.2
+    python -m benchmarks.dataset --users 5 --days 365 --nutrient-rows --prefix small
+"""
+import argparse
+import csv
+import enum
+import io
+import json
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.models.user import User
+from app.models.meal import Meal, MealType, MealSource
+from app.models.food_item import FoodItem
+from app.models.nutrient import Nutrient
+from app.models.daily_nutrition import DailyNutrition
+from app.services.nutrient_storage import NUTRIENT_VOCABULARY, NUTRIENT_UNITS
+from benchmarks.stubs import FOOD_NAMES
+
+PASSWORD = "synthetic-password"
+
+# Nutrients every generated food item carries; the rest are sampled per food
+CORE_NUTRIENTS = ["calories", "protein", "carbs", "fiber", "fat", "saturated_fat", "sugars", "sodium"]
+
+# Typical per-100g range by unit
+UNIT_RANGES = {"kcal": (20, 550), "kJ": (80, 2300), "g": (0, 30), "mg": (0, 400), "µg": (0, 150)}
+
+# Meal types with their share of meals and typical hour of day
+MEAL_SLOTS = [
+    (MealType.BREAKFAST, 0.27, 8),
+    (MealType.LUNCH, 0.30, 13),
+    (MealType.DINNER, 0.30, 19),
+    (MealType.SNACK, 0.13, 16),
+]
+
+
+@dataclass
+class DatasetConfig:
+    """Shape of the generated data"""
+    users: int = 100
+    days: int = 365
+    meals_per_day: float = 3.0  # Mean over users; each user's rate varies around it
+    items_per_meal: float = 2.5
+    micronutrients_per_food: int = 10
+    catalog_size: int = 300
+    nutrient_rows: bool = False
+    prefix: str = "synthetic"
+    seed: int = 0
+
+
+class FoodCatalog:
+    """Foods with fixed per-100g nutrient vectors (NaN where a food lacks a nutrient)"""
+
+    def __init__(self, config: DatasetConfig, rng: np.random.Generator):
+        vocabulary_size = len(NUTRIENT_VOCABULARY)
+        self.names = [
+            FOOD_NAMES[i % len(FOOD_NAMES)] + ("" if i < len(FOOD_NAMES) else f" #{i // len(FOOD_NAMES)}")
+            for i in range(config.catalog_size)
+        ]
+        low = np.array([UNIT_RANGES[unit][0] for unit in NUTRIENT_UNITS], dtype=float)
+        high = np.array([UNIT_RANGES[unit][1] for unit in NUTRIENT_UNITS], dtype=float)
+        per_100g = rng.uniform(low, high, size=(config.catalog_size, vocabulary_size))
+
+        core = np.isin(NUTRIENT_VOCABULARY, CORE_NUTRIENTS)
+        optional = np.flatnonzero(~core)
+        present = np.tile(core, (config.catalog_size, 1))
+        for row in present:
+            row[rng.choice(optional, size=min(config.micronutrients_per_food, len(optional)), replace=False)] = True
+        self.per_100g = np.where(present, per_100g.round(2), np.nan)
+
+
+class BulkLoader:
+    """
+    Buffers rows per table and writes them with COPY (PostgreSQL) or batched
+    INSERTs. Tables are always flushed together, in the order they were first
+    added to, so parent rows are written before the rows referencing them.
+    """
+
+    def __init__(self, conn: Connection, batch_rows: int):
+        self.conn = conn
+        self.batch_rows = batch_rows
+        self.use_copy = conn.dialect.name == "postgresql"
+        self._rows: Dict[Any, List[Dict[str, Any]]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add(self, table, row: Dict[str, Any]):
+        rows = self._rows.setdefault(table, [])
+        rows.append(row)
+        if len(rows) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        for table, rows in self._rows.items():
+            self._write(table, rows)
+            rows.clear()
+
+    @staticmethod
+    def _copy_value(value: Any) -> Any:
+        if value is None:
+            return None
+        if isinstance(value, enum.Enum):
+            # SQLAlchemy Enum columns store member names
+            return value.name
+        if isinstance(value, list):
+            return "{" + ",".join("NULL" if v is None else repr(v) for v in value) + "}"
+        if isinstance(value, dict):
+            return json.dumps(value)
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        return value
+
+    def _write(self, table, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+        if not self.use_copy:
+            self.conn.execute(insert(table), rows)
+            return
+
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["" if (v := self._copy_value(row[c])) is None else v for c in columns])
+        buffer.seek(0)
+        cursor = self.conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+
+
+class DatasetGenerator:
+    """Generates users and their meal history into a migrated database"""
+
+    def __init__(self, config: DatasetConfig):
+        self.config = config
+        self.rng = np.random.default_rng(config.seed)
+        self.catalog = FoodCatalog(config, self.rng)
+        self.hashed_password = get_password_hash(PASSWORD)
+
+    def _next_ids(self, conn: Connection) -> Dict[str, int]:
+        return {
+            model.__tablename__: (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+            for model in (User, Meal, FoodItem, Nutrient, DailyNutrition)
+        }
+
+    def generate(self, conn: Connection, batch_rows: int = 50000) -> Dict[str, int]:
+        """Generate the dataset in the connection's transaction; returns rows written per table"""
+        loader = BulkLoader(conn, batch_rows)
+        ids = self._next_ids(conn)
+        end_date = date.today()
+        start_date = end_date - timedelta(days=self.config.days - 1)
+        now = datetime.now(timezone.utc)
+
+        for _ in range(self.config.users):
+            user_id = ids["users"]
+            ids["users"] += 1
+            username = f"{self.config.prefix}_{user_id}"
+            loader.add(User.__table__, {
+                "id": user_id,
+                "email": f"{username}@example.com",
+                "username": username,
+                "hashed_password": self.hashed_password,
+                "is_active": True,
+                "is_superuser": False,
+                "data_version": 0,
+                "created_at": now,
+                "updated_at": now,
+            })
+            self._generate_history(loader, ids, user_id, start_date, now)
+
+        loader.flush()
+        if conn.dialect.name == "postgresql":
+            for model in (User, Meal, FoodItem, Nutrient, DailyNutrition):
+                table = model.__tablename__
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+                ))
+        return loader.counts
+
+    def _generate_history(self, loader: BulkLoader, ids: Dict[str, int], user_id: int, start_date: date, now: datetime):
+        config, rng, catalog = self.config, self.rng, self.catalog
+
+        # Users differ in how much they eat and how consistently they log
+        rate = rng.gamma(8.0, config.meals_per_day / 8.0)
+        adherence = rng.uniform(0.5, 1.0)
+        meals_per_day = rng.poisson(rate, config.days) * (rng.random(config.days) < adherence)
+        meal_days = np.repeat(np.arange(config.days), meals_per_day)
+        if len(meal_days) == 0:
+            return
+
+        slots = rng.choice(len(MEAL_SLOTS), size=len(meal_days), p=[share for _, share, _ in MEAL_SLOTS])
+        hours = np.clip(np.array([MEAL_SLOTS[s][2] for s in slots]) + rng.normal(0, 1.0, len(slots)), 0, 23.99)
+        items_per_meal = 1 + rng.poisson(max(config.items_per_meal - 1, 0), len(meal_days))
+        item_meals = np.repeat(np.arange(len(meal_days)), items_per_meal)
+        foods = rng.integers(0, len(catalog.names), len(item_meals))
+        grams = rng.choice([50.0, 100.0, 150.0, 200.0, 250.0], len(item_meals))
+        values = np.round(catalog.per_100g[foods] * (grams / 100.0)[:, None], 2)
+
+        meal_ids = np.arange(ids["meals"], ids["meals"] + len(meal_days))
+        ids["meals"] += len(meal_days)
+        for i, meal_id in enumerate(meal_ids):
+            meal_date = datetime.combine(start_date + timedelta(days=int(meal_days[i])), datetime.min.time()) \
+                + timedelta(hours=float(hours[i]))
+            loader.add(Meal.__table__, {
+                "id": int(meal_id),
+                "user_id": user_id,
+                "meal_type": MEAL_SLOTS[slots[i]][0],
+                "source_type": MealSource.MANUAL,
+                "meal_date": meal_date,
+                "created_at": now,
+                "updated_at": now,
+            })
+
+        present = ~np.isnan(values)
+        for i in range(len(item_meals)):
+            food_item_id = ids["food_items"]
+            ids["food_items"] += 1
+            row = values[i]
+            last = int(np.flatnonzero(present[i])[-1]) + 1
+            loader.add(FoodItem.__table__, {
+                "id": food_item_id,
+                "meal_id": int(meal_ids[item_meals[i]]),
+                "name": catalog.names[foods[i]],
+                "normalized_name": catalog.names[foods[i]],
+                "quantity": float(grams[i]),
+                "unit": "g",
+                "nutrient_values": [float(v) if present[i, j] else None for j, v in enumerate(row[:last])],
+                "extra_nutrients": None,
+                "created_at": now,
+                "updated_at": now,
+            })
+            if config.nutrient_rows:
+                for j in np.flatnonzero(present[i]):
+                    loader.add(Nutrient.__table__, {
+                        "id": ids["nutrients"],
+                        "food_item_id": food_item_id,
+                        "name": NUTRIENT_VOCABULARY[j],
+                        "value": float(row[j]),
+                        "unit": NUTRIENT_UNITS[j],
+                        "created_at": now,
+                        "updated_at": now,
+                    })
+                    ids["nutrients"] += 1
+
+        # Daily rollups, as DailyNutritionService.refresh_days would write them
+        item_days = meal_days[item_meals]
+        totals = np.zeros((self.config.days, len(NUTRIENT_VOCABULARY)))
+        day_present = np.zeros(totals.shape, dtype=bool)
+        np.add.at(totals, item_days, np.nan_to_num(values))
+        np.logical_or.at(day_present, item_days, present)
+        for day, j in zip(*np.nonzero(day_present)):
+            loader.add(DailyNutrition.__table__, {
+                "id": ids["daily_nutrition"],
+                "user_id": user_id,
+                "date": start_date + timedelta(days=int(day)),
+                "nutrient_name": NUTRIENT_VOCABULARY[j],
+                "total_value": float(totals[day, j]),
+                "unit": NUTRIENT_UNITS[j],
+                "created_at": now,
+                "updated_at": now,
+            })
+            ids["daily_nutrition"] += 1
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk-load a synthetic meal history")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365, help="days of history per user")
+    parser.add_argument("--meals-per-day", type=float, default=3.0)
+    parser.add_argument("--items-per-meal", type=float, default=2.5)
+    parser.add_argument("--micronutrients-per-food", type=int, default=10)
+    parser.add_argument("--catalog-size", type=int, default=300, help="distinct foods")
+    parser.add_argument("--nutrient-rows", action="store_true", help="also write legacy per-nutrient rows")
+    parser.add_argument("--prefix", default="synthetic", help="username prefix")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-rows", type=int, default=50000)
+    parser.add_argument("--database-url", help="synchronous database URL (defaults to settings)")
+    args = parser.parse_args(argv)
+
+    config = DatasetConfig(
+        users=args.users,
+        days=args.days,
+        meals_per_day=args.meals_per_day,
+        items_per_meal=args.items_per_meal,
+        micronutrients_per_food=args.micronutrients_per_food,
+        catalog_size=args.catalog_size,
+        nutrient_rows=args.nutrient_rows,
+        prefix=args.prefix,
+        seed=args.seed,
+    )
+    engine = create_engine(args.database_url or settings.sync_database_url)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        counts = DatasetGenerator(config).generate(conn, args.batch_rows)
+    elapsed = time.perf_counter() - started
+
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE users, meals, food_items, nutrients, daily_nutrition"))
+    engine.dispose()
+
+    total = sum(counts.values())
+    for table, count in counts.items():
+        print(f"{table:<16}{count:>12,}")
+    print(f"{total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s); password: {PASSWORD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+End-to-end load test of the API against local Ollama and USDA stubs
+
+Starts both stubs (benchmarks/stubs.py) and the application under uvicorn,
+then runs virtual users that register, log in and loop over a weighted mix
+of uploads, manual meals and meal/nutrition reads. Reports p50/p95/p99
+latency, throughput and database queries per request for every endpoint,
+and compares them with a stored baseline.
+
+The database must already be migrated (`alembic upgrade head`).
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --users 20 --duration 60
+    python -m benchmarks.loadtest --mix read_heavy --save-baseline
+    python -m benchmarks.loadtest --base-url http://localhost:8000   # app already running
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import httpx
+import numpy as np
+
+from benchmarks.stubs import FOOD_NAMES
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+MAX_THROTTLE_RETRIES = 5
+
+
+@dataclass
+class EndpointStats:
+    """Latencies and query counts recorded for one endpoint"""
+    latencies_ms: List[float] = field(default_factory=list)
+    query_counts: List[int] = field(default_factory=list)
+    errors: int = 0
+    throttled: int = 0
+
+    def summary(self, elapsed: float) -> Dict[str, float]:
+        latencies = np.array(self.latencies_ms or [0.0])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "count": len(self.latencies_ms),
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "throughput_rps": round(len(self.latencies_ms) / elapsed, 2),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "mean_queries": round(float(np.mean(self.query_counts)), 2) if self.query_counts else None,
+        }
+
+
+class Recorder:
+    """Collects per-endpoint results of every virtual user"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointStats] = {}
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """
+        Send a request and record it under an endpoint name; returns None on
+        failure. 429/503 responses are counted as throttled and retried after
+        their Retry-After delay, a few times at most.
+        """
+        stats = self.endpoints.setdefault(name, EndpointStats())
+        for _ in range(MAX_THROTTLE_RETRIES):
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                stats.errors += 1
+                return None
+            if response.status_code not in (429, 503):
+                break
+            stats.throttled += 1
+            await asyncio.sleep(float(response.headers.get("retry-after", 0.2)))
+        stats.latencies_ms.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            stats.errors += 1
+            return None
+        query_count = response.headers.get("x-db-query-count")
+        if query_count is not None:
+            stats.query_counts.append(int(query_count))
+        return response
+
+
+class VirtualUser:
+    """One user working through the request mix"""
+
+    def __init__(self, recorder: Recorder, client: httpx.AsyncClient, name: str, rng: random.Random):
+        self.recorder = recorder
+        self.client = client
+        self.name = name
+        self.rng = rng
+        self.meal_ids: List[int] = []
+        self.headers: Dict[str, str] = {}
+
+    async def sign_up(self) -> bool:
+        credentials = {"email": f"{self.name}@example.com", "username": self.name, "password": "bench-password"}
+        if await self.recorder.request(self.client, "POST /auth/register", "POST", "/auth/register", json=credentials) is None:
+            return False
+        response = await self.recorder.request(
+            self.client, "POST /auth/login", "POST", "/auth/login",
+            json={"username_or_email": self.name, "password": "bench-password"},
+        )
+        if response is None:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+
+    def _meal_date(self) -> str:
+        return (datetime.utcnow() - timedelta(days=self.rng.randint(0, 29), hours=self.rng.randint(0, 12))).isoformat()
+
+    async def create_meal(self):
+        meal = {
+            "meal_type": self.rng.choice(["breakfast", "lunch", "dinner", "snack"]),
+            "source_type": "manual",
+            "meal_date": self._meal_date(),
+            "food_items": [
+                {"name": name, "quantity": self.rng.choice([50, 100, 150, 200]), "unit": "g"}
+                for name in self.rng.sample(FOOD_NAMES, self.rng.randint(1, 4))
+            ],
+        }
+        response = await self.recorder.request(self.client, "POST /meals", "POST", "/meals", json=meal, headers=self.headers)
+        if response is not None:
+            self.meal_ids.append(response.json()["id"])
+
+    async def upload_meal(self):
+        rows = "\n".join(f"{name},{self.rng.randint(1, 3)},serving" for name in self.rng.sample(FOOD_NAMES, 3))
+        response = await self.recorder.request(
+            self.client, "POST /meals/upload", "POST", "/meals/upload",
+            params={"meal_date": self._meal_date()},
+            files={"file": ("meal.csv", f"food,quantity,unit\n{rows}\n", "text/csv")},
+            headers=self.headers,
+        )
+        if response is not None:
+            self.meal_ids.append(response.json()["id"])
+
+    async def list_meals(self):
+        await self.recorder.request(self.client, "GET /meals", "GET", "/meals", params={"limit": 20}, headers=self.headers)
+
+    async def get_meal(self):
+        if not self.meal_ids:
+            return await self.create_meal()
+        meal_id = self.rng.choice(self.meal_ids)
+        await self.recorder.request(self.client, "GET /meals/{id}", "GET", f"/meals/{meal_id}", headers=self.headers)
+
+    async def delete_meal(self):
+        if not self.meal_ids:
+            return await self.create_meal()
+        meal_id = self.meal_ids.pop(self.rng.randrange(len(self.meal_ids)))
+        await self.recorder.request(self.client, "DELETE /meals/{id}", "DELETE", f"/meals/{meal_id}", headers=self.headers)
+
+    async def daily(self):
+        target_date = date.today() - timedelta(days=self.rng.randint(0, 6))
+        await self.recorder.request(
+            self.client, "GET /nutrition/daily", "GET", "/nutrition/daily",
+            params={"target_date": target_date.isoformat()}, headers=self.headers,
+        )
+
+    async def summary(self):
+        await self.recorder.request(
+            self.client, "GET /nutrition/summary", "GET", "/nutrition/summary",
+            params={"days": self.rng.choice([7, 30])}, headers=self.headers,
+        )
+
+    async def trends(self):
+        await self.recorder.request(
+            self.client, "GET /nutrition/trends", "GET", "/nutrition/trends",
+            params={"bucket": self.rng.choice(["day", "week"]), "rolling_days": 7}, headers=self.headers,
+        )
+
+    async def insights(self):
+        await self.recorder.request(self.client, "GET /nutrition/insights", "GET", "/nutrition/insights", headers=self.headers)
+
+    async def risks(self):
+        await self.recorder.request(self.client, "GET /risks", "GET", "/risks", headers=self.headers)
+
+
+# Request mixes: (VirtualUser method, relative weight)
+MIXES: Dict[str, List[Tuple[str, int]]] = {
+    "default": [
+        ("create_meal", 12), ("upload_meal", 4), ("delete_meal", 2),
+        ("list_meals", 20), ("get_meal", 12), ("daily", 18), ("summary", 14),
+        ("trends", 10), ("insights", 3), ("risks", 5),
+    ],
+    "read_heavy": [
+        ("create_meal", 3), ("list_meals", 25), ("get_meal", 15), ("daily", 22),
+        ("summary", 18), ("trends", 12), ("risks", 5),
+    ],
+    "write_heavy": [
+        ("create_meal", 40), ("upload_meal", 15), ("delete_meal", 10),
+        ("list_meals", 15), ("daily", 10), ("summary", 10),
+    ],
+}
+
+
+async def run_user(user: VirtualUser, mix: List[Tuple[str, int]], warmup_meals: int, deadline: float):
+    if not await user.sign_up():
+        return
+    for _ in range(warmup_meals):
+        await user.create_meal()
+    actions = [getattr(user, name) for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    while time.monotonic() < deadline:
+        await user.rng.choices(actions, weights)[0]()
+
+
+async def run_load(base_url: str, users: int, duration: float, mix_name: str, warmup_meals: int, seed: int) -> Dict:
+    """Run the virtual users for duration seconds and summarize the results"""
+    recorder = Recorder()
+    run_id = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        started = time.monotonic()
+        deadline = started + duration
+        await asyncio.gather(*(
+            run_user(
+                VirtualUser(recorder, client, f"bench_{run_id}_{i}", random.Random(seed + i)),
+                MIXES[mix_name], warmup_meals, deadline,
+            )
+            for i in range(users)
+        ))
+        elapsed = time.monotonic() - started
+
+    endpoints = {name: stats.summary(elapsed) for name, stats in sorted(recorder.endpoints.items())}
+    return {
+        "mix": mix_name,
+        "users": users,
+        "duration_s": round(elapsed, 2),
+        "requests": sum(e["count"] for e in endpoints.values()),
+        "throughput_rps": round(sum(e["count"] for e in endpoints.values()) / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """Regressions of results against a baseline"""
+    regressions = []
+    for name, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None or not current["count"]:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = max(previous[metric] * (1 + tolerance), previous[metric] + min_delta_ms)
+            if current[metric] > limit:
+                regressions.append(f"{name} {metric}: {current[metric]} > {previous[metric]} (+{tolerance:.0%})")
+        # Query counts are deterministic for a given code path
+        if previous.get("mean_queries") is not None and current["mean_queries"] is not None \
+                and current["mean_queries"] > previous["mean_queries"] + 0.5:
+            regressions.append(f"{name} mean_queries: {current['mean_queries']} > {previous['mean_queries']}")
+    if results["throughput_rps"] < baseline.get("throughput_rps", 0) * (1 - tolerance):
+        regressions.append(f"throughput_rps: {results['throughput_rps']} < {baseline['throughput_rps']} (-{tolerance:.0%})")
+    return regressions
+
+
+def print_report(results: Dict):
+    print(f"\n{results['requests']} requests in {results['duration_s']}s "
+          f"({results['throughput_rps']} req/s, {results['users']} users, mix={results['mix']})\n")
+    print(f"{'endpoint':<24}{'count':>7}{'err':>5}{'429':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+    for name, e in results["endpoints"].items():
+        queries = "-" if e["mean_queries"] is None else e["mean_queries"]
+        print(f"{name:<24}{e['count']:>7}{e['errors']:>5}{e['throttled']:>5}{e['throughput_rps']:>8}"
+              f"{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}{queries:>9}")
+
+
+def launch(args: List[str], env: Dict[str, str], log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def stub_command(service: str, port: int, latency_ms: float, jitter_ms: float, error_rate: float) -> List[str]:
+    return [
+        sys.executable, "-m", "benchmarks.stubs", service, "--port", str(port),
+        "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms), "--error-rate", str(error_rate),
+    ]
+
+
+async def wait_until_ready(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+            await asyncio.sleep(0.25)
+
+
+async def start_services(args, log_dir: Path) -> List[subprocess.Popen]:
+    """Start both stubs and the application; returns the processes"""
+    env = dict(os.environ)
+    processes = [
+        launch(
+            stub_command("ollama", args.ollama_port, args.ollama_latency_ms, args.ollama_jitter_ms, args.stub_error_rate),
+            env, log_dir / "ollama_stub.log",
+        ),
+        launch(
+            stub_command("usda", args.usda_port, args.usda_latency_ms, args.usda_jitter_ms, args.stub_error_rate),
+            env, log_dir / "usda_stub.log",
+        ),
+    ]
+    app_env = dict(
+        env,
+        OLLAMA_BASE_URL=f"http://127.0.0.1:{args.ollama_port}",
+        USDA_API_BASE_URL=f"http://127.0.0.1:{args.usda_port}/fdc/v1",
+        USDA_API_KEY="benchmark",
+        # The stub has no quota; a real-key budget would leave items pending
+        USDA_REQUESTS_PER_HOUR="0",
+        QUERY_STATS_HEADERS="true",
+        SCHEDULER_ENABLED="false",
+        DEBUG="false",
+    )
+    if args.database_url:
+        app_env["DATABASE_URL"] = args.database_url
+    processes.append(launch(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.app_port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        app_env, log_dir / "app.log",
+    ))
+    await wait_until_ready(f"http://127.0.0.1:{args.ollama_port}/docs")
+    await wait_until_ready(f"http://127.0.0.1:{args.usda_port}/docs")
+    await wait_until_ready(f"http://127.0.0.1:{args.app_port}/health")
+    return processes
+
+
+async def main_async(args) -> int:
+    processes: List[subprocess.Popen] = []
+    log_dir = Path(tempfile.mkdtemp(prefix="vitalens-bench-"))
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            processes = await start_services(args, log_dir)
+            base_url = f"http://127.0.0.1:{args.app_port}"
+        results = await run_load(base_url, args.users, args.duration, args.mix, args.warmup_meals, args.seed)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+        if processes:
+            print(f"Service logs: {log_dir}")
+
+    print_report(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_DIR / f"{args.mix}.json"
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2))
+        print(f"\nBaseline saved to {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"\nNo baseline at {baseline_path}; run with --save-baseline to record one")
+        return 0
+
+    regressions = compare(results, json.loads(baseline_path.read_text()), args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"\nRegressions against {baseline_path}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nNo regressions against {baseline_path}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against local Ollama/USDA stubs")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load after sign-up")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--warmup-meals", type=int, default=5, help="meals each user logs before the mix starts")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--base-url", help="target an already running app instead of starting one")
+    parser.add_argument("--database-url", help="DATABASE_URL for the started app (defaults to the environment)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--app-port", type=int, default=18000)
+    parser.add_argument("--ollama-port", type=int, default=18001)
+    parser.add_argument("--usda-port", type=int, default=18002)
+    parser.add_argument("--ollama-latency-ms", type=float, default=400.0)
+    parser.add_argument("--ollama-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--usda-latency-ms", type=float, default=80.0)
+    parser.add_argument("--usda-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="baseline JSON (defaults to benchmarks/baselines/<mix>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore latency changes below this")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
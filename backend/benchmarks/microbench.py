@@ -0,0 +1,203 @@
+"""
+Micro-benchmarks of the read and write endpoints against generated data
+
+Times each endpoint in-process (no network, USDA and Ollama disabled) for a
+few users of different history sizes, typically loaded with
+benchmarks/dataset.py. The response cache is cleared before every request
+unless --cached is given, so the numbers reflect the database work.
+
+Usage (from backend/):
+    python -m benchmarks.microbench --prefix synthetic --iterations 30
+    python -m benchmarks.microbench --user-id 12 --user-id 40 --output results.json
+"""
+import os
+
+# Keep external services out of the timings (set before the app is imported)
+os.environ["USDA_API_KEY"] = ""
+os.environ["SCHEDULER_ENABLED"] = "false"
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import httpx
+import numpy as np
+from sqlalchemy import func, select
+
+from app.core.database import engine, async_session_maker
+from app.core.response_cache import response_cache
+from app.core.security import create_access_token
+from app.api.meals import _encode_cursor
+from app.models.user import User
+from app.models.meal import Meal
+from main import app
+
+
+async def pick_users(prefix: str, count: int) -> List[int]:
+    """Users with the smallest, median and largest histories among generated users"""
+    async with async_session_maker() as db:
+        result = await db.execute(
+            select(User.id, func.count(Meal.id).label("meals"))
+            .join(Meal, Meal.user_id == User.id)
+            .where(User.username.like(f"{prefix}\\_%", escape="\\"))
+            .group_by(User.id)
+            .order_by(func.count(Meal.id))
+        )
+        rows = result.all()
+    if not rows:
+        return []
+    positions = np.unique(np.linspace(0, len(rows) - 1, count).round().astype(int))
+    return [rows[i].id for i in positions]
+
+
+async def user_profile(user_id: int) -> Dict[str, Any]:
+    """History size of a user and a deep cursor into their meals"""
+    async with async_session_maker() as db:
+        meal_count, first, last = (await db.execute(
+            select(func.count(Meal.id), func.min(Meal.meal_date), func.max(Meal.meal_date))
+            .where(Meal.user_id == user_id)
+        )).one()
+        deep_meal = (await db.execute(
+            select(Meal).where(Meal.user_id == user_id)
+            .order_by(Meal.meal_date.desc(), Meal.id.desc())
+            .offset(max(meal_count // 2, 0)).limit(1)
+        )).scalar_one_or_none()
+        sample_meal_id = (await db.execute(
+            select(Meal.id).where(Meal.user_id == user_id).order_by(Meal.meal_date.desc()).limit(1)
+        )).scalar()
+    return {
+        "meals": meal_count,
+        "history_days": (last.date() - first.date()).days + 1 if first else 0,
+        "deep_cursor": _encode_cursor(deep_meal) if deep_meal else None,
+        "meal_id": sample_meal_id,
+    }
+
+
+class Bench:
+    """Runs timed requests for one user"""
+
+    def __init__(self, client: httpx.AsyncClient, user_id: int, iterations: int, cached: bool):
+        self.client = client
+        self.iterations = iterations
+        self.cached = cached
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+        self.results: Dict[str, Dict[str, float]] = {}
+
+    async def time(self, name: str, send: Callable[[], Awaitable[httpx.Response]], after: Optional[Callable] = None):
+        # One untimed request warms connections and the user cache
+        response = await send()
+        response.raise_for_status()
+        if after:
+            await after(response)
+        timings = []
+        for _ in range(self.iterations):
+            if not self.cached:
+                response_cache.clear()
+            started = time.perf_counter()
+            response = await send()
+            timings.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+            if after:
+                await after(response)
+        p50, p95 = np.percentile(timings, [50, 95])
+        self.results[name] = {
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "mean_ms": round(float(np.mean(timings)), 2),
+        }
+
+    def get(self, url: str, **params) -> Callable[[], Awaitable[httpx.Response]]:
+        return lambda: self.client.get(url, params=params or None, headers=self.headers)
+
+    async def run(self, profile: Dict[str, Any]):
+        today = date.today()
+        await self.time("GET /meals", self.get("/meals", limit=20))
+        if profile["deep_cursor"]:
+            await self.time("GET /meals (mid-history cursor)", self.get("/meals", limit=20, cursor=profile["deep_cursor"]))
+        if profile["meal_id"]:
+            await self.time("GET /meals/{id}", self.get(f"/meals/{profile['meal_id']}"))
+        await self.time("GET /nutrition/daily", self.get("/nutrition/daily"))
+        for days in (7, 30, 365):
+            await self.time(f"GET /nutrition/summary?days={days}", self.get("/nutrition/summary", days=days))
+        await self.time(
+            "GET /nutrition/trends (1y, week)",
+            self.get("/nutrition/trends", start_date=(today - timedelta(days=364)).isoformat(), bucket="week"),
+        )
+        await self.time(
+            "GET /nutrition/trends (3y, month, rolling 30)",
+            self.get("/nutrition/trends", start_date=(today - timedelta(days=1094)).isoformat(),
+                     bucket="month", rolling_days=30),
+        )
+
+        # Writes: every created meal is deleted again, so the data set is unchanged
+        created: List[int] = []
+
+        async def remember(response: httpx.Response):
+            created.append(response.json()["id"])
+
+        meal = {
+            "meal_type": "lunch",
+            "source_type": "manual",
+            "meal_date": datetime.utcnow().isoformat(),
+            "food_items": [{"name": "apple", "quantity": 150, "unit": "g"}, {"name": "oatmeal", "quantity": 80, "unit": "g"}],
+        }
+        await self.time("POST /meals", lambda: self.client.post("/meals", json=meal, headers=self.headers), after=remember)
+        await self.time(
+            "DELETE /meals/{id}",
+            lambda: self.client.delete(f"/meals/{created.pop()}", headers=self.headers),
+        )
+        for meal_id in created:
+            await self.client.delete(f"/meals/{meal_id}", headers=self.headers)
+
+
+def print_results(results: List[Dict[str, Any]]):
+    for entry in results:
+        print(f"\nuser {entry['user_id']}: {entry['meals']:,} meals over {entry['history_days']:,} days")
+        print(f"  {'endpoint':<46}{'p50':>9}{'p95':>9}{'mean':>9}")
+        for name, timing in entry["endpoints"].items():
+            print(f"  {name:<46}{timing['p50_ms']:>9}{timing['p95_ms']:>9}{timing['mean_ms']:>9}")
+
+
+async def main_async(args) -> List[Dict[str, Any]]:
+    user_ids = args.user_id or await pick_users(args.prefix, args.users)
+    if not user_ids:
+        raise SystemExit(f"No users found with prefix {args.prefix!r}; run benchmarks.dataset first")
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for user_id in user_ids:
+            profile = await user_profile(user_id)
+            bench = Bench(client, user_id, args.iterations, args.cached)
+            await bench.run(profile)
+            results.append({
+                "user_id": user_id,
+                "meals": profile["meals"],
+                "history_days": profile["history_days"],
+                "endpoints": bench.results,
+            })
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time endpoints against generated data")
+    parser.add_argument("--prefix", default="synthetic", help="username prefix of generated users")
+    parser.add_argument("--users", type=int, default=3, help="users to pick across history sizes")
+    parser.add_argument("--user-id", type=int, action="append", help="benchmark these users instead")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--cached", action="store_true", help="keep the response cache between requests")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print_results(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
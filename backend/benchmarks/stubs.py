@@ -0,0 +1,232 @@
+"""
+Local stand-ins for Ollama and the USDA FoodData Central API
+
+Both stubs answer with deterministic, realistic payloads after a configurable
+latency, and fail a configurable fraction of requests with a 503, so the
+backend can be load-tested without a GPU or an API key.
+
+Usage (from backend/):
+    python -m benchmarks.stubs ollama --port 11500 --latency-ms 400
+    python -m benchmarks.stubs usda --port 11501 --latency-ms 80 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubConfig:
+    """Latency and failure behaviour of a stub"""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+# USDA nutrient ids with their names, units and a typical per-100g range
+USDA_NUTRIENTS = [
+    (1008, "Energy", "KCAL", (20, 550)),
+    (1003, "Protein", "G", (0, 30)),
+    (1005, "Carbohydrate, by difference", "G", (0, 80)),
+    (1079, "Fiber, total dietary", "G", (0, 10)),
+    (1004, "Total lipid (fat)", "G", (0, 40)),
+    (1258, "Fatty acids, total saturated", "G", (0, 15)),
+    (2000, "Sugars, total including NLEA", "G", (0, 30)),
+    (1093, "Sodium, Na", "MG", (0, 900)),
+    (1092, "Potassium, K", "MG", (50, 600)),
+    (1087, "Calcium, Ca", "MG", (0, 300)),
+    (1089, "Iron, Fe", "MG", (0, 5)),
+    (1090, "Magnesium, Mg", "MG", (0, 120)),
+    (1095, "Zinc, Zn", "MG", (0, 5)),
+    (1106, "Vitamin A, RAE", "UG", (0, 500)),
+    (1114, "Vitamin D (D2 + D3)", "UG", (0, 5)),
+    (1162, "Vitamin C, total ascorbic acid", "MG", (0, 60)),
+    (1175, "Vitamin B-6", "MG", (0, 1)),
+    (1177, "Folate, total", "UG", (0, 150)),
+    (1178, "Vitamin B-12", "UG", (0, 3)),
+    (1051, "Water", "G", (5, 90)),
+]
+
+FOOD_NAMES = [
+    "apple", "banana", "orange", "whole milk", "greek yogurt", "cheddar cheese",
+    "boiled egg", "white rice", "brown rice", "whole wheat bread", "oatmeal",
+    "pasta", "chicken breast", "salmon", "tuna", "ground beef", "tofu",
+    "black beans", "lentils", "broccoli", "spinach", "carrot", "potato",
+    "sweet potato", "tomato", "avocado", "almonds", "peanut butter", "olive oil",
+    "orange juice", "coffee", "dark chocolate", "blueberries", "strawberries",
+]
+
+
+async def _delay(config: StubConfig, rng: random.Random):
+    delay = config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms)
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+
+def _failed(config: StubConfig, rng: random.Random) -> bool:
+    return config.error_rate > 0 and rng.random() < config.error_rate
+
+
+def _fdc_id(query: str) -> int:
+    """Stable FoodData Central id for a search query"""
+    return 100000 + zlib.crc32(query.lower().strip().encode()) % 900000
+
+
+def _food_nutrients(fdc_id: int) -> List[Dict[str, Any]]:
+    """Deterministic per-100g nutrient amounts of a food"""
+    rng = random.Random(fdc_id)
+    return [
+        {"id": nutrient_id, "name": name, "unitName": unit, "amount": round(rng.uniform(low, high), 2)}
+        for nutrient_id, name, unit, (low, high) in USDA_NUTRIENTS
+    ]
+
+
+def _food_details(fdc_id: int) -> Dict[str, Any]:
+    """Food details with nested nutrient entries, as /food/{fdc_id} returns them"""
+    return {
+        "fdcId": fdc_id,
+        "dataType": "Foundation",
+        "foodNutrients": [
+            {
+                "nutrient": {"id": n["id"], "name": n["name"], "unitName": n["unitName"].lower()},
+                "amount": n["amount"],
+            }
+            for n in _food_nutrients(fdc_id)
+        ],
+    }
+
+
+def create_usda_stub(config: StubConfig) -> FastAPI:
+    """Stub of /fdc/v1/foods/search, /fdc/v1/food/{fdc_id} and POST /fdc/v1/foods"""
+    app = FastAPI(title="USDA FoodData Central stub")
+    rng = random.Random(config.seed)
+
+    @app.get("/fdc/v1/foods/search")
+    async def search(query: str = "", pageSize: int = 1):
+        await _delay(config, rng)
+        if _failed(config, rng):
+            return JSONResponse(status_code=503, content={"error": "stub failure"})
+        fdc_id = _fdc_id(query)
+        foods = [{
+            "fdcId": fdc_id,
+            "description": query.upper(),
+            "dataType": "Foundation",
+            # Search results carry flat nutrient entries, as the real API does
+            "foodNutrients": [
+                {"nutrientId": n["id"], "nutrientName": n["name"], "unitName": n["unitName"], "value": n["amount"]}
+                for n in _food_nutrients(fdc_id)
+            ],
+        }]
+        return {"totalHits": 1, "currentPage": 1, "totalPages": 1, "foods": foods[:pageSize]}
+
+    @app.get("/fdc/v1/food/{fdc_id}")
+    async def food(fdc_id: int):
+        await _delay(config, rng)
+        if _failed(config, rng):
+            return JSONResponse(status_code=503, content={"error": "stub failure"})
+        return _food_details(fdc_id)
+
+    @app.post("/fdc/v1/foods")
+    async def foods(request: Request):
+        await _delay(config, rng)
+        if _failed(config, rng):
+            return JSONResponse(status_code=503, content={"error": "stub failure"})
+        body = await request.json()
+        return [_food_details(int(fdc_id)) for fdc_id in body.get("fdcIds", [])]
+
+    return app
+
+
+def _ollama_answer(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    """JSON answer matching the prompt templates of LLMService"""
+    if prompt.startswith("This is a nutrition facts label"):
+        return {
+            "is_nutrition_label": True,
+            "serving_size": "1 cup (228g)",
+            "servings_per_container": 2,
+            "nutrients": [
+                {"name": "calories", "value": 250, "unit": "kcal"},
+                {"name": "total_fat", "value": 12, "unit": "g"},
+                {"name": "saturated_fat", "value": 3, "unit": "g"},
+                {"name": "sodium", "value": 470, "unit": "mg"},
+                {"name": "total_carbohydrate", "value": 31, "unit": "g"},
+                {"name": "dietary_fiber", "value": 0, "unit": "g"},
+                {"name": "total_sugars", "value": 5, "unit": "g"},
+                {"name": "protein", "value": 5, "unit": "g"},
+                {"name": "calcium", "value": 260, "unit": "mg"},
+                {"name": "iron", "value": 1, "unit": "mg"},
+            ],
+        }
+    if prompt.startswith("Extract food items"):
+        text = prompt.lower()
+        names = [name for name in FOOD_NAMES if name in text] or rng.sample(FOOD_NAMES, 2)
+        return {
+            "is_nutrition_label": False,
+            "food_items": [
+                {"name": name, "quantity": rng.choice([1, 100, 150, 250]), "unit": "g", "brand": None}
+                for name in names
+            ],
+        }
+    if prompt.startswith("Explain the following health risk"):
+        return {
+            "explanation": "Your average intake of this nutrient is outside the reference range.",
+            "recommendation": "Consider adjusting portions of foods rich in this nutrient.",
+        }
+    return {
+        "explanation": "Your intake over the period was broadly balanced.",
+        "recommendations": "Keep including vegetables and whole grains in most meals.",
+    }
+
+
+def create_ollama_stub(config: StubConfig, chunk_chars: int = 24) -> FastAPI:
+    """Stub of Ollama's /api/generate, streaming the answer as NDJSON chunks"""
+    app = FastAPI(title="Ollama stub")
+    rng = random.Random(config.seed)
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        await _delay(config, rng)
+        if _failed(config, rng):
+            return JSONResponse(status_code=503, content={"error": "stub failure"})
+        answer = json.dumps(_ollama_answer(body.get("prompt", ""), rng))
+        model = body.get("model", "stub")
+
+        if not body.get("stream", True):
+            return {"model": model, "response": answer, "done": True}
+
+        async def chunks():
+            for start in range(0, len(answer), chunk_chars):
+                yield json.dumps({"model": model, "response": answer[start:start + chunk_chars], "done": False}) + "\n"
+            yield json.dumps({"model": model, "response": "", "done": True}) + "\n"
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an Ollama or USDA stub server")
+    parser.add_argument("service", choices=["ollama", "usda"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    app = create_ollama_stub(config) if args.service == "ollama" else create_usda_stub(config)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
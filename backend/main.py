@@ -2,11 +2,20 @@ from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy import text
 from app.core.config import settings
-from app.core.database import engine, async_session_maker
-from app.api import auth, meals, nutrition
+from app.core.database import engine, async_session_maker, replica_engine
+from app.core.http_client import http_clients
+from app.core.load_shedding import LoadSheddingMiddleware
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, install_pool_metrics, render_metrics
+from app.core.query_stats import QueryStatsMiddleware, install_query_counter
+from app.core.security import shutdown_password_executor
+from app.core.server_timing import ServerTimingMiddleware
+from app.core.tracing import InMemoryExporter, TracingMiddleware, install_query_tracing, tracer
+from app.services.scheduler import background_scheduler
+from app.api import admin, auth, meals, nutrition, risks
 
 
 @asynccontextmanager
@@ -23,10 +32,38 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     except Exception as e:
         print(f"✗ Database connection failed: {e}")
     
+    # Startup: Create pooled outbound HTTP clients (USDA, Ollama)
+    http_clients.start()
+    
+    # Startup: Watch for event loop stalls
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    
+    # Startup: Precompute rollups, risk scores and insights off-peak
+    background_scheduler.start()
+    
     yield
     
+    # Shutdown: Stop the background scheduler
+    await background_scheduler.stop()
+    
+    # Shutdown: Stop the event loop monitor
+    await loop_monitor.stop()
+    
+    # Shutdown: Close outbound HTTP connection pools
+    await http_clients.close()
+    print("✓ Outbound HTTP clients closed")
+    
+    # Shutdown: Stop password hashing threads
+    shutdown_password_executor()
+    
+    # Shutdown: Flush trace exporters
+    tracer.close()
+    
     # Shutdown: Close database connections
     await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
     print("✓ Database connections closed")
 
 
@@ -38,6 +75,10 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Load shedding (added before CORS so rejected requests still carry CORS headers)
+if settings.LOAD_SHEDDING_ENABLED:
+    app.add_middleware(LoadSheddingMiddleware)
+
 # CORS middleware
 # Handle CORS origins: split by comma or use ["*"] if wildcard
 if settings.CORS_ORIGINS == "*":
@@ -56,6 +97,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Statement counts and time, for query statistics, Server-Timing and upload telemetry
+if settings.QUERY_STATS_HEADERS or settings.SERVER_TIMING_ENABLED or settings.MEAL_TELEMETRY_ENABLED:
+    install_query_counter(engine)
+    if replica_engine is not None:
+        install_query_counter(replica_engine)
+
+# Per-request query statistics (benchmarks)
+if settings.QUERY_STATS_HEADERS:
+    app.add_middleware(QueryStatsMiddleware)
+
+# Per-stage latency breakdown for clients
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
+# Prometheus metrics (added last so request latency covers the other middleware)
+if settings.METRICS_ENABLED:
+    install_pool_metrics(engine, "primary")
+    if replica_engine is not None:
+        install_pool_metrics(replica_engine, "replica")
+    app.add_middleware(MetricsMiddleware)
+
+# Request tracing (outermost, so the server span covers the whole request)
+if settings.TRACING_ENABLED:
+    install_query_tracing(engine)
+    if replica_engine is not None:
+        install_query_tracing(replica_engine)
+    app.add_middleware(TracingMiddleware)
+
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -96,10 +165,26 @@ async def health_check():
         )
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(content=render_metrics(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+if settings.TRACING_ENABLED and settings.DEBUG and isinstance(tracer.exporter, InMemoryExporter):
+    @app.get("/debug/traces/{trace_id}", include_in_schema=False)
+    async def debug_trace(trace_id: str):
+        """Spans of a recent trace kept by the in-memory exporter (local debugging)"""
+        return tracer.exporter.spans(trace_id)
+
+
 # Include API routers
 app.include_router(auth.router, prefix=settings.API_PREFIX)
 app.include_router(meals.router, prefix=settings.API_PREFIX)
 app.include_router(nutrition.router, prefix=settings.API_PREFIX)
+app.include_router(risks.router, prefix=settings.API_PREFIX)
+app.include_router(admin.router, prefix=settings.API_PREFIX)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+"""
+Query plan regression checks for the hot read paths
+
+Runs EXPLAIN against the configured PostgreSQL database for the meal
+listing, daily/summary aggregation, trends and per-food-item nutrient
+queries, and fails if any of them stops being served by its index.
+Sequential scans are disabled for the check so the result does not depend
+on how much data the database holds.
+
+Usage (from backend/, after `alembic upgrade head`):
+    python -m scripts.check_query_plans [--user-id N]
+"""
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import Select, select, text, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.database import engine
+from app.models.meal import Meal
+from app.models.nutrient import Nutrient
+from app.models.daily_nutrition import DailyNutrition
+from app.services.nutrient_aggregation import nutrient_aggregation_service
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a statement, keeping its bound parameters"""
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler, **kw) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+@dataclass
+class PlanCheck:
+    """A query and the index that must serve it"""
+    name: str
+    query: Select
+    index: str
+    # Tables that must not be read with a sequential scan
+    tables: List[str]
+    index_only: bool = False
+
+
+def plan_checks(user_id: int) -> List[PlanCheck]:
+    """The hot read queries, built the same way the endpoints build them"""
+    today = date.today()
+    # GET /meals: first page and a keyset page
+    meal_page = (
+        select(Meal)
+        .where(Meal.user_id == user_id)
+        .order_by(Meal.meal_date.desc(), Meal.id.desc())
+        .limit(21)
+    )
+    cursor = tuple_(Meal.meal_date, Meal.id) < tuple_(datetime.combine(today, datetime.min.time()), 2 ** 30)
+    return [
+        PlanCheck("meal list", meal_page, "ix_meals_user_date", ["meals"]),
+        PlanCheck("meal list (cursor)", meal_page.where(cursor), "ix_meals_user_date", ["meals"]),
+        # GET /nutrition/daily and /nutrition/summary
+        PlanCheck(
+            "daily aggregation",
+            nutrient_aggregation_service.matrix_query(user_id, today, today),
+            "ix_meals_user_date",
+            ["meals", "food_items"],
+        ),
+        PlanCheck(
+            "summary aggregation",
+            nutrient_aggregation_service.matrix_query(user_id, today - timedelta(days=29), today),
+            "ix_meals_user_date",
+            ["meals", "food_items"],
+        ),
+        # GET /nutrition/trends
+        PlanCheck(
+            "trends",
+            select(DailyNutrition.date, DailyNutrition.nutrient_name, DailyNutrition.total_value, DailyNutrition.unit)
+            .where(
+                DailyNutrition.user_id == user_id,
+                DailyNutrition.date >= today - timedelta(days=89),
+                DailyNutrition.date <= today,
+                DailyNutrition.nutrient_name.in_(["calories", "protein"]),
+            ),
+            "ix_daily_nutrition_user_date_nutrient",
+            ["daily_nutrition"],
+        ),
+        # Per-nutrient rows (NUTRIENT_ROW_STORAGE) of a set of food items
+        PlanCheck(
+            "nutrients by food item",
+            select(Nutrient.food_item_id, Nutrient.name, Nutrient.value, Nutrient.unit)
+            .where(Nutrient.food_item_id.in_([1, 2, 3])),
+            "ix_nutrients_food_item_name",
+            ["nutrients"],
+            index_only=True,
+        ),
+    ]
+
+
+def _plan_nodes(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def check_plan(check: PlanCheck, plan: Dict[str, Any]) -> Optional[str]:
+    """Problem with a plan, or None if it uses the expected index"""
+    nodes = list(_plan_nodes(plan["Plan"]))
+    seq_scans = sorted({
+        node["Relation Name"] for node in nodes
+        if node["Node Type"] == "Seq Scan" and node["Relation Name"] in check.tables
+    })
+    if seq_scans:
+        return f"sequential scan on {', '.join(seq_scans)}"
+    scans = [node for node in nodes if node.get("Index Name") == check.index]
+    if not scans:
+        used = sorted({node["Index Name"] for node in nodes if "Index Name" in node})
+        return f"{check.index} not used (indexes used: {', '.join(used) or 'none'})"
+    if check.index_only and not any(node["Node Type"] == "Index Only Scan" for node in scans):
+        return f"{check.index} used without an index-only scan"
+    return None
+
+
+async def run_checks(user_id: int) -> bool:
+    """EXPLAIN every check; returns whether all passed"""
+    if engine.dialect.name != "postgresql":
+        print(f"Query plan checks need PostgreSQL, not {engine.dialect.name}")
+        return False
+
+    passed = True
+    async with engine.connect() as conn:
+        await conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for check in plan_checks(user_id):
+            result = (await conn.execute(Explain(check.query))).scalar()
+            # asyncpg returns json columns undecoded
+            plan = (json.loads(result) if isinstance(result, str) else result)[0]
+            problem = check_plan(check, plan)
+            print(f"{'FAIL' if problem else 'ok  '} {check.name}" + (f": {problem}" if problem else ""))
+            passed = passed and problem is None
+        await conn.rollback()
+    await engine.dispose()
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=1, help="user id bound into the queries")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run_checks(args.user_id)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Report the slowest meal uploads with their stage breakdown
+
+Reads MealProcessingTelemetry joined to the meals, printing where each slow
+upload spent its time next to its file type, size and meal type, and the
+median breakdown per source type (over a random sample of uploads) for
+comparison.
+
+Usage (from backend/):
+    python -m scripts.slow_uploads [--days 7] [--limit 20] [--json]
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+import numpy as np
+
+from app.core.database import async_session_maker, engine
+from app.services.meal_telemetry import meal_telemetry_service
+
+STAGES = ["ocr_ms", "llm_ms", "nutrition_ms", "db_ms"]
+
+
+def print_report(slowest: List[Dict[str, Any]], everything: List[Dict[str, Any]]):
+    print(f"{'meal':>8} {'source':<7}{'ext':<6}{'size KB':>9} {'meal type':<10}{'total ms':>10}"
+          f"{'ocr':>9}{'llm':>9}{'usda':>9}{'db':>8}{'chars':>7}{'items':>6}{'hits':>5}{'t/o':>4}")
+    for row in slowest:
+        print(
+            f"{row['meal_id']:>8} {row['source_type']:<7}{row['file_extension'] or '':<6}"
+            f"{(row['file_size_bytes'] or 0) / 1024:>9.1f} {row['meal_type']:<10}{row['total_ms']:>10.0f}"
+            f"{row['ocr_ms']:>9.0f}{row['llm_ms']:>9.0f}{row['nutrition_ms']:>9.0f}{row['db_ms']:>8.0f}"
+            f"{row['ocr_characters']:>7}{row['food_item_count']:>6}{row['usda_cache_hits']:>5}{row['llm_timeouts']:>4}"
+        )
+
+    by_source: Dict[str, List[Dict[str, Any]]] = {}
+    for row in everything:
+        by_source.setdefault(row["source_type"], []).append(row)
+    print(f"\n{'median by source':<17}{'uploads':>8}{'total ms':>10}" + "".join(f"{s[:-3]:>12}" for s in STAGES))
+    for source, rows in sorted(by_source.items()):
+        print(
+            f"{source:<17}{len(rows):>8}{np.median([r['total_ms'] for r in rows]):>10.0f}"
+            + "".join(f"{np.median([r[s] for r in rows]):>12.0f}" for s in STAGES)
+        )
+
+
+async def main_async(args):
+    since = datetime.now(timezone.utc) - timedelta(days=args.days)
+    async with async_session_maker() as db:
+        slowest = await meal_telemetry_service.slowest_uploads(db, since=since, limit=args.limit)
+        everything = await meal_telemetry_service.sample_uploads(db, since=since, limit=args.sample)
+    await engine.dispose()
+
+    if args.json:
+        print(json.dumps(slowest, indent=2, default=str))
+    elif not slowest:
+        print(f"No uploads recorded in the last {args.days} days")
+    else:
+        print_report(slowest, everything)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=7, help="look back this many days")
+    parser.add_argument("--limit", type=int, default=20, help="slowest uploads to list")
+    parser.add_argument("--sample", type=int, default=10000, help="uploads randomly sampled for the per-source medians")
+    parser.add_argument("--json", action="store_true", help="print the slowest uploads as JSON")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()